@@ -0,0 +1,221 @@
+import asyncio
+import contextvars
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+import discord
+
+from metrics import metrics
+from runtime_profile import resolve_member
+
+# How long a handler waits for the gateway to push a matching entry
+# before falling back to a REST fetch.
+PUSH_WAIT = 1.5
+# Entries older than this are never used to blame anyone.
+ENTRY_MAX_AGE = timedelta(seconds=60)
+# An entry indexed before the event arrived counts only if it is no older
+# than the event, less this much for gateway delay and clock skew.
+EVENT_SKEW = timedelta(seconds=30)
+# Entries kept per guild.
+MAX_ENTRIES = 512
+# Entries requested by a single REST fallback.
+FALLBACK_LIMIT = 10
+# Actors fetched for entries the member cache could not resolve, per index.
+MAX_ACTORS = 256
+
+# (record count, wall time) when the gateway event being handled arrived.
+_arrival = contextvars.ContextVar("audit_arrival", default=None)
+
+
+class AuditIndex:
+    """Per-guild index of recent audit log entries keyed by (action, target_id).
+
+    Fed by ``on_audit_log_entry_create`` so handlers can find out who did
+    something without a REST call. When the gateway has not delivered a
+    matching entry yet, ``resolve`` waits briefly and then falls back to one
+    bounded ``audit_logs`` fetch per guild at a time.
+
+    Without a full member cache, gateway entries can arrive without a
+    resolved ``user``; ``resolve`` fetches the actor once and fills it in.
+    Freshness follows arrival order: the engine calls ``mark`` as each event
+    starts, and an entry pushed after that, or newer than the one indexed
+    for the key at that point, belongs to this event. Only an entry that
+    was already indexed is also checked against the event's time, so a
+    second action on the same target is not charged to the first actor.
+    """
+
+    def __init__(self, push_wait=PUSH_WAIT, max_age=ENTRY_MAX_AGE,
+                 max_entries=MAX_ENTRIES, fallback_limit=FALLBACK_LIMIT):
+        self.push_wait = push_wait
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.fallback_limit = fallback_limit
+        self._entries = {}
+        self._seq = 0
+        self._waiters = {}
+        self._fallback_locks = {}
+        self._actors = OrderedDict()
+        self._client = None
+
+    def attach(self, bot):
+        """Register the gateway listeners that feed the index."""
+        self._client = bot
+        bot.add_listener(self.on_audit_log_entry_create)
+        bot.add_listener(self.on_guild_remove)
+
+    async def on_audit_log_entry_create(self, entry):
+        self.record(entry)
+
+    async def on_guild_remove(self, guild):
+        self.forget(guild.id)
+
+    def mark(self):
+        """Note that a gateway event arrived; ``resolve`` judges entries against this point."""
+        _arrival.set((self._seq, datetime.now(timezone.utc)))
+
+    def record(self, entry, pushed=True):
+        """Store an entry and wake any handler waiting for it.
+
+        Entries read back by a REST fallback are not ``pushed``: they may
+        predate the event, so they are ordered as if indexed before it.
+        """
+        target_id = getattr(entry.target, "id", None)
+        if entry.user_id is None or target_id is None:
+            return
+        key = (entry.action, target_id)
+        entries = self._entries.setdefault(entry.guild.id, OrderedDict())
+        current = entries.get(key)
+        if current is not None and current[1].id >= entry.id:
+            return
+        if pushed:
+            self._seq += 1
+        entries[key] = (self._seq if pushed else 0, entry)
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+        for waiter in self._waiters.pop((entry.guild.id,) + key, ()):
+            if not waiter.done():
+                waiter.set_result(entry)
+
+    def peek(self, guild, action, target_id, arrival=None):
+        """Return a fresh indexed entry for this event, without waiting or touching REST.
+
+        ``arrival`` is ``(seq, since, baseline)`` from ``_arrival_for``;
+        without it any entry within ``max_age`` is returned.
+        """
+        stored = self._entries.get(guild.id, {}).get((action, target_id))
+        if stored is None:
+            return None
+        seq, entry = stored
+        if datetime.now(timezone.utc) - entry.created_at > self.max_age:
+            return None
+        if arrival is None:
+            return entry
+        arrived, since, baseline = arrival
+        if seq > arrived:
+            return entry  # pushed after the event arrived
+        if baseline is not None and entry.id > baseline:
+            return entry  # newer than what was indexed when it arrived
+        if entry.created_at >= since:
+            return entry
+        return None
+
+    async def resolve(self, guild, action, target_id):
+        """Return the audit log entry for ``action`` on ``target_id``, or None.
+
+        Only entries pushed after the event arrived, newer than the one
+        indexed for the key by then, or created no earlier than the event
+        less EVENT_SKEW count, so an earlier action on the same target is
+        never blamed for this one.
+        """
+        arrival = self._arrival_for(guild, action, target_id)
+        entry = self.peek(guild, action, target_id, arrival)
+        if entry is not None:
+            metrics.inc("audit_lookups_total", source="index")
+            return await self._with_actor(entry)
+
+        key = (guild.id, action, target_id)
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(key, []).append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.push_wait)
+            entry = self.peek(guild, action, target_id, arrival)
+            if entry is not None:
+                metrics.inc("audit_lookups_total", source="push")
+                return await self._with_actor(entry)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            waiters = self._waiters.get(key)
+            if waiters is not None:
+                if waiter in waiters:
+                    waiters.remove(waiter)
+                if not waiters:
+                    del self._waiters[key]
+
+        entry = await self._fallback(guild, action, target_id, arrival)
+        metrics.inc("audit_lookups_total", source="rest" if entry is not None else "miss")
+        return await self._with_actor(entry) if entry is not None else None
+
+    def _arrival_for(self, guild, action, target_id):
+        """``(seq, since, baseline)`` for the event being handled: when it arrived and the entry id indexed by then."""
+        arrival = _arrival.get()
+        if arrival is None:
+            # Outside the engine the event arrives now.
+            arrival = (self._seq, datetime.now(timezone.utc))
+        arrived, received = arrival
+        stored = self._entries.get(guild.id, {}).get((action, target_id))
+        baseline = stored[1].id if stored is not None and stored[0] <= arrived else None
+        return arrived, received - EVENT_SKEW, baseline
+
+    async def _with_actor(self, entry):
+        """Fill in ``entry.user`` when the member cache could not resolve it."""
+        if entry.user is None:
+            entry.user = await self.actor(entry.guild, entry.user_id)
+        return entry
+
+    async def actor(self, guild, user_id):
+        """Fetch a user that is not cached, once per guild and user."""
+        key = (guild.id, user_id)
+        task = self._actors.get(key)
+        if task is None:
+            task = self._actors[key] = asyncio.ensure_future(self._fetch_actor(guild, user_id))
+            while len(self._actors) > MAX_ACTORS:
+                self._actors.popitem(last=False)
+        return await asyncio.shield(task)
+
+    async def _fetch_actor(self, guild, user_id):
+        metrics.inc("actor_fetches_total")
+        try:
+            member = await resolve_member(guild, user_id)
+            if member is None and self._client is not None:
+                return await self._client.fetch_user(user_id)
+            return member
+        except discord.HTTPException:
+            pass
+        # Enough to ban by id and to log.
+        return discord.Object(id=user_id)
+
+    async def _fallback(self, guild, action, target_id, arrival):
+        lock = self._fallback_locks.setdefault(guild.id, asyncio.Lock())
+        async with lock:
+            # Another handler's fetch may already have filled the index.
+            entry = self.peek(guild, action, target_id, arrival)
+            if entry is not None:
+                return entry
+            metrics.inc("audit_fetches_total")
+            try:
+                async for fetched in guild.audit_logs(action=action, limit=self.fallback_limit):
+                    self.record(fetched, pushed=False)
+            except discord.HTTPException:
+                return None
+        return self.peek(guild, action, target_id, arrival)
+
+    def forget(self, guild_id):
+        """Drop everything indexed for a guild."""
+        self._entries.pop(guild_id, None)
+        self._fallback_locks.pop(guild_id, None)
+        for key in [key for key in self._actors if key[0] == guild_id]:
+            del self._actors[key]
+
@@ -0,0 +1,103 @@
+"""Measure what a gateway message costs to dispatch with protections on and off.
+
+Loads the bot against the fake guild from bench_raid and dispatches the
+same stream of harmless messages, each from a different member, under
+three settings of the message protections (anti_spam, duplicate_spam,
+anti_links, mass_mentions, banned_terms):
+
+  on            enabled, the default
+  off here      disabled in this guild but still on in another one, so the
+                listener stays and the engine only looks up the guild route
+  off           disabled in every guild, so the engine drops the listener
+
+Command parsing runs for every message in all three and is part of the
+baseline. Reports microseconds per message, median of --rounds runs.
+
+    python benchmarks/bench_dispatch.py --messages 20000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_raid import Replay, chatter  # noqa: E402
+from fake_discord import FakeGuild, FakeMessage  # noqa: E402
+
+MESSAGE_PROTECTIONS = ("anti_spam", "duplicate_spam", "anti_links", "mass_mentions", "banned_terms")
+
+
+async def dispatch_all(replay, messages):
+    """Dispatch every message and wait for its handlers; return seconds taken."""
+    before = asyncio.all_tasks()
+    started = time.perf_counter()
+    for message in messages:
+        replay.bot.dispatch("message", message)
+    await asyncio.gather(*(asyncio.all_tasks() - before))
+    return time.perf_counter() - started
+
+
+async def run(target, count, rounds):
+    replay = Replay(target, members=count)
+    await replay.start()
+    bot, guild = replay.bot, replay.guild
+    engine = bot.get_cog("Protections")
+    other = FakeGuild(replay.api, name="Other Guild", channels=1, roles=0, members=0)
+    bot._connection._guilds[other.id] = other
+    bot._ready.set()
+    engine.rebuild()
+
+    channels = guild.text_channels[:10]
+    authors = [member for member in guild.members.values() if not member.bot][:count]
+    rng = random.Random(0)
+    messages = [FakeMessage(channels[i % len(channels)], author, chatter(rng)) for i, author in enumerate(authors)]
+
+    def disable(guild_id):
+        for flag in MESSAGE_PROTECTIONS:
+            engine.set_enabled(guild_id, flag, False)
+
+    results = {}
+    for label, change in (("on", None), ("off here", lambda: disable(guild.id)), ("off", lambda: disable(other.id))):
+        if change:
+            change()
+        samples = []
+        for _ in range(rounds):
+            # Fresh windows so no round trips the spam limit.
+            engine.context.rate_tracker.sweep(now=float("inf"))
+            samples.append(await dispatch_all(replay, messages) / len(messages))
+        results[label] = {
+            "us_per_message": statistics.median(samples) * 1e6,
+            "listener": "message" in engine._listeners,
+        }
+    if replay.errors:
+        raise SystemExit(f"{len(replay.errors)} handler errors, first: {replay.errors[0]}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", default="main", help="entry point module to load")
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DISCORD_TOKEN", "replay")
+    os.environ.setdefault("OWNER_ID", "1")
+    os.environ.setdefault("METRICS_PORT", "0")
+    os.chdir(tempfile.mkdtemp(prefix="dispatch-bench-"))
+
+    results = asyncio.run(run(args.target, args.messages, args.rounds))
+    baseline = results["on"]["us_per_message"]
+    print(f"{'protections':<12} {'µs/message':>11} {'vs on':>7}  listener")
+    for label, result in results.items():
+        cost = result["us_per_message"]
+        print(f"{label:<12} {cost:>11.1f} {cost / baseline:>7.2f}  {'yes' if result['listener'] else 'no'}")
+
+
+if __name__ == "__main__":
+    main()
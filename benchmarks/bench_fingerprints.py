@@ -0,0 +1,83 @@
+"""Microbenchmark for the content fingerprint tracker on its own.
+
+Feeds a stream of ordinary chat from many users across channels, with a
+coordinated payload (the same link posted by a rotating set of accounts,
+sometimes with a word changed) mixed in, through FingerprintTracker with
+exact and near-duplicate matching, and through the per-user RateTracker the
+spam check already pays for. Reports microseconds per message, how many
+payloads were flagged, and how many payloads are kept after each quarter of
+the stream, which stays flat however long it runs.
+
+    python benchmarks/bench_fingerprints.py --messages 400000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fingerprints import FingerprintTracker  # noqa: E402
+from rate_tracker import RateTracker  # noqa: E402
+
+WORDS = ("anyone", "up", "for", "a", "game", "later", "tonight", "who", "wants", "to", "play", "ranked",
+         "lol", "that", "was", "close", "gg", "nice", "match", "brb", "dinner", "is", "the", "new", "patch",
+         "out", "yet", "my", "team", "keeps", "losing", "queue", "with", "me", "after", "school", "python",
+         "help", "error", "code", "server", "music", "stream", "watching", "anime", "weekend", "friday")
+PAYLOAD = "FREE NITRO for everyone who joins in the next hour https://free-nitro.example/claim"
+# One message in this many is the payload.
+PAYLOAD_EVERY = 200
+
+
+def stream(count, rng, users=5000, channels=20, rate=500.0):
+    """``(now, guild_id, channel_id, user_id, content)`` at ``rate`` messages per second."""
+    out = []
+    for i in range(count):
+        if i % PAYLOAD_EVERY == 0:
+            content = PAYLOAD if rng.random() < 0.5 else PAYLOAD.replace("hour", rng.choice(("day", "minute")))
+        else:
+            content = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 14)))
+        out.append((i / rate, 1, rng.randrange(channels), rng.randrange(users), content))
+    return out
+
+
+def run(label, tracker, messages):
+    flagged = set()
+    sizes = []
+    quarter = len(messages) // 4
+    start = time.perf_counter()
+    for i, (now, guild_id, channel_id, user_id, content) in enumerate(messages, 1):
+        payload = tracker.hit(guild_id, channel_id, user_id, content, now=now)
+        if payload is not None:
+            flagged.add(id(payload))
+        if i % quarter == 0:
+            sizes.append(len(tracker))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<12} {elapsed / len(messages) * 1e6:>8.1f} µs/message  "
+          f"{len(flagged):>5} flagged  payloads kept {' '.join(f'{size:>6}' for size in sizes)}")
+
+
+def run_rate(messages):
+    tracker = RateTracker()
+    start = time.perf_counter()
+    for now, guild_id, channel_id, user_id, _ in messages:
+        tracker.hit(guild_id, channel_id, user_id, now=now)
+    elapsed = time.perf_counter() - start
+    print(f"{'rate limit':<12} {elapsed / len(messages) * 1e6:>8.1f} µs/message")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    messages = stream(args.messages, random.Random(args.seed))
+    run_rate(messages)
+    run("exact", FingerprintTracker(), messages)
+    run("near dupes", FingerprintTracker(near_duplicates=True), messages)
+
+
+if __name__ == "__main__":
+    main()
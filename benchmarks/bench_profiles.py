@@ -0,0 +1,127 @@
+"""Compare the memory and startup cost of the lean and full runtime profiles.
+
+Builds discord.py's real connection state for each profile and feeds it
+the guild payloads the gateway would deliver: the full profile caches
+every member and presence (what GUILD_CREATE plus member chunking ends up
+holding), the lean one only what GUILD_CREATE carries without presences.
+Reports parse time and traced memory per profile.
+
+    python benchmarks/bench_profiles.py --members 200000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from discord.ext import commands  # noqa: E402
+
+from runtime_profile import RuntimeProfile  # noqa: E402
+
+BOT_ID = 10 ** 17
+GUILD_ID = 2 * 10 ** 17
+# Members per GUILD_MEMBERS_CHUNK payload, fixed by Discord.
+CHUNK_SIZE = 1000
+
+
+def member_payload(rng, user_id, roles):
+    return {
+        "user": {"id": str(user_id), "username": f"user{user_id % 100000}", "discriminator": "0",
+                 "global_name": None, "avatar": f"{rng.getrandbits(128):032x}", "bot": False},
+        "roles": [str(r) for r in rng.sample(roles, rng.randint(0, 3))],
+        "joined_at": "2023-01-01T00:00:00+00:00",
+        "deaf": False, "mute": False, "flags": 0,
+    }
+
+
+def presence_payload(rng, user_id):
+    return {
+        "user": {"id": str(user_id)},
+        "status": rng.choice(["online", "idle", "dnd"]),
+        "client_status": {"desktop": "online"},
+        "activities": [{"name": "Some Game", "type": 0, "created_at": 0}] if rng.random() < 0.4 else [],
+    }
+
+
+def guild_payload(members, roles, channels, full, seed):
+    rng = random.Random(seed)
+    role_ids = [GUILD_ID + 1000 + i for i in range(roles)]
+    data = {
+        "id": str(GUILD_ID), "name": "Big Guild", "owner_id": str(BOT_ID + 1), "member_count": members,
+        "large": True, "unavailable": False, "features": [], "emojis": [], "stickers": [],
+        "roles": [{"id": str(GUILD_ID), "name": "@everyone", "permissions": "0", "position": 0,
+                   "color": 0, "hoist": False, "managed": False, "mentionable": False}]
+        + [{"id": str(r), "name": f"role-{i}", "permissions": "0", "position": i + 1, "color": 0,
+            "hoist": False, "managed": False, "mentionable": False} for i, r in enumerate(role_ids)],
+        "channels": [{"id": str(GUILD_ID + 5000 + i), "type": 0, "name": f"channel-{i}", "position": i,
+                      "permission_overwrites": []} for i in range(channels)],
+        "members": [member_payload(rng, BOT_ID, role_ids)],
+        "presences": [],
+        "voice_states": [],
+        "threads": [],
+        "stage_instances": [],
+        "guild_scheduled_events": [],
+    }
+    if full:
+        for i in range(members - 1):
+            user_id = BOT_ID + 2 + i
+            data["members"].append(member_payload(rng, user_id, role_ids))
+            if rng.random() < 0.3:
+                data["presences"].append(presence_payload(rng, user_id))
+    return data
+
+
+async def measure(name, members, roles, channels):
+    profile = RuntimeProfile(name)
+    payload = guild_payload(members, roles, channels, full=not profile.lean, seed=0)
+
+    # Timed and traced separately: tracing slows parsing down several times.
+    bot = commands.Bot(command_prefix="!", **profile.bot_options())
+    started = time.perf_counter()
+    bot._connection._add_guild_from_data(payload)
+    elapsed = time.perf_counter() - started
+    await bot.close()
+
+    bot = commands.Bot(command_prefix="!", **profile.bot_options())
+    tracemalloc.start()
+    guild = bot._connection._add_guild_from_data(payload)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    await bot.close()
+    return {
+        "profile": name,
+        "intents": [flag for flag, enabled in profile.intents() if enabled],
+        "cached_members": len(guild.members),
+        "chunk_payloads": members // CHUNK_SIZE + 1 if not profile.lean else 0,
+        "parse_seconds": elapsed,
+        "memory_mb": current / 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--members", type=int, default=100000)
+    parser.add_argument("--roles", type=int, default=50)
+    parser.add_argument("--channels", type=int, default=200)
+    args = parser.parse_args()
+
+    results = [asyncio.run(measure(name, args.members, args.roles, args.channels)) for name in ("full", "lean")]
+    for result in results:
+        print(f"== {result['profile']} ==")
+        print(f"  intents          {', '.join(result['intents'])}")
+        print(f"  cached members   {result['cached_members']:,}")
+        print(f"  chunk payloads   {result['chunk_payloads']}")
+        print(f"  guild parse      {result['parse_seconds']:.2f} s")
+        print(f"  guild memory     {result['memory_mb']:.1f} MB")
+    full, lean = results
+    print(f"lean saves {full['memory_mb'] - lean['memory_mb']:.1f} MB and "
+          f"{full['parse_seconds'] - lean['parse_seconds']:.2f} s of parsing, plus "
+          f"{full['chunk_payloads']} member chunk round trips at startup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,423 @@
+"""Replay scripted raids against the bot offline and report how it copes.
+
+Each scenario loads a fresh copy of the entry point (main.py by default)
+in its own scratch directory, connects it to the FakeDiscord stand-in
+instead of the real gateway and REST API, replays an event stream (a
+scripted scenario, or a recorded JSONL event log given with --log; see
+replay_log) and waits for the bot to go quiet. It
+then reports time from first offending event to enforcement, REST calls per
+incident, 429s and peak traced memory. With --check, the run exits
+non-zero when a scenario goes over its budget, so regressions in the
+protection paths fail CI.
+
+    python benchmarks/bench_raid.py
+    python benchmarks/bench_raid.py --scenario nuke --check
+    python benchmarks/bench_raid.py --log benchmarks/recordings/mixed_nuke.jsonl
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import discord  # noqa: E402
+
+from fake_discord import FakeChannel, FakeDiscord, FakeGuild, FakeMessage, FakeUser, FakeWebhook  # noqa: E402
+
+OWNER_ID = 1
+ENFORCEMENT = {"ban", "kick", "timeout", "add_roles", "member_edit"}
+
+# Upper bounds checked by --check. Storm latency is bound by the shared
+# member-edit bucket (10 per 10s per guild), since every spammer needs a
+# timeout or a role change. Join flood latency is bound by the bulk ban
+# bucket: thousands of raiders go 200 per request, 5 requests per 5s.
+BUDGETS = {
+    "nuke": {"p95_latency": 1.0, "rest_per_incident": 10, "errors": 0, "collateral": 0},
+    "join_flood": {"p95_latency": 30.0, "rest_per_incident": 1, "errors": 0, "collateral": 0},
+    "message_storm": {"p95_latency": 35.0, "rest_per_incident": 8, "errors": 0, "collateral": 0},
+    # 50 webhook deletes, a ban and a log message, plus one fetch per channel
+    # for the attacker's burst and one after the bot's own deletions; two
+    # spare fetches for a burst the debounce splits.
+    "webhook_nuke": {"p95_latency": 3.0, "rest_per_incident": 74, "route:channel_webhooks": 22, "errors": 0,
+                     "collateral": 0, "spam_left": 0},
+    # The recording shipped in benchmarks/recordings.
+    "log:mixed_nuke": {"p95_latency": 3.0, "rest_per_incident": 12, "errors": 0, "collateral": 0, "spam_left": 0},
+}
+
+
+class Replay:
+    """One bot instance wired to a fake guild."""
+
+    def __init__(self, target, channels=50, roles=20, members=100, webhooks=0):
+        # bot.py re-exports main's bot, so both must be imported afresh.
+        for name in (target, "main"):
+            sys.modules.pop(name, None)
+        self.module = importlib.import_module(target)
+        self.bot = self.module.bot
+        self.errors = []
+        self.bot.on_error = self._on_error
+        self.bot._connection.user = FakeUser("SecurityBot", bot=True)
+        self.api = FakeDiscord(self.bot)
+        self.guild = FakeGuild(self.api, channels=channels, roles=roles, members=members, webhooks=webhooks)
+        self.bot._connection._guilds[self.guild.id] = self.guild
+        self.incidents = {}
+        self.events = 0
+        # Offending messages and webhooks that should not survive the incident.
+        self.spam = set()
+
+    async def _on_error(self, event, *args, **kwargs):
+        self.errors.append((event, sys.exc_info()[1]))
+
+    async def start(self):
+        await self.bot._async_setup_hook()
+        await self.bot.setup_hook()
+        self.api.dispatch("ready")
+        await self.api.settle(quiet=0.5)
+        # Setup traffic (log channel, Muted role) is not part of the scenario.
+        self.api.calls.clear()
+        self.api.actions.clear()
+        self.api.rate_limited = 0
+
+    def emit(self, event, *args):
+        self.events += 1
+        self.api.dispatch(event, *args)
+
+    def offence(self, actor_id):
+        """Mark the start of an incident for ``actor_id`` if it has not started yet."""
+        self.incidents.setdefault(actor_id, time.monotonic())
+
+    def report(self, name, wall, peak):
+        first_action = {}
+        collateral = set()
+        for kind, target_id, at in self.api.actions:
+            if kind not in ENFORCEMENT:
+                continue
+            if target_id in self.incidents:
+                first_action.setdefault(target_id, at)
+            else:
+                # Bots added by an attacker are expected casualties.
+                member = self.guild.joined.get(target_id)
+                if member is not None and not member.bot:
+                    collateral.add(target_id)
+        deleted = {target_id for kind, target_id, _ in self.api.actions if kind in ("message_delete", "webhook_delete")}
+        latencies = sorted(first_action[a] - t for a, t in self.incidents.items() if a in first_action)
+        rest = sum(self.api.calls.values())
+        return {
+            "scenario": name,
+            "events": self.events,
+            "incidents": len(self.incidents),
+            "handled": len(latencies),
+            "collateral": len(collateral),
+            "p50_latency": statistics.median(latencies) if latencies else None,
+            "p95_latency": latencies[int(len(latencies) * 0.95) - 1] if latencies else None,
+            "max_latency": latencies[-1] if latencies else None,
+            "rest_calls": rest,
+            "rest_per_incident": rest / max(len(self.incidents), 1),
+            "rest_by_route": dict(sorted(self.api.calls.items())),
+            "rate_limited": self.api.rate_limited,
+            "log_embeds": self.guild.log_embeds,
+            "spam_left": len(self.spam - deleted),
+            "peak_memory_mb": peak / 1e6,
+            "errors": len(self.errors),
+            "wall_seconds": wall,
+        }
+
+
+async def nuke(replay, channels=200, interval=0.02):
+    """One attacker deletes channels as fast as they can until banned."""
+    guild, api = replay.guild, replay.api
+    attacker = guild._add_member("nuker")
+    for channel in list(guild.channels)[:channels]:
+        if attacker.id not in guild.members:
+            break
+        replay.offence(attacker.id)
+        guild.channels.remove(channel)
+        replay.emit("guild_channel_delete", channel)
+        api.audit(guild, discord.AuditLogAction.channel_delete, channel, attacker)
+        await asyncio.sleep(interval)
+
+
+async def join_flood(replay, joins=5000, bots=3, newcomers_every=10):
+    """Thousands of fresh accounts join at once among ordinary newcomers, while an attacker adds bots."""
+    guild, api = replay.guild, replay.api
+    attacker = guild._add_member("inviter")
+    established = datetime.now(timezone.utc) - timedelta(days=400)
+    bot_at = set(random.Random(0).sample(range(joins), bots))
+    for i in range(joins):
+        if i in bot_at:
+            member = guild._add_member(f"raid-bot-{i}", bot=True)
+            replay.offence(attacker.id)
+            replay.emit("member_join", member)
+            api.audit(guild, discord.AuditLogAction.bot_add, member, attacker)
+        elif i % newcomers_every == 0:
+            replay.emit("member_join", guild._add_member(f"newcomer-{i}", created_at=established, avatar="a1b2c3"))
+        else:
+            raider = guild._add_member(f"raider-{i}")
+            replay.offence(raider.id)
+            replay.emit("member_join", raider)
+        if i % 100 == 0:
+            await asyncio.sleep(0)
+
+
+async def webhook_nuke(replay, channels=10, per_channel=5, interval=0.01):
+    """One attacker creates webhooks in bursts across channels, next to the integrations' own."""
+    guild, api = replay.guild, replay.api
+    attacker = guild._add_member("hooker")
+    for channel in guild.text_channels[:channels]:
+        for n in range(per_channel):
+            if attacker.id not in guild.members:
+                return
+            replay.offence(attacker.id)
+            webhook = FakeWebhook(channel, f"spam-{n}")
+            channel.hooks.append(webhook)
+            replay.spam.add(webhook.id)
+            replay.emit("webhooks_update", channel)
+            api.audit(guild, discord.AuditLogAction.webhook_create, webhook, attacker)
+            await asyncio.sleep(interval)
+
+
+async def replay_log(replay, path, speed=1.0):
+    """Replay a recorded event log: one JSON object per line.
+
+    Each line has ``at`` (seconds from the start), ``event`` and ``user``,
+    the name of the member acting, added on first use. ``offence: true``
+    marks the line as part of that user's incident. Lines for a member who
+    has been removed are skipped, as their actions would be refused.
+
+        member_join           bot, age_days (account age; default brand new)
+        message               channel, content, everyone
+        guild_channel_create  name
+        guild_channel_delete  channel
+        guild_role_delete     role
+        webhook_create        channel
+
+    ``channel`` and ``role`` index the guild's channels and roles at that
+    point. A first line without ``event`` may give ``guild`` keyword
+    arguments for the fake guild; run_scenario reads it.
+    """
+    guild, api = replay.guild, replay.api
+    users = {}
+    start = time.monotonic()
+    for n, line in enumerate(read_log(path)[1]):
+        delay = start + line["at"] / speed - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        elif n % 100 == 99:
+            await asyncio.sleep(0)
+        event, name = line["event"], line["user"]
+        member = users.get(name)
+        if event == "member_join":
+            created_at = None
+            if "age_days" in line:
+                created_at = datetime.now(timezone.utc) - timedelta(days=line["age_days"])
+            member = users[name] = guild._add_member(name, bot=line.get("bot", False), created_at=created_at)
+        elif member is None:
+            member = users[name] = guild._add_member(name)
+        elif member.id not in guild.members:
+            continue
+        if line.get("offence"):
+            replay.offence(member.id)
+
+        if event == "member_join":
+            replay.emit("member_join", member)
+        elif event == "message":
+            if not member.can_send():
+                continue
+            message = FakeMessage(guild.text_channels[line["channel"]], member, line["content"],
+                                  mention_everyone=line.get("everyone", False))
+            if line.get("offence"):
+                replay.spam.add(message.id)
+            replay.emit("message", message)
+        elif event == "guild_channel_create":
+            channel = FakeChannel(guild, line["name"], len(guild.channels))
+            guild.channels.append(channel)
+            replay.emit("guild_channel_create", channel)
+            api.audit(guild, discord.AuditLogAction.channel_create, channel, member)
+        elif event == "guild_channel_delete":
+            channel = guild.channels.pop(line["channel"])
+            replay.emit("guild_channel_delete", channel)
+            api.audit(guild, discord.AuditLogAction.channel_delete, channel, member)
+        elif event == "guild_role_delete":
+            role = guild.roles.pop(line["role"])
+            replay.emit("guild_role_delete", role)
+            api.audit(guild, discord.AuditLogAction.role_delete, role, member)
+        elif event == "webhook_create":
+            channel = guild.text_channels[line["channel"]]
+            webhook = FakeWebhook(channel, f"hook-{n}")
+            channel.hooks.append(webhook)
+            if line.get("offence"):
+                replay.spam.add(webhook.id)
+            replay.emit("webhooks_update", channel)
+            api.audit(guild, discord.AuditLogAction.webhook_create, webhook, member)
+        else:
+            raise ValueError(f"{path}:{n + 1}: unknown event {event!r}")
+
+
+def read_log(path):
+    """The guild keyword arguments and the event lines of a recorded log."""
+    with open(path) as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    guild_kwargs = {}
+    if lines and "event" not in lines[0]:
+        guild_kwargs = lines.pop(0).get("guild", {})
+    return guild_kwargs, lines
+
+
+WORDS = ("anyone", "up", "for", "a", "game", "later", "tonight", "who", "wants", "to", "play", "ranked",
+         "lol", "that", "was", "close", "gg", "nice", "match", "brb", "dinner", "is", "the", "new", "patch",
+         "out", "yet", "my", "team", "keeps", "losing", "queue", "with", "me", "after", "school")
+
+
+def chatter(rng):
+    """A line of ordinary chat; regular users rarely post the exact same thing."""
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 10)))
+
+
+async def message_storm(replay, spammers=20, per_spammer=12, regulars=1000, regular_messages=2000, duration=15.0):
+    """Spammers flood channels while regular users keep chatting for ``duration`` seconds."""
+    guild = replay.guild
+    rng = random.Random(0)
+    channels = guild.text_channels[:10]
+    spam = [guild._add_member(f"spammer-{i}") for i in range(spammers)]
+    users = [guild._add_member(f"user-{i}") for i in range(regulars)]
+
+    stream = [(rng.choice(users), chatter(rng), False) for _ in range(regular_messages)]
+    for member in spam:
+        for n in range(per_spammer):
+            stream.append((member, "JOIN NOW https://free-nitro.example/claim" if n % 4 == 3 else "buy followers now",
+                           n == per_spammer - 1 and member is spam[0]))
+    rng.shuffle(stream)
+    counts = {}
+    spam_ids = {member.id for member in spam}
+    for i, (author, content, everyone) in enumerate(stream):
+        if not author.can_send():
+            continue
+        counts[author.id] = counts.get(author.id, 0) + 1
+        if author.id in spam_ids and (counts[author.id] > 5 or "https://" in content or everyone):
+            replay.offence(author.id)
+        if everyone:
+            content = "@everyone " + content
+        message = FakeMessage(rng.choice(channels), author, content, mention_everyone=everyone)
+        if author.id in spam_ids:
+            replay.spam.add(message.id)
+        replay.emit("message", message)
+        if i % 50 == 49:
+            await asyncio.sleep(duration * 50 / len(stream))
+
+
+SCENARIOS = {
+    "nuke": (nuke, {"channels": 250}),
+    "join_flood": (join_flood, {}),
+    "message_storm": (message_storm, {}),
+    "webhook_nuke": (webhook_nuke, {"webhooks": 20}),
+}
+
+
+async def run_scenario(name, scenario, guild_kwargs, target, settle):
+    # A scratch directory each, so no scenario restores another's checkpoint
+    # or shares its snapshots, journal or store.
+    os.chdir(tempfile.mkdtemp(prefix="raid-replay-"))
+    replay = Replay(target, **guild_kwargs)
+    await replay.start()
+    tracemalloc.start()
+    started = time.monotonic()
+    await scenario(replay)
+    await replay.api.settle(quiet=settle, timeout=300)
+    wall = time.monotonic() - started - settle
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    for task in asyncio.all_tasks() - {asyncio.current_task()}:
+        task.cancel()
+    return replay.report(name, wall, peak)
+
+
+def print_report(result):
+    def seconds(value):
+        return "-" if value is None else f"{value * 1000:.0f} ms"
+
+    print(f"== {result['scenario']} ==")
+    print(f"  events            {result['events']:,}")
+    print(f"  incidents         {result['handled']}/{result['incidents']} handled, "
+          f"{result['collateral']} innocent members punished")
+    print(f"  event -> action   p50 {seconds(result['p50_latency'])}, p95 {seconds(result['p95_latency'])}, "
+          f"max {seconds(result['max_latency'])}")
+    print(f"  REST calls        {result['rest_calls']} ({result['rest_per_incident']:.1f}/incident), "
+          f"{result['rate_limited']} rate limited")
+    print(f"  by route          {result['rest_by_route']}")
+    print(f"  log embeds        {result['log_embeds']}")
+    print(f"  spam left         {result['spam_left']}")
+    print(f"  peak memory       {result['peak_memory_mb']:.1f} MB")
+    print(f"  handler errors    {result['errors']}")
+    print(f"  wall time         {result['wall_seconds']:.2f} s")
+
+
+def over_budget(result):
+    failures = []
+    for metric, limit in BUDGETS.get(result["scenario"], {}).items():
+        if metric.startswith("route:"):
+            value = result["rest_by_route"].get(metric[6:], 0)
+        else:
+            value = result[metric]
+        if value is None or value > limit:
+            failures.append(f"{result['scenario']}: {metric} = {value} (budget {limit})")
+    if result["handled"] < result["incidents"]:
+        failures.append(f"{result['scenario']}: only {result['handled']}/{result['incidents']} incidents handled")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", default="main", help="entry point module to replay against")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="scenario to run; repeat for several (default: all)")
+    parser.add_argument("--log", action="append", default=[],
+                        help="recorded JSONL event log to replay; repeat for several (alone, skips the scenarios)")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay recorded logs this many times faster")
+    parser.add_argument("--settle", type=float, default=6.0,
+                        help="seconds without activity before a scenario counts as finished")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--check", action="store_true", help="exit 1 if any scenario is over budget")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DISCORD_TOKEN", "replay")
+    os.environ.setdefault("OWNER_ID", str(OWNER_ID))
+    os.environ.setdefault("METRICS_PORT", "0")
+    # Relative paths, such as --json and --log, are taken before each
+    # scenario moves to its scratch directory.
+    if args.json:
+        args.json = os.path.abspath(args.json)
+    runs = [(name, *SCENARIOS[name]) for name in args.scenario or ([] if args.log else list(SCENARIOS))]
+    for path in map(os.path.abspath, args.log):
+        runs.append((f"log:{os.path.splitext(os.path.basename(path))[0]}",
+                     lambda replay, path=path: replay_log(replay, path, args.speed), read_log(path)[0]))
+
+    results = []
+    for name, scenario, guild_kwargs in runs:
+        result = asyncio.run(run_scenario(name, scenario, guild_kwargs, args.target, args.settle))
+        print_report(result)
+        results.append(result)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    failures = [failure for result in results for failure in over_budget(result)]
+    for failure in failures:
+        print(f"OVER BUDGET {failure}")
+    if args.check and failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
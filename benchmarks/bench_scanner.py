@@ -0,0 +1,68 @@
+"""Microbenchmark for the message scanner on its own.
+
+Runs a mixed corpus (plain chat, allowed and blocked links, mass mentions,
+banned terms) through MessageScanner and through the old three-scan check
+for comparison, and reports messages per second for each.
+
+    python benchmarks/bench_scanner.py --messages 200000
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scanner import MessageScanner  # noqa: E402
+
+LEGACY_LINK_PATTERN = re.compile(r"(https?://\S+|www\.\S+)")
+
+SAMPLES = [
+    "hey everyone how's it going",
+    "lol that was such a good game last night, we should run it back later",
+    "check this out https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+    "free nitro at https://dlscord-gift.ru/claim now!!",
+    "@everyone join my server www.totally-legit.xyz",
+    "ok",
+    "can someone help me with my python code? it keeps throwing a KeyError",
+    "https://cdn.discordapp.com/attachments/1/2/image.png",
+    "@here raid in 5 minutes",
+    "this is a scam, do not click anything",
+]
+
+
+def legacy_scan(content):
+    return (bool(LEGACY_LINK_PATTERN.search(content)),
+            "@everyone" in content or "@here" in content)
+
+
+def run(label, func, corpus):
+    start = time.perf_counter()
+    for content in corpus:
+        func(content)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {len(corpus) / elapsed:>14,.0f} msg/s  ({elapsed * 1000:.1f} ms for {len(corpus):,})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus = [rng.choice(SAMPLES) for _ in range(args.messages)]
+    scanner = MessageScanner(
+        allowed_domains={"youtube.com", "discordapp.com", "tenor.com"},
+        blocked_domains={"dlscord-gift.ru"},
+        banned_terms={"free nitro", "scam"},
+    )
+
+    run("scanner", scanner.scan, corpus)
+    run("legacy", legacy_scan, corpus)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,429 @@
+"""Offline stand-in for the Discord gateway and REST API.
+
+The objects here duck-type the parts of discord.py's models that the
+protection handlers touch. Every REST-backed method goes through
+``FakeDiscord.request``, which applies per-route rate limits and latency
+and records each call. Mutating calls made by the bot feed their own
+gateway events back, including audit log entries, the same way Discord does.
+"""
+import asyncio
+import itertools
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timezone
+
+import discord
+
+# Per-route limits as (requests, seconds), keyed by route name. They are
+# close to what Discord hands out for these routes, not exact values.
+ROUTE_LIMITS = {
+    "ban": (5, 1.0),
+    "kick": (5, 1.0),
+    "member_edit": (10, 10.0),
+    "channel_create": (5, 5.0),
+    "channel_edit": (5, 5.0),
+    "channel_delete": (5, 5.0),
+    "role_create": (5, 5.0),
+    "role_edit": (5, 5.0),
+    "role_delete": (5, 5.0),
+    "message_send": (5, 5.0),
+    "message_delete": (5, 1.0),
+    "bulk_delete": (5, 5.0),
+    "audit_logs": (5, 5.0),
+}
+DEFAULT_LIMIT = (5, 5.0)
+GLOBAL_LIMIT = (50, 1.0)
+
+_ids = itertools.count(1)
+
+
+def snowflake():
+    return (discord.utils.time_snowflake(datetime.now(timezone.utc)) | (next(_ids) & 0x3FFFFF))
+
+
+class _Limiter:
+    def __init__(self, limit, per):
+        self.limit = limit
+        self.per = per
+        self.calls = deque()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait for a slot; return True if the caller had to wait (a 429)."""
+        async with self.lock:
+            now = time.monotonic()
+            while self.calls and now - self.calls[0] >= self.per:
+                self.calls.popleft()
+            limited = len(self.calls) >= self.limit
+            if limited:
+                await asyncio.sleep(self.per - (now - self.calls[0]))
+                self.calls.popleft()
+            self.calls.append(time.monotonic())
+            return limited
+
+
+class FakeDiscord:
+    """Simulated REST API plus the gateway that feeds events to a bot."""
+
+    def __init__(self, bot, latency=0.05, audit_lag=0.08):
+        self.bot = bot
+        self.latency = latency
+        self.audit_lag = audit_lag
+        self.calls = defaultdict(int)
+        self.rate_limited = 0
+        self.in_flight = 0
+        self.last_activity = time.monotonic()
+        self.actions = []
+        self._limiters = {}
+        self._global = _Limiter(*GLOBAL_LIMIT)
+
+    async def request(self, route, major_id):
+        self.in_flight += 1
+        try:
+            key = (route, major_id)
+            limiter = self._limiters.get(key)
+            if limiter is None:
+                limiter = self._limiters[key] = _Limiter(*ROUTE_LIMITS.get(route, DEFAULT_LIMIT))
+            if await self._global.acquire():
+                self.rate_limited += 1
+            if await limiter.acquire():
+                self.rate_limited += 1
+            await asyncio.sleep(self.latency)
+            self.calls[route] += 1
+        finally:
+            self.in_flight -= 1
+            self.last_activity = time.monotonic()
+
+    def record(self, kind, target_id):
+        self.actions.append((kind, target_id, time.monotonic()))
+
+    # Gateway side
+
+    def dispatch(self, event, *args):
+        self.last_activity = time.monotonic()
+        self.bot.dispatch(event, *args)
+
+    def audit(self, guild, action, target, user):
+        """Emit the audit log entry for an action after the usual gateway lag."""
+        entry = FakeAuditEntry(guild, action, target, user)
+        guild.audit_log.append(entry)
+
+        async def push():
+            await asyncio.sleep(self.audit_lag)
+            self.dispatch("audit_log_entry_create", entry)
+
+        asyncio.ensure_future(push())
+        return entry
+
+    async def settle(self, quiet=2.0, timeout=60.0):
+        """Wait until no REST call or event has happened for ``quiet`` seconds."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            if self.in_flight == 0 and time.monotonic() - self.last_activity >= quiet:
+                return True
+        return False
+
+
+class FakeAuditEntry:
+    def __init__(self, guild, action, target, user):
+        self.id = snowflake()
+        self.guild = guild
+        self.action = action
+        self.target = discord.Object(id=target.id)
+        self.user = user
+        self.user_id = user.id
+        self.created_at = datetime.now(timezone.utc)
+        self.changes = None
+
+
+class FakeUser:
+    def __init__(self, name, bot=False, created_at=None, avatar=None):
+        self.id = snowflake()
+        self.name = name
+        self.bot = bot
+        self.created_at = created_at or datetime.now(timezone.utc)
+        self.avatar = avatar
+
+    @property
+    def mention(self):
+        return f"<@{self.id}>"
+
+    def __str__(self):
+        return self.name
+
+
+class FakeMember(FakeUser):
+    def __init__(self, guild, name, bot=False, created_at=None, avatar=None):
+        super().__init__(name, bot=bot, created_at=created_at, avatar=avatar)
+        self.guild = guild
+        self.roles = [guild.default_role]
+        self.timed_out_until = None
+
+    @property
+    def guild_permissions(self):
+        value = 0
+        for role in self.roles:
+            value |= role.permissions.value
+        return discord.Permissions(value)
+
+    def can_send(self):
+        """Discord drops messages from timed-out members and the Muted role."""
+        return self.timed_out_until is None and not any(role.name == "Muted" for role in self.roles)
+
+    async def timeout(self, duration, reason=None):
+        await self.guild.api.request("member_edit", self.guild.id)
+        self.guild.api.record("timeout", self.id)
+        self.timed_out_until = duration
+
+    async def add_roles(self, *roles, reason=None):
+        await self.guild.api.request("member_edit", self.guild.id)
+        self.guild.api.record("add_roles", self.id)
+        self.roles.extend(role for role in roles if role not in self.roles)
+
+    async def edit(self, roles=None, reason=None, **_):
+        await self.guild.api.request("member_edit", self.guild.id)
+        self.guild.api.record("member_edit", self.id)
+        if roles is not None:
+            self.roles = [self.guild.default_role] + list(roles)
+
+    async def kick(self, reason=None):
+        await self.guild.kick(self, reason=reason)
+
+    async def ban(self, reason=None):
+        await self.guild.ban(self, reason=reason)
+
+
+class FakeRole:
+    def __init__(self, guild, name, position, permissions=0, role_id=None):
+        self.id = role_id or snowflake()
+        self.guild = guild
+        self.name = name
+        self.position = position
+        self.permissions = discord.Permissions(permissions)
+        self.color = self.colour = discord.Colour(0)
+        self.hoist = False
+        self.mentionable = False
+        self.managed = False
+
+    def is_default(self):
+        return self.id == self.guild.id
+
+    @property
+    def mention(self):
+        return f"<@&{self.id}>"
+
+    async def delete(self, reason=None):
+        api = self.guild.api
+        await api.request("role_delete", self.guild.id)
+        api.record("role_delete", self.id)
+        if self in self.guild.roles:
+            self.guild.roles.remove(self)
+            api.audit(self.guild, discord.AuditLogAction.role_delete, self, self.guild.me)
+            api.dispatch("guild_role_delete", self)
+
+    async def edit(self, reason=None, **_):
+        await self.guild.api.request("role_edit", self.guild.id)
+
+
+class FakeWebhook:
+    def __init__(self, channel, name):
+        self.id = snowflake()
+        self.guild = channel.guild
+        self.channel = channel
+        self.channel_id = channel.id
+        self.name = name
+
+    async def delete(self, reason=None):
+        api = self.guild.api
+        await api.request("webhook_delete", self.id)
+        api.record("webhook_delete", self.id)
+        if self in self.channel.hooks:
+            self.channel.hooks.remove(self)
+            api.dispatch("webhooks_update", self.channel)
+
+
+class FakeChannel:
+    def __init__(self, guild, name, position, kind="text", category_id=None):
+        self.id = snowflake()
+        self.guild = guild
+        self.name = name
+        self.position = position
+        self.type = kind
+        self.category_id = category_id
+        self.overwrites = {}
+        self.topic = None
+        self.nsfw = False
+        self.slowmode_delay = 0
+        self.messages = {}
+        self.hooks = []
+
+    @property
+    def mention(self):
+        return f"<#{self.id}>"
+
+    def overwrites_for(self, target):
+        return self.overwrites.get(target, discord.PermissionOverwrite())
+
+    async def set_permissions(self, target, reason=None, **perms):
+        await self.guild.api.request("channel_edit", self.id)
+        self.overwrites[target] = discord.PermissionOverwrite(**perms)
+
+    async def send(self, content=None, embed=None, embeds=None):
+        await self.guild.api.request("message_send", self.id)
+        self.guild.api.record("log_message", self.id)
+        self.guild.log_embeds += len(embeds or [embed])
+
+    async def webhooks(self):
+        await self.guild.api.request("channel_webhooks", self.id)
+        return list(self.hooks)
+
+    async def delete_messages(self, messages, reason=None):
+        """One message goes through the single delete route, as in discord.py."""
+        api = self.guild.api
+        await api.request("message_delete" if len(messages) == 1 else "bulk_delete", self.id)
+        for message in messages:
+            api.record("message_delete", message.id)
+
+    async def delete(self, reason=None):
+        api = self.guild.api
+        await api.request("channel_delete", self.id)
+        api.record("channel_delete", self.id)
+        if self in self.guild.channels:
+            self.guild.channels.remove(self)
+            api.audit(self.guild, discord.AuditLogAction.channel_delete, self, self.guild.me)
+            api.dispatch("guild_channel_delete", self)
+
+
+class FakeMessage:
+    def __init__(self, channel, author, content, mention_everyone=False, raw_mentions=()):
+        self.id = snowflake()
+        # commands.Context reads the connection state off the message.
+        self._state = channel.guild.api.bot._connection
+        self.channel = channel
+        self.guild = channel.guild
+        self.author = author
+        self.content = content
+        self.mention_everyone = mention_everyone
+        self.raw_mentions = list(raw_mentions)
+        self.created_at = datetime.now(timezone.utc)
+
+    async def delete(self):
+        await self.guild.api.request("message_delete", self.channel.id)
+        self.guild.api.record("message_delete", self.id)
+
+
+class FakeGuild:
+    def __init__(self, api, name="Replay Guild", channels=50, roles=20, members=100, webhooks=0):
+        self.api = api
+        self.id = snowflake()
+        self.name = name
+        self.audit_log = []
+        self.log_embeds = 0
+        self.roles = [FakeRole(self, "@everyone", 0, role_id=self.id)]
+        self.roles += [FakeRole(self, f"role-{i}", i + 1) for i in range(roles)]
+        self.channels = [FakeChannel(self, f"channel-{i}", i) for i in range(channels)]
+        self.members = {}
+        # Everyone who ever joined, so removed members can still be looked up.
+        self.joined = {}
+        self.verification_level = discord.VerificationLevel.low
+        self.features = []
+        self.me = self._add_member(api.bot.user.name, bot=True, user_id=api.bot.user.id)
+        for i in range(members):
+            self._add_member(f"member-{i}")
+        for i in range(webhooks):
+            channel = self.channels[i % len(self.channels)]
+            channel.hooks.append(FakeWebhook(channel, f"integration-{i}"))
+
+    def _add_member(self, name, bot=False, user_id=None, **kwargs):
+        member = FakeMember(self, name, bot=bot, **kwargs)
+        if user_id is not None:
+            member.id = user_id
+        self.members[member.id] = member
+        self.joined[member.id] = member
+        return member
+
+    @property
+    def default_role(self):
+        return self.roles[0]
+
+    @property
+    def text_channels(self):
+        return [c for c in self.channels if c.type == "text"]
+
+    @property
+    def member_count(self):
+        return len(self.members)
+
+    def get_member(self, user_id):
+        return self.members.get(user_id)
+
+    def get_role(self, role_id):
+        return discord.utils.get(self.roles, id=role_id)
+
+    def get_channel(self, channel_id):
+        return discord.utils.get(self.channels, id=channel_id)
+
+    async def webhooks(self):
+        await self.api.request("guild_webhooks", self.id)
+        return [webhook for channel in self.channels for webhook in channel.hooks]
+
+    async def audit_logs(self, action=None, limit=100, **_):
+        await self.api.request("audit_logs", self.id)
+        matched = [e for e in reversed(self.audit_log) if action is None or e.action == action]
+        for entry in matched[:limit]:
+            yield entry
+
+    async def ban(self, user, reason=None, **_):
+        await self.api.request("ban", self.id)
+        self.api.record("ban", user.id)
+        member = self.members.pop(user.id, None)
+        self.api.audit(self, discord.AuditLogAction.ban, user, self.me)
+        self.api.dispatch("member_ban", self, user)
+        if member is not None:
+            self.api.dispatch("member_remove", member)
+
+    async def bulk_ban(self, users, reason=None, **_):
+        """The discord.py 2.4 wrapper around the bulk ban endpoint."""
+        await self.api.request("bulk_ban", self.id)
+        for user in users:
+            self.api.record("ban", user.id)
+            member = self.members.pop(user.id, None)
+            self.api.audit(self, discord.AuditLogAction.ban, user, self.me)
+            self.api.dispatch("member_ban", self, user)
+            if member is not None:
+                self.api.dispatch("member_remove", member)
+
+    async def edit(self, reason=None, verification_level=None, invites_disabled=None, **_):
+        await self.api.request("guild_edit", self.id)
+        self.api.record("guild_edit", self.id)
+        if verification_level is not None:
+            self.verification_level = verification_level
+        if invites_disabled is not None:
+            self.features = [f for f in self.features if f != "INVITES_DISABLED"]
+            if invites_disabled:
+                self.features.append("INVITES_DISABLED")
+
+    async def kick(self, member, reason=None):
+        await self.api.request("kick", self.id)
+        self.api.record("kick", member.id)
+        if self.members.pop(member.id, None) is not None:
+            self.api.audit(self, discord.AuditLogAction.kick, member, self.me)
+            self.api.dispatch("member_remove", member)
+
+    async def create_text_channel(self, name, reason=None, position=None, **_):
+        await self.api.request("channel_create", self.id)
+        channel = FakeChannel(self, name, len(self.channels) if position is None else position)
+        self.channels.append(channel)
+        self.api.audit(self, discord.AuditLogAction.channel_create, channel, self.me)
+        self.api.dispatch("guild_channel_create", channel)
+        return channel
+
+    async def create_role(self, name, reason=None, **_):
+        await self.api.request("role_create", self.id)
+        role = FakeRole(self, name, 1)
+        self.roles.append(role)
+        self.api.audit(self, discord.AuditLogAction.role_create, role, self.me)
+        self.api.dispatch("guild_role_create", role)
+        return role
+
@@ -0,0 +1,95 @@
+import asyncio
+import atexit
+import json
+import logging
+import os
+import time
+
+log = logging.getLogger(__name__)
+
+CHECKPOINT_INTERVAL = 60
+
+
+def checkpoint_path(shard_ids=None, directory="state"):
+    """One checkpoint file per shard slice, so launcher processes never share one."""
+    suffix = "-" + "-".join(map(str, shard_ids)) if shard_ids else ""
+    return os.path.join(directory, f"checkpoint{suffix}.json")
+
+
+class Checkpoint:
+    """Periodic snapshot of in-memory protection state, reloaded at boot.
+
+    Components register under a name with two methods: ``checkpoint()``
+    returns their state as plain JSON data, built on the event loop, and
+    ``restore(state, elapsed)`` takes it back. ``elapsed`` is the wall time
+    since the checkpoint was written, so state kept against the monotonic
+    clock can be saved as ages and rebased after the restart. The file is
+    replaced atomically from an executor, and written once more at exit.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._parts = {}
+        self._loaded = False
+        atexit.register(self.write)
+
+    def register(self, name, part):
+        self._parts[name] = part
+
+    def load(self):
+        """Restore every registered part from the file; return the names restored."""
+        self._loaded = True
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError) as exc:
+            log.warning("Ignoring unreadable checkpoint %s: %s", self.path, exc)
+            return []
+        elapsed = max(time.time() - data["saved_at"], 0.0)
+        restored = []
+        for name, part in self._parts.items():
+            state = data["parts"].get(name)
+            if state is None:
+                continue
+            try:
+                part.restore(state, elapsed)
+            except Exception:
+                log.exception("Could not restore %s from the checkpoint", name)
+            else:
+                restored.append(name)
+        return restored
+
+    async def save(self):
+        """Capture every part on the loop and write the file off it."""
+        data = self._capture()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, _write_atomic, self.path, data)
+
+    def write(self):
+        """Capture and write synchronously, for shutdown."""
+        # Before load(), the parts hold nothing worth replacing the file with.
+        if self._loaded:
+            _write_atomic(self.path, self._capture())
+
+    def _capture(self):
+        parts = {}
+        for name, part in self._parts.items():
+            try:
+                parts[name] = part.checkpoint()
+            except Exception:
+                log.exception("Could not checkpoint %s", name)
+        return {"saved_at": time.time(), "parts": parts}
+
+
+def _write_atomic(path, data):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
@@ -0,0 +1,121 @@
+import typing
+
+import discord
+from discord.ext import commands
+
+from journal import parse_time
+from metrics import metrics
+
+INCIDENT_FILTERS = ("user", "action", "since", "until", "limit")
+MAX_INCIDENTS = 25
+
+
+class Admin(commands.Cog):
+    """Owner commands for the whitelist, the incident journal and runtime stats"""
+
+    def __init__(self, context):
+        self.context = context
+
+    @commands.command()
+    @commands.is_owner()
+    async def security_stats(self, ctx):
+        """Show handler latency, REST usage and queue depths"""
+        embed = discord.Embed(title="📈 Security Stats", color=discord.Color.blue())
+        for name, value in metrics.report():
+            embed.add_field(name=name, value=value, inline=False)
+        await ctx.send(embed=embed)
+
+    # ========================
+    # INCIDENT JOURNAL
+    # ========================
+    @commands.command()
+    @commands.guild_only()
+    @commands.is_owner()
+    async def incidents(self, ctx, *filters: str):
+        """Search this server's incident journal: `!incidents user:@x action:ban since:2h until:30m limit:10`"""
+        query = {"since": "24h", "limit": "10"}
+        for item in filters:
+            name, _, value = item.partition(":")
+            if name not in INCIDENT_FILTERS or not value:
+                await ctx.send(f"❌ Unknown filter `{item}`. Use {', '.join(f'`{f}:`' for f in INCIDENT_FILTERS)}")
+                return
+            query[name] = value
+        try:
+            since = parse_time(query["since"])
+            until = parse_time(query["until"]) if "until" in query else None
+            actor_id = int(query["user"].strip("<@!>")) if "user" in query else None
+            limit = min(int(query["limit"]), MAX_INCIDENTS)
+        except ValueError:
+            await ctx.send("❌ Times are `30m`, `2h`, `7d` or an ISO date; users a mention or ID; limit a number.")
+            return
+
+        found = await self.context.journal.query(ctx.guild.id, actor_id=actor_id, action=query.get("action"),
+                                                 since=since, until=until, limit=limit)
+        embed = discord.Embed(title="🗂️ Incidents", color=discord.Color.blue())
+        lines = []
+        for incident in found:
+            who = f"<@{incident.actor_id}>" if incident.actor_id else "—"
+            lines.append(f"<t:{int(incident.at)}:f> `{incident.action}` {who} {incident.title}")
+        embed.description = "\n".join(lines)[:4096] if lines else "No incidents match"
+        embed.set_footer(text=f"Newest first, since {query['since']}, at most {limit}")
+        await ctx.send(embed=embed)
+
+    # ========================
+    # ENHANCED WHITELIST SYSTEM
+    # ========================
+    @commands.command()
+    @commands.guild_only()
+    @commands.is_owner()
+    async def whitelist_show(self, ctx):
+        """Show the users and roles trusted in this server"""
+        trust = self.context.trust
+        users = []
+        for user_id in trust.users(ctx.guild.id):
+            user = ctx.bot.get_user(user_id)
+            users.append(f"{user.mention if user else 'Unknown user'} (ID: {user_id})")
+        roles = []
+        for role_id in trust.roles(ctx.guild.id):
+            role = ctx.guild.get_role(role_id)
+            roles.append(f"{role.mention if role else 'Deleted role'} (ID: {role_id})")
+
+        embed = discord.Embed(title="🔐 Whitelisted Users", color=discord.Color.blue())
+        embed.description = "\n".join(users) if users else "No whitelisted users"
+        if roles:
+            embed.add_field(name="Trusted Roles", value="\n".join(roles)[:1024], inline=False)
+        await ctx.send(embed=embed)
+
+    @commands.command()
+    @commands.guild_only()
+    @commands.is_owner()
+    async def whitelist(self, ctx, target: typing.Union[discord.Member, discord.Role]):
+        """Trust a user, or everyone holding a role, in this server"""
+        if isinstance(target, discord.Role):
+            self.context.trust.add_role(ctx.guild, target.id)
+        else:
+            self.context.trust.add_user(ctx.guild.id, target.id)
+        await ctx.send(f"✅ {target} has been added to the whitelist!")
+        await self.context.report(ctx.guild, "✅ WHITELIST ADDED", discord.Color.green(), {
+            "Role" if isinstance(target, discord.Role) else "User": f"{target} ({target.id})",
+            "Action": "Added to whitelist",
+            "By": ctx.author.mention
+        }, action="whitelist_add", actor=ctx.author, target=target)
+
+    @commands.command()
+    @commands.guild_only()
+    @commands.is_owner()
+    async def whitelist_remove(self, ctx, target: typing.Union[discord.Member, discord.Role]):
+        """Remove a user or role from this server's whitelist"""
+        if isinstance(target, discord.Role):
+            self.context.trust.remove_role(ctx.guild, target.id)
+        else:
+            self.context.trust.remove_user(ctx.guild.id, target.id)
+        await ctx.send(f"❌ {target} has been removed from the whitelist!")
+        await self.context.report(ctx.guild, "❌ WHITELIST REMOVED", discord.Color.red(), {
+            "Role" if isinstance(target, discord.Role) else "User": f"{target} ({target.id})",
+            "Action": "Removed from whitelist",
+            "By": ctx.author.mention
+        }, action="whitelist_remove", actor=ctx.author, target=target)
+
+
+async def setup(bot):
+    await bot.add_cog(Admin(bot.get_cog("Protections").context))
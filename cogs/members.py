@@ -0,0 +1,131 @@
+import discord
+
+from engine import Detector
+from permissions import dangerous
+from runtime_profile import resolve_member
+
+Action = discord.AuditLogAction
+
+
+class RoleGrantGuard(Detector):
+    """Strips unauthorized role grants and bans whoever made them.
+
+    The full profile sees every member update. The lean profile caches too
+    few members for that and follows the audit log instead. Roles without
+    dangerous permissions can be handed out freely, unless they are trusted.
+    """
+
+    flag = "role_grants"
+    summary = "Undo grants of dangerous roles by untrusted users and ban the granter"
+
+    def __init__(self, context):
+        super().__init__(context)
+        self.events = ("audit_log_entry_create",) if context.profile.lean else ("member_update",)
+
+    async def on_member_update(self, before, after):
+        sec = self.context
+        # Only roles carrying dangerous permissions or trust are worth an audit log fetch.
+        trusted = sec.trust.roles(after.guild.id)
+        added_roles = [role for role in after.roles
+                       if role not in before.roles and (dangerous(role.permissions.value) or role.id in trusted)]
+        if added_roles:
+            entry = await sec.audit_index.resolve(after.guild, Action.member_role_update, after.id)
+            if entry and not sec.trust.is_trusted(after.guild.id, entry.user):
+                if entry.user.id != after.id or self.grants_trust(after.guild, added_roles):
+                    await self.punish(after, added_roles, entry.user)
+
+    async def on_audit_log_entry_create(self, entry):
+        sec = self.context
+        if entry.action is not Action.member_role_update:
+            return
+        added_roles = [entry.guild.get_role(role.id) for role in getattr(entry.after, "roles", [])]
+        trusted = sec.trust.roles(entry.guild.id)
+        added_roles = [role for role in added_roles
+                       if role is not None and (dangerous(role.permissions.value) or role.id in trusted)]
+        if not added_roles:
+            return
+        if entry.user_id == entry.target.id and not self.grants_trust(entry.guild, added_roles):
+            return
+        actor = entry.user or await sec.audit_index.actor(entry.guild, entry.user_id)
+        if sec.trust.is_trusted(entry.guild.id, actor):
+            return
+        member = await resolve_member(entry.guild, entry.target.id)
+        if member is None:
+            return
+        await self.punish(member, added_roles, actor)
+
+    def grants_trust(self, guild, roles):
+        """Whether any of ``roles`` is trusted; nobody may hand those to themselves."""
+        trusted = self.context.trust.roles(guild.id)
+        return any(role.id in trusted for role in roles)
+
+    async def punish(self, member, added_roles, assigner):
+        """Strip unauthorized roles from a member and ban whoever granted them"""
+        sec = self.context
+        sec.scheduler.remove_roles(member, added_roles, reason="Unauthorized role assignment")
+        sec.scheduler.timeout(member, sec.punishment_duration, reason="Received unauthorized roles")
+
+        # Ban the user who assigned the roles, unless already punished
+        if not sec.verdicts.claim(member.guild, assigner, "BANNED", "member_role_update", member):
+            return
+        sec.scheduler.ban(member.guild, assigner, reason="Unauthorized role assignment")
+        await sec.report(member.guild, "🚨 Unauthorized Role Assignment", discord.Color.red(), {
+            "Assigner": f"{assigner} ({assigner.id}) [BANNED]",
+            "Target": f"{member} ({member.id}) [TIMEOUT + ROLES REMOVED]",
+            "Roles": ', '.join([role.name for role in added_roles]),
+            "Reason": "Unauthorized role assignment"
+        }, action="role_grant", actor=assigner, target=member)
+
+
+class BanGuard(Detector):
+    """Kicks untrusted users who ban members"""
+
+    flag = "bans"
+    summary = "Kick untrusted users who ban members and clear their roles"
+    events = ("member_ban",)
+
+    async def on_member_ban(self, guild, user):
+        sec = self.context
+        entry = await sec.audit_index.resolve(guild, Action.ban, user.id)
+        if entry and not sec.trust.is_trusted(guild.id, entry.user):
+            member = await resolve_member(guild, entry.user.id)
+            if member:
+                if not sec.verdicts.claim(guild, entry.user, "KICKED", "ban", user):
+                    return
+                sec.scheduler.strip_roles(member, reason="Unauthorized ban attempt")
+                sec.scheduler.kick(member, reason="Unauthorized ban attempt")
+                await sec.report(guild, "🚨 Unauthorized Ban Attempt", discord.Color.red(), {
+                    "User": f"{entry.user} ({entry.user.id}) [KICKED]",
+                    "Target": f"{user} ({user.id})",
+                    "Action": "Kicked + Roles Cleared",
+                    "Reason": "Unauthorized ban attempt"
+                }, action="ban", actor=entry.user, target=user)
+
+
+class BotGuard(Detector):
+    """Auto-ban for unauthorized bot additions"""
+
+    flag = "bot_protection"
+    summary = "Kick bots added by untrusted users and ban the inviter"
+    events = ("member_join",)
+
+    async def on_member_join(self, member):
+        if not member.bot:
+            return
+        sec = self.context
+        entry = await sec.audit_index.resolve(member.guild, Action.bot_add, member.id)
+        if entry and not sec.trust.is_trusted(member.guild.id, entry.user):
+            sec.scheduler.kick(member, reason="Unauthorized bot")
+            if not sec.verdicts.claim(member.guild, entry.user, "BANNED", "bot_add", member):
+                return
+            sec.scheduler.ban(member.guild, entry.user, reason="Unauthorized bot addition")
+            await sec.report(member.guild, "🤖 Unauthorized Bot Added", discord.Color.red(), {
+                "Inviter": f"{entry.user} ({entry.user.id}) [BANNED]",
+                "Bot": f"{member} ({member.id}) [KICKED]"
+            }, action="bot_add", actor=entry.user, target=member)
+
+
+async def setup(bot):
+    engine = bot.get_cog("Protections")
+    for detector in (RoleGrantGuard, BanGuard, BotGuard):
+        await engine.add_detector(detector(engine.context))
@@ -0,0 +1,180 @@
+from datetime import timedelta
+
+import discord
+from discord.ext import commands
+
+from engine import Detector
+from fingerprints import FingerprintTracker
+from metrics import metrics
+
+# Also match copies with a word or two changed, at roughly four times the
+# per-message cost of exact matching.
+NEAR_DUPLICATES = False
+# Posters of a coordinated payload are timed out, not muted: ordinary
+# copy-paste chat ("gg well played everyone") can trip the check too.
+DUPLICATE_TIMEOUT = timedelta(minutes=10)
+
+
+class SpamGuard(Detector):
+    """Mutes users who post faster than the guild or channel spam limit and purges the burst.
+
+    Every message is also indexed by author, so the burst can be bulk
+    deleted at once, and the link filter can clear a poster's messages too.
+    """
+
+    flag = "anti_spam"
+    summary = "Mute users who exceed the spam limit and delete their recent messages"
+    events = ("message",)
+
+    async def on_message(self, message):
+        sec = self.context
+        if sec.recent_messages.add(message):
+            # Posted after a purge, before the punishment landed
+            sec.purge(message.author, reason="Spamming")
+        burst = sec.rate_tracker.hit(message.guild.id, message.channel.id, message.author.id)
+        if not burst or sec.trust.is_trusted(message.guild.id, message.author):
+            return
+        # The Muted role, or a timeout while the role is provisioned
+        await sec.mute_roles.mute(message.author, sec.punishment_duration)
+        deleted = sec.purge(message.author, message, reason="Spamming")
+        _, window = sec.rate_tracker.limit_for(message.guild.id, message.channel.id)
+        await sec.report(message.guild, "⚠️ User Muted for Spamming", discord.Color.orange(), {
+            "User": message.author.mention,
+            "Count": f"{burst} messages/{window:g}s",
+            "Action": f"Muted + {deleted} messages deleted"
+        }, action="spam", actor=message.author)
+
+    @commands.command()
+    @commands.guild_only()
+    @commands.is_owner()
+    async def spam_limit(self, ctx, count: int, seconds: float, channel: discord.TextChannel = None):
+        """Set the spam threshold for this server, or for one channel"""
+        if count < 1 or seconds <= 0:
+            await ctx.send("❌ Give at least 1 message and a window longer than 0 seconds.")
+            return
+        self.context.rate_tracker.set_limit(ctx.guild.id, count, seconds, channel_id=channel.id if channel else None)
+        scope = channel.mention if channel else "this server"
+        await ctx.send(f"✅ Spam limit for {scope} set to {count} messages/{seconds:g}s")
+
+
+class DuplicateGuard(Detector):
+    """Deletes a payload posted by many users or across channels and times out its posters"""
+
+    flag = "duplicate_spam"
+    summary = "Delete coordinated copies of one message and time out the posters"
+    events = ("message",)
+
+    def __init__(self, context):
+        super().__init__(context)
+        self.tracker = FingerprintTracker(near_duplicates=NEAR_DUPLICATES)
+        metrics.gauge("fingerprints_tracked", self.tracker.__len__)
+        context.checkpoint.register("fingerprints", self.tracker)
+
+    async def on_message(self, message):
+        sec = self.context
+        if sec.trust.is_trusted(message.guild.id, message.author):
+            return
+        payload = self.tracker.hit(message.guild.id, message.channel.id, message.author.id, message.content, message)
+        if payload is None:
+            return
+        first = not payload.punished
+        copies = payload.take_messages()
+        channels = {}
+        for copy in copies:
+            channels.setdefault(copy.channel, set()).add(copy.id)
+        for channel, message_ids in channels.items():
+            sec.scheduler.purge(channel, message_ids, reason="Coordinated spam")
+        for copy in copies:
+            if copy.author.id not in payload.punished:
+                payload.punished.add(copy.author.id)
+                sec.scheduler.timeout(copy.author, DUPLICATE_TIMEOUT, reason="Coordinated spam")
+        if first:
+            await sec.report(message.guild, "📑 Coordinated Spam Detected", discord.Color.orange(), {
+                "Users": str(len(payload.users)),
+                "Channels": str(len(payload.channels)),
+                "Action": f"Copies deleted + posters timed out for {DUPLICATE_TIMEOUT.seconds // 60} min",
+                "Content": message.content[:1024] or "(empty)"
+            }, action="duplicate_spam", actor=message.author)
+
+    @commands.command()
+    @commands.guild_only()
+    @commands.is_owner()
+    async def duplicate_limit(self, ctx, users: int, channels: int):
+        """Set how many users, or channels, posting one message within 30s count as spam"""
+        if users < 2 or channels < 2:
+            await ctx.send("❌ Give at least 2 users and 2 channels; one message once is not spam.")
+            return
+        self.tracker.set_limit(ctx.guild.id, users, channels)
+        await ctx.send(f"✅ Duplicate limit set to {users} users or {channels} channels")
+
+
+class LinkGuard(Detector):
+    """Deletes links to domains that are not allowed, with the poster's recent messages"""
+
+    flag = "anti_links"
+    summary = "Delete links and the poster's recent messages and time out the poster"
+    events = ("message",)
+
+    async def on_message(self, message):
+        sec = self.context
+        if sec.trust.is_trusted(message.guild.id, message.author):
+            return
+        scan = sec.scan(message)
+        if scan.links:
+            sec.scheduler.timeout(message.author, timedelta(minutes=10), reason="Link posting")
+            deleted = sec.purge(message.author, message, reason="Link posting")
+            await sec.report(message.guild, "🚫 Link Detected", discord.Color.orange(), {
+                "User": message.author.mention,
+                "Action": f"{deleted} messages deleted + timeout",
+                "Channel": message.channel.mention,
+                "Domains": ", ".join(scan.links)[:1024]
+            }, action="link", actor=message.author)
+
+
+class MentionGuard(Detector):
+    """Times out users who mass mention"""
+
+    flag = "mass_mentions"
+    summary = "Delete mass mentions and time out the poster"
+    events = ("message",)
+
+    async def on_message(self, message):
+        sec = self.context
+        if sec.trust.is_trusted(message.guild.id, message.author):
+            return
+        if sec.scan(message).mass_mention:
+            sec.scheduler.timeout(message.author, timedelta(hours=1), reason="Mass mention")
+            sec.scheduler.delete_message(message)
+            await sec.report(message.guild, "🚷 Mass Mention Detected", discord.Color.red(), {
+                "User": message.author.mention,
+                "Action": "Timeout + message deleted",
+                "Duration": "1 hour"
+            }, action="mass_mention", actor=message.author)
+
+
+class TermGuard(Detector):
+    """Deletes messages containing banned terms"""
+
+    flag = "banned_terms"
+    summary = "Delete messages containing banned terms"
+    events = ("message",)
+
+    async def on_message(self, message):
+        sec = self.context
+        if sec.trust.is_trusted(message.guild.id, message.author):
+            return
+        scan = sec.scan(message)
+        if scan.terms:
+            sec.scheduler.delete_message(message)
+            await sec.report(message.guild, "🚫 Banned Term Detected", discord.Color.orange(), {
+                "User": message.author.mention,
+                "Action": "Message deleted",
+                "Channel": message.channel.mention,
+                "Terms": ", ".join(sorted(set(scan.terms)))[:1024]
+            }, action="banned_term", actor=message.author)
+
+
+async def setup(bot):
+    engine = bot.get_cog("Protections")
+    for detector in (SpamGuard, DuplicateGuard, LinkGuard, MentionGuard, TermGuard):
+        await engine.add_detector(detector(engine.context))
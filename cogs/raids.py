@@ -0,0 +1,213 @@
+import asyncio
+import time
+
+import discord
+from discord.ext import commands
+
+from engine import Detector
+from join_velocity import JoinVelocity
+from scheduler import BULK_BAN_LIMIT
+
+# During a lockdown new members must have been on Discord for ten minutes
+# and invites are paused.
+LOCKDOWN_LEVEL = discord.VerificationLevel.high
+# A lockdown lifts itself after this long without a suspicious join.
+LOCKDOWN_CALM = 600.0
+# Joiners flagged within this many seconds are removed together.
+BATCH_DELAY = 0.05
+# "ban" removes BULK_BAN_LIMIT raiders per request; "kick" needs one per raider.
+COHORT_ACTION = "ban"
+
+
+class _Lockdown:
+    __slots__ = ("level", "invites_paused", "started", "last_suspicious", "removed", "watcher")
+
+    def __init__(self, level, invites_paused):
+        self.level = level
+        self.invites_paused = invites_paused
+        self.started = self.last_suspicious = time.monotonic()
+        self.removed = 0
+        self.watcher = None
+
+
+class RaidGuard(Detector):
+    """Locks a server down when joins spike and removes the raid cohort.
+
+    Joins are counted and scored in constant time and the handler never
+    waits on REST: flagged joiners are collected for BATCH_DELAY and removed
+    with bulk bans, so the detector keeps pace with the gateway however
+    fast accounts arrive.
+    """
+
+    flag = "anti_raid"
+    summary = "Lock the server down on a join spike and remove the raiders"
+    events = ("member_join",)
+
+    def __init__(self, context):
+        super().__init__(context)
+        self.velocity = JoinVelocity()
+        self._lockdowns = {}
+        self._pending = {}
+        self._restored = []
+        context.checkpoint.register("anti_raid", self)
+
+    async def on_member_join(self, member):
+        if member.bot:
+            return
+        guild = member.guild
+        suspicious, raid = self.velocity.hit(guild.id, member)
+        lockdown = self._lockdowns.get(guild.id)
+        if lockdown is not None:
+            if suspicious:
+                lockdown.last_suspicious = time.monotonic()
+                self.remove(guild, [member])
+        elif raid:
+            self.remove(guild, self.velocity.take_cohort(guild.id))
+            await self.lock(guild, "Join raid detected")
+
+    def remove(self, guild, members):
+        """Queue members for the next batch of raid removals"""
+        trust = self.context.trust
+        members = [member for member in members if not trust.is_trusted(guild.id, member)]
+        if not members:
+            return
+        pending = self._pending.get(guild.id)
+        if pending is None:
+            pending = self._pending[guild.id] = []
+            asyncio.ensure_future(self._flush(guild))
+        pending.extend(members)
+
+    async def _flush(self, guild):
+        await asyncio.sleep(BATCH_DELAY)
+        pending = self._pending[guild.id]
+        scheduler = self.context.scheduler
+        while pending:
+            batch = pending[:BULK_BAN_LIMIT] if COHORT_ACTION == "ban" else pending[:]
+            del pending[:len(batch)]
+            lockdown = self._lockdowns.get(guild.id)
+            if lockdown is not None:
+                lockdown.removed += len(batch)
+            if COHORT_ACTION == "ban":
+                # One request in flight, so the next batch fills up meanwhile.
+                try:
+                    await scheduler.bulk_ban(guild, batch, reason="Join raid")
+                except Exception:
+                    pass  # logged by the scheduler
+            else:
+                for member in batch:
+                    scheduler.kick(member, reason="Join raid")
+        del self._pending[guild.id]
+
+    async def lock(self, guild, reason):
+        lockdown = self._lockdowns[guild.id] = _Lockdown(guild.verification_level,
+                                                         "INVITES_DISABLED" in guild.features)
+        fields = {"invites_disabled": True}
+        if lockdown.level < LOCKDOWN_LEVEL:
+            fields["verification_level"] = LOCKDOWN_LEVEL
+        self.context.scheduler.edit_guild(guild, reason=f"Lockdown: {reason}", **fields)
+        lockdown.watcher = asyncio.ensure_future(self._watch(guild, lockdown))
+        joins, suspicious = self.velocity.counts(guild.id)
+        _, _, window = self.velocity.limit_for(guild.id)
+        await self.context.report(guild, "🛡️ Lockdown Started", discord.Color.red(), {
+            "Reason": reason,
+            "Joins": f"{joins} in {window}s, {suspicious} suspicious",
+            "Action": f"Invites paused, verification {max(lockdown.level, LOCKDOWN_LEVEL)}, "
+                      f"suspicious joiners {'banned' if COHORT_ACTION == 'ban' else 'kicked'}"
+        }, action="lockdown")
+
+    async def unlock(self, guild, reason):
+        lockdown = self._lockdowns.pop(guild.id, None)
+        if lockdown is None:
+            return False
+        if lockdown.watcher is not asyncio.current_task():
+            lockdown.watcher.cancel()
+        self.velocity.take_cohort(guild.id)
+        fields = {}
+        if not lockdown.invites_paused:
+            fields["invites_disabled"] = False
+        if lockdown.level < LOCKDOWN_LEVEL:
+            fields["verification_level"] = lockdown.level
+        if fields:
+            self.context.scheduler.edit_guild(guild, reason=f"Lockdown lifted: {reason}", **fields)
+        minutes = (time.monotonic() - lockdown.started) / 60
+        await self.context.report(guild, "🔓 Lockdown Lifted", discord.Color.green(), {
+            "Reason": reason,
+            "Duration": f"{minutes:.0f} min",
+            "Raiders removed": str(lockdown.removed)
+        }, action="lockdown_lifted")
+        return True
+
+    async def _watch(self, guild, lockdown):
+        while True:
+            wait = lockdown.last_suspicious + LOCKDOWN_CALM - time.monotonic()
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+        await self.unlock(guild, f"No suspicious joins for {LOCKDOWN_CALM / 60:.0f} min")
+
+    def checkpoint(self, now=None):
+        """Raid limits and running lockdowns, with their times saved as ages."""
+        if now is None:
+            now = time.monotonic()
+        return {
+            "limits": self.velocity.checkpoint(),
+            "lockdowns": [[guild_id, lockdown.level.value, lockdown.invites_paused, now - lockdown.started,
+                           now - lockdown.last_suspicious, lockdown.removed]
+                          for guild_id, lockdown in self._lockdowns.items()]
+        }
+
+    def restore(self, state, elapsed):
+        self.velocity.restore(state["limits"], elapsed)
+        self._restored = [[guild_id, level, paused, started + elapsed, calm + elapsed, removed]
+                          for guild_id, level, paused, started, calm, removed in state["lockdowns"]]
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # Lockdowns running at the last checkpoint carry on, and lift
+        # themselves once calm, even if that calm passed during the restart.
+        now = time.monotonic()
+        restored, self._restored = self._restored, []
+        for guild_id, level, paused, started, calm, removed in restored:
+            guild = self.context.bot.get_guild(guild_id)
+            if guild is None or guild_id in self._lockdowns:
+                continue
+            lockdown = self._lockdowns[guild_id] = _Lockdown(discord.VerificationLevel(level), paused)
+            lockdown.started = now - started
+            lockdown.last_suspicious = now - min(calm, LOCKDOWN_CALM)
+            lockdown.removed = removed
+            lockdown.watcher = asyncio.ensure_future(self._watch(guild, lockdown))
+
+    @commands.command()
+    @commands.guild_only()
+    @commands.is_owner()
+    async def lockdown(self, ctx, state: str):
+        """Lock this server down by hand, or lift a lockdown: `!lockdown on|off`"""
+        if state == "on":
+            if ctx.guild.id in self._lockdowns:
+                await ctx.send("ℹ️ This server is already locked down.")
+                return
+            await self.lock(ctx.guild, f"Started by {ctx.author}")
+            await ctx.send("🛡️ Lockdown started.")
+        elif state == "off":
+            if await self.unlock(ctx.guild, f"Lifted by {ctx.author}"):
+                await ctx.send("🔓 Lockdown lifted.")
+            else:
+                await ctx.send("ℹ️ This server is not locked down.")
+        else:
+            await ctx.send("❌ State must be `on` or `off`.")
+
+    @commands.command()
+    @commands.guild_only()
+    @commands.is_owner()
+    async def raid_limit(self, ctx, joins: int, suspicious: int, seconds: int = 10):
+        """Set how many joins, or suspicious joins, within `seconds` count as a raid"""
+        if joins < 1 or suspicious < 1 or seconds < 1:
+            await ctx.send("❌ Give at least 1 join, 1 suspicious join and a window of at least 1 second.")
+            return
+        self.velocity.set_limit(ctx.guild.id, joins, suspicious, seconds)
+        await ctx.send(f"✅ Raid limit set to {joins} joins or {suspicious} suspicious joins per {seconds}s")
+
+
+async def setup(bot):
+    engine = bot.get_cog("Protections")
+    await engine.add_detector(RaidGuard(engine.context))
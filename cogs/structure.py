@@ -0,0 +1,244 @@
+import asyncio
+
+import discord
+from discord.ext import commands
+
+from engine import Detector
+from journal import parse_time
+from permissions import escalation, names
+from restore import plan_restore, execute_restore
+
+Action = discord.AuditLogAction
+
+
+class ChannelGuard(Detector):
+    """Auto-ban for unauthorized channel creation and deletion"""
+
+    flag = "channels"
+    summary = "Ban untrusted users who create or delete channels"
+    events = ("guild_channel_create", "guild_channel_delete")
+
+    async def on_guild_channel_create(self, channel):
+        sec = self.context
+        entry = await sec.audit_index.resolve(channel.guild, Action.channel_create, channel.id)
+        if entry and not sec.trust.is_trusted(channel.guild.id, entry.user):
+            sec.scheduler.delete(channel, reason="Unauthorized channel creation")
+            if not sec.verdicts.claim(channel.guild, entry.user, "BANNED", "channel_create", channel):
+                return
+            sec.scheduler.ban(channel.guild, entry.user, reason="Unauthorized channel creation")
+            await sec.report(channel.guild, "🚨 Unauthorized Channel Created", discord.Color.red(), {
+                "User": f"{entry.user} ({entry.user.id})",
+                "Action": "BANNED + Channel deleted",
+                "Channel": channel.name
+            }, action="channel_create", actor=entry.user, target=channel)
+
+    async def on_guild_channel_delete(self, channel):
+        sec = self.context
+        entry = await sec.audit_index.resolve(channel.guild, Action.channel_delete, channel.id)
+        if entry and not sec.trust.is_trusted(channel.guild.id, entry.user):
+            if not sec.verdicts.claim(channel.guild, entry.user, "BANNED", "channel_delete", channel):
+                return
+            sec.scheduler.ban(channel.guild, entry.user, reason="Unauthorized channel deletion")
+            await sec.report(channel.guild, "🚨 Unauthorized Channel Deleted", discord.Color.red(), {
+                "User": f"{entry.user} ({entry.user.id})",
+                "Action": "BANNED",
+                "Channel": channel.name
+            }, action="channel_delete", actor=entry.user, target=channel)
+
+
+class RoleGuard(Detector):
+    """Auto-ban for unauthorized role creation, deletion and permission escalation"""
+
+    flag = "roles"
+    summary = "Ban untrusted users who create or delete roles or give them dangerous permissions"
+    events = ("guild_role_create", "guild_role_delete", "guild_role_update")
+
+    async def on_guild_role_create(self, role):
+        sec = self.context
+        entry = await sec.audit_index.resolve(role.guild, Action.role_create, role.id)
+        if entry and not sec.trust.is_trusted(role.guild.id, entry.user):
+            sec.scheduler.delete(role, reason="Unauthorized role creation")
+            if not sec.verdicts.claim(role.guild, entry.user, "BANNED", "role_create", role):
+                return
+            sec.scheduler.ban(role.guild, entry.user, reason="Unauthorized role creation")
+            await sec.report(role.guild, "🚨 Unauthorized Role Created", discord.Color.red(), {
+                "User": f"{entry.user} ({entry.user.id})",
+                "Action": "BANNED + Role deleted",
+                "Role": role.name
+            }, action="role_create", actor=entry.user, target=role)
+
+    async def on_guild_role_delete(self, role):
+        sec = self.context
+        entry = await sec.audit_index.resolve(role.guild, Action.role_delete, role.id)
+        if entry and not sec.trust.is_trusted(role.guild.id, entry.user):
+            if not sec.verdicts.claim(role.guild, entry.user, "BANNED", "role_delete", role):
+                return
+            sec.scheduler.ban(role.guild, entry.user, reason="Unauthorized role deletion")
+            await sec.report(role.guild, "🚨 Unauthorized Role Deleted", discord.Color.red(), {
+                "User": f"{entry.user} ({entry.user.id})",
+                "Action": "BANNED",
+                "Role": role.name
+            }, action="role_delete", actor=entry.user, target=role)
+
+    async def on_guild_role_update(self, before, after):
+        sec = self.context
+        # Renames, colours and harmless permissions never need the audit log.
+        granted = escalation(before.permissions.value, after.permissions.value)
+        if not granted:
+            return
+        entry = await sec.audit_index.resolve(after.guild, Action.role_update, after.id)
+        if entry and not sec.trust.is_trusted(after.guild.id, entry.user):
+            if not sec.verdicts.claim(after.guild, entry.user, "BANNED", "role_update", after):
+                return
+            sec.scheduler.ban(after.guild, entry.user, reason="Unauthorized role modification")
+            await sec.report(after.guild, "🚨 Unauthorized Role Modification", discord.Color.red(), {
+                "User": f"{entry.user} ({entry.user.id})",
+                "Action": "BANNED",
+                "Role": after.name,
+                "Changes": f"Permissions: {before.permissions.value} → {after.permissions.value}",
+                "Granted": ", ".join(names(granted)),
+                "Reason": "Unauthorized role modification"
+            }, action="role_update", actor=entry.user, target=after)
+
+
+class WebhookGuard(Detector):
+    """Deletes webhooks created by untrusted users and bans the creator.
+
+    Each burst of webhook updates in a channel costs one fetch, diffed
+    against the webhook index; only webhooks it did not know go on to the
+    audit log.
+    """
+
+    flag = "webhooks"
+    summary = "Delete webhooks created by untrusted users and ban the creator"
+    events = ("webhooks_update",)
+
+    async def enabled_in(self, guild):
+        if not self.context.webhooks.is_filled(guild.id):
+            await self.context.webhooks.fill(guild)
+
+    async def on_webhooks_update(self, channel):
+        new = await self.context.webhooks.changed(channel)
+        if new:
+            await asyncio.gather(*(self.check(channel, webhook) for webhook in new))
+
+    async def check(self, channel, webhook):
+        sec = self.context
+        entry = await sec.audit_index.resolve(channel.guild, Action.webhook_create, webhook.id)
+        if entry and not sec.trust.is_trusted(channel.guild.id, entry.user):
+            sec.scheduler.delete(webhook, reason="Unauthorized webhook creation")
+            if not sec.verdicts.claim(channel.guild, entry.user, "BANNED", "webhook_create", webhook):
+                return
+            sec.scheduler.ban(channel.guild, entry.user, reason="Unauthorized webhook creation")
+            await sec.report(channel.guild, "🚨 Unauthorized Webhook Created", discord.Color.red(), {
+                "User": f"{entry.user} ({entry.user.id})",
+                "Action": "BANNED + Webhook deleted",
+                "Webhook": f"{webhook.name} in {channel.mention}"
+            }, action="webhook_create", actor=entry.user, target=webhook)
+
+
+class SnapshotKeeper(Detector):
+    """Keeps each guild's restore snapshot in step with legitimate changes.
+
+    A change the channel or role guard is about to punish stays out of the
+    snapshot, so ``!restore`` can undo it. With that guard off in a guild,
+    every change is accepted.
+    """
+
+    flag = "snapshots"
+    summary = "Keep the restore snapshot in step with server changes"
+    events = ("guild_channel_create", "guild_channel_delete", "guild_channel_update",
+              "guild_role_create", "guild_role_delete", "guild_role_update")
+
+    async def unauthorized(self, guild, flag, action, target_id):
+        """Whether the guard behind ``flag`` treats this change as an attack"""
+        sec = self.context
+        if not sec.engine.enabled(guild.id, flag):
+            return False
+        entry = await sec.audit_index.resolve(guild, action, target_id)
+        return entry is not None and not sec.trust.is_trusted(guild.id, entry.user)
+
+    async def on_guild_channel_create(self, channel):
+        if not await self.unauthorized(channel.guild, "channels", Action.channel_create, channel.id):
+            self.context.snapshots.update_channel(channel)
+
+    async def on_guild_channel_delete(self, channel):
+        if not await self.unauthorized(channel.guild, "channels", Action.channel_delete, channel.id):
+            self.context.snapshots.remove_channel(channel)
+
+    async def on_guild_channel_update(self, before, after):
+        self.context.snapshots.update_channel(after)
+
+    async def on_guild_role_create(self, role):
+        if not await self.unauthorized(role.guild, "roles", Action.role_create, role.id):
+            self.context.snapshots.update_role(role)
+
+    async def on_guild_role_delete(self, role):
+        if not await self.unauthorized(role.guild, "roles", Action.role_delete, role.id):
+            self.context.snapshots.remove_role(role)
+
+    async def on_guild_role_update(self, before, after):
+        # The role guard only punishes edits that grant dangerous permissions.
+        if not escalation(before.permissions.value, after.permissions.value) or \
+                not await self.unauthorized(after.guild, "roles", Action.role_update, after.id):
+            self.context.snapshots.update_role(after)
+
+    @commands.command()
+    @commands.is_owner()
+    async def backup(self, ctx):
+        """Retake this server's snapshot from its current structure"""
+        snapshots = self.context.snapshots
+        snapshots.capture(ctx.guild)
+        await snapshots.flush()
+        await ctx.send("✅ Server snapshot updated!")
+
+    @commands.command()
+    @commands.is_owner()
+    async def restore(self, ctx, *options: str):
+        """Restore what differs from the snapshot, or from the one as of a time: `!restore [2h|3d|<ISO date>] [dry]`"""
+        guild = ctx.guild
+        snapshots = self.context.snapshots
+        when = [option for option in options if option != "dry"]
+        if when:
+            try:
+                at = parse_time(when[0])
+            except ValueError:
+                await ctx.send("❌ Give the time as `30m`, `2h` or `7d` ago, or as an ISO date.")
+                return
+            snapshot = await snapshots.as_of(guild.id, at)
+        else:
+            snapshot = snapshots.get(guild.id)
+        if snapshot is None:
+            await ctx.send("❌ No snapshot stored for this server" + (" from that long ago." if when else "."))
+            return
+        plan = plan_restore(guild, snapshot)
+        if plan.is_empty():
+            await ctx.send("✅ Server already matches its snapshot.")
+            return
+
+        if "dry" in options:
+            lines = plan.describe()
+            description = "\n".join(lines[:40])
+            if len(lines) > 40:
+                description += f"\n… and {len(lines) - 40} more"
+            embed = discord.Embed(title="🧪 Restore Plan (dry run)", color=discord.Color.blue())
+            embed.description = description[:4096]
+            embed.add_field(name="Snapshot taken", value=snapshot["taken_at"] or "unknown", inline=False)
+            embed.add_field(name="Estimated API calls", value=str(plan.api_calls()), inline=False)
+            await ctx.send(embed=embed)
+            return
+
+        status = await ctx.send(f"♻️ Restoring server structure... 0/{plan.api_calls()}")
+
+        async def progress(done, total):
+            await status.edit(content=f"♻️ Restoring server structure... {done}/{total}")
+
+        await execute_restore(guild, plan, self.context.scheduler, progress)
+        snapshots.forget(guild.id, plan.recreated_roles, plan.recreated_channels)
+        await ctx.send("✅ Server restoration completed!")
+
+
+async def setup(bot):
+    engine = bot.get_cog("Protections")
+    for detector in (ChannelGuard, RoleGuard, WebhookGuard, SnapshotKeeper):
+        await engine.add_detector(detector(engine.context))
@@ -0,0 +1,266 @@
+import asyncio
+import time
+from datetime import datetime
+
+import discord
+from discord.ext import commands
+
+from metrics import metrics, event_started
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS protection_flags (
+    guild_id INTEGER NOT NULL,
+    detector TEXT NOT NULL,
+    enabled INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, detector)
+);
+"""
+
+# The guild a gateway event belongs to, from its arguments. None means no
+# detector looks at it (bot messages, DMs).
+GUILD_OF = {
+    "message": lambda message: None if message.author.bot else message.guild,
+    "member_join": lambda member: member.guild,
+    "member_update": lambda before, after: after.guild,
+    "member_ban": lambda guild, user: guild,
+    "guild_channel_create": lambda channel: channel.guild,
+    "guild_channel_delete": lambda channel: channel.guild,
+    "guild_channel_update": lambda before, after: after.guild,
+    "guild_role_create": lambda role: role.guild,
+    "guild_role_delete": lambda role: role.guild,
+    "guild_role_update": lambda before, after: after.guild,
+    "audit_log_entry_create": lambda entry: entry.guild,
+    "webhooks_update": lambda channel: channel.guild,
+}
+
+
+def create_log_embed(title, color, fields):
+    embed = discord.Embed(title=title, color=color, timestamp=datetime.utcnow())
+    for name, value in fields.items():
+        embed.add_field(name=name, value=value, inline=False)
+    return embed
+
+
+class SecurityContext:
+    """The shared components every detector acts through."""
+
+    def __init__(self, bot, *, profile, trust, audit_index, scheduler, log_dispatcher, journal, checkpoint,
+                 verdicts, snapshots, scanner, rate_tracker, recent_messages, webhooks, mute_roles,
+                 punishment_duration):
+        self.bot = bot
+        self.profile = profile
+        self.trust = trust
+        self.audit_index = audit_index
+        self.scheduler = scheduler
+        self.log_dispatcher = log_dispatcher
+        self.journal = journal
+        self.checkpoint = checkpoint
+        self.verdicts = verdicts
+        self.snapshots = snapshots
+        self.scanner = scanner
+        self.rate_tracker = rate_tracker
+        self.recent_messages = recent_messages
+        self.webhooks = webhooks
+        self.mute_roles = mute_roles
+        self.punishment_duration = punishment_duration
+        self.engine = None
+        self._scanned = (None, None)
+        self._log_posts = set()
+
+    def scan(self, message):
+        """Scan a message once, however many detectors look at its content."""
+        if self._scanned[0] is not message:
+            self._scanned = (message, self.scanner.scan_message(message))
+        return self._scanned[1]
+
+    def purge(self, member, *messages, reason):
+        """Bulk delete a member's recent messages, and ``messages``, a few requests per channel."""
+        channels = self.recent_messages.take(member.guild.id, member.id)
+        for message in messages:
+            channels.setdefault(message.channel, set()).add(message.id)
+        for channel, message_ids in channels.items():
+            self.scheduler.purge(channel, message_ids, reason=reason)
+        return sum(map(len, channels.values()))
+
+    async def report(self, guild, title, color, fields, *, action, actor=None, target=None):
+        """Journal an incident, then queue its embed for the guild's log channel.
+
+        The post runs on its own, so a log backlog never holds up the
+        detector that reported, or the ones after it on the same event.
+        """
+        self.journal.record(guild.id, action, title, fields, actor_id=actor.id if actor else None,
+                            target_id=target.id if target else None)
+        post = asyncio.ensure_future(self.log_dispatcher.post(guild, create_log_embed(title, color, fields)))
+        self._log_posts.add(post)
+        post.add_done_callback(self._log_posts.discard)
+
+
+class Detector(commands.Cog):
+    """A protection that can be switched on and off per guild.
+
+    Subclasses name their ``flag``, list the gateway ``events`` they handle
+    and implement a plain ``on_<event>`` coroutine for each. These are not
+    cog listeners: the engine calls them only in guilds where the flag is
+    on. Commands on a detector stay available either way.
+    """
+
+    flag = None
+    summary = ""
+    events = ()
+    default = True
+
+    def __init__(self, context):
+        self.context = context
+
+    async def enabled_in(self, guild):
+        """Called when the flag is switched on in a guild, to prepare any state it needs there."""
+
+
+class ProtectionEngine(commands.Cog, name="Protections"):
+    """Routes gateway events to the detectors enabled in each guild.
+
+    Flags default to each detector's ``default`` and are overridden per
+    guild in the shared store. Every change rebuilds a route table of
+    handler tuples: one for guilds without overrides, one per guild with
+    them. The engine keeps a bot listener only for events some guild has a
+    detector enabled for, so a protection that is off in every guild costs
+    no dispatch at all, and one that is off in a guild costs a dict lookup.
+    """
+
+    def __init__(self, bot, store, context):
+        self.bot = bot
+        self.db = store.db
+        self.db.executescript(SCHEMA)
+        self.context = context
+        context.engine = self
+        self.detectors = {}
+        self._overrides = {}
+        for guild_id, flag, enabled in self.db.execute("SELECT guild_id, detector, enabled FROM protection_flags"):
+            self._overrides.setdefault(guild_id, {})[flag] = bool(enabled)
+        self._default_routes = {}
+        self._guild_routes = {}
+        self._listeners = {}
+
+    async def add_detector(self, detector):
+        unknown = [event for event in detector.events if event not in GUILD_OF]
+        if unknown:
+            raise ValueError(f"{detector.flag}: no guild mapping for {', '.join(unknown)}")
+        await self.bot.add_cog(detector)
+        self.detectors[detector.flag] = detector
+        self.rebuild()
+
+    def enabled(self, guild_id, flag):
+        detector = self.detectors.get(flag)
+        if detector is None:
+            return False
+        return self._overrides.get(guild_id, {}).get(flag, detector.default)
+
+    def set_enabled(self, guild_id, flag, enabled):
+        self.db.execute("INSERT OR REPLACE INTO protection_flags (guild_id, detector, enabled) VALUES (?, ?, ?)",
+                        (guild_id, flag, int(enabled)))
+        self._overrides.setdefault(guild_id, {})[flag] = enabled
+        self.rebuild()
+
+    def rebuild(self):
+        """Recompute the route table and register exactly the events it needs."""
+        subscribers = {}
+        for detector in self.detectors.values():
+            for event in detector.events:
+                subscribers.setdefault(event, []).append(detector)
+
+        default_routes, guild_routes = {}, {}
+        for event, detectors in subscribers.items():
+            default_routes[event] = tuple(
+                (d.flag, getattr(d, f"on_{event}")) for d in detectors if d.default)
+            guild_routes[event] = {
+                guild_id: tuple((d.flag, getattr(d, f"on_{event}"))
+                                for d in detectors if flags.get(d.flag, d.default))
+                for guild_id, flags in self._overrides.items()
+            }
+        self._default_routes, self._guild_routes = default_routes, guild_routes
+
+        uses_defaults = self._uses_defaults()
+        for event in set(subscribers) | set(self._listeners):
+            needed = (bool(default_routes.get(event)) and uses_defaults) or any(guild_routes.get(event, {}).values())
+            if needed and event not in self._listeners:
+                self._listeners[event] = self._dispatcher(event)
+                self.bot.add_listener(self._listeners[event], f"on_{event}")
+            elif not needed and event in self._listeners:
+                self.bot.remove_listener(self._listeners.pop(event), f"on_{event}")
+
+    def _uses_defaults(self):
+        """Whether some guild runs on default flags; assumed until the guild list is known."""
+        if not self.bot.is_ready():
+            return True
+        return any(guild.id not in self._overrides for guild in self.bot.guilds)
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        self.rebuild()
+
+    @commands.Cog.listener()
+    async def on_guild_join(self, guild):
+        self.rebuild()
+
+    def _dispatcher(self, event):
+        guild_of = GUILD_OF[event]
+        name = f"on_{event}"
+
+        async def dispatch(*args):
+            guild = guild_of(*args)
+            if guild is None:
+                return
+            handlers = self._guild_routes.get(event, {}).get(guild.id)
+            if handlers is None:
+                handlers = self._default_routes.get(event, ())
+            event_started.set(time.perf_counter())
+            self.context.audit_index.mark()
+            for flag, handler in handlers:
+                start = time.perf_counter()
+                try:
+                    await handler(*args)
+                except Exception:
+                    # Keep one broken detector from starving the rest.
+                    await self.bot.on_error(name, *args)
+                finally:
+                    metrics.observe("handler_seconds", time.perf_counter() - start, handler=flag)
+
+        dispatch.__name__ = name
+        return dispatch
+
+    # ========================
+    # COMMANDS
+    # ========================
+    @commands.command()
+    @commands.guild_only()
+    @commands.is_owner()
+    async def protection(self, ctx, flag: str, state: str):
+        """Turn a protection on or off in this server, e.g. `!protection anti_links off`"""
+        if flag not in self.detectors:
+            await ctx.send(f"❌ Unknown protection `{flag}`. Choose from: {', '.join(self.detectors)}")
+            return
+        if state not in ("on", "off"):
+            await ctx.send("❌ State must be `on` or `off`.")
+            return
+        self.set_enabled(ctx.guild.id, flag, state == "on")
+        if state == "on":
+            await self.detectors[flag].enabled_in(ctx.guild)
+        label = "enabled" if state == "on" else "disabled"
+        await ctx.send(f"✅ `{flag}` {label} for this server")
+        await self.context.report(ctx.guild, "🔧 Protection Changed", discord.Color.blue(), {
+            "Protection": f"{flag}: {self.detectors[flag].summary}",
+            "State": label.capitalize(),
+            "By": ctx.author.mention
+        }, action="protection", actor=ctx.author)
+
+    @commands.command()
+    @commands.guild_only()
+    @commands.is_owner()
+    async def security_settings(self, ctx):
+        """Show which protections are on in this server"""
+        embed = discord.Embed(title="🔒 Security Settings", color=discord.Color.blue())
+        for flag, detector in self.detectors.items():
+            state = "✅ Enabled" if self.enabled(ctx.guild.id, flag) else "❌ Disabled"
+            embed.add_field(name=flag, value=f"{state} · {detector.summary}", inline=False)
+        embed.add_field(name="Punishment Duration", value=str(self.context.punishment_duration), inline=False)
+        await ctx.send(embed=embed)
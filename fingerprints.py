@@ -0,0 +1,189 @@
+import hashlib
+import operator
+import re
+import string
+import struct
+import time
+import unicodedata
+from collections import OrderedDict
+
+# Normalized messages shorter than this ("good morning") are too common to
+# call coordinated.
+MIN_LENGTH = 20
+# One payload from this many users, or in this many channels, within TTL
+# seconds is coordinated spam.
+DEFAULT_USER_LIMIT = 4
+DEFAULT_CHANNEL_LIMIT = 3
+TTL = 30.0
+MAX_PAYLOADS = 20000
+# Per payload: distinct users and channels remembered, and messages kept so
+# the copies posted before detection can be cleaned up.
+MAX_MEMBERS = 100
+MAX_MESSAGES = 10
+# Near-duplicate matching: a MinHash signature of BANDS * ROWS values over
+# word pairs, indexed by band. A message sharing a band with a payload is a
+# copy of it if their signatures agree on SIMILARITY of their values, so
+# chat that merely shares a common phrase does not add up.
+BANDS = 4
+ROWS = 3
+SIMILARITY = 0.6
+MIN_SHINGLES = 4
+
+# Custom emoji and user, role and channel mentions.
+_MARKUP = re.compile(r"<a?:\w+:\d+>|<[@#&!]+\d+>")
+# Punctuation becomes a space, zero-width characters go.
+_FOLD = str.maketrans({**{char: " " for char in string.punctuation},
+                       **dict.fromkeys("\u200b\u200c\u200d\u2060\ufeff")})
+# One BLAKE2b digest per word pair yields all of its signature values.
+_SIGNATURE = struct.Struct(f">{BANDS * ROWS}I")
+
+
+def normalize(content):
+    """Fold case and look-alike characters, drop mentions, emoji ids,
+    punctuation and zero-width characters, and collapse whitespace."""
+    if not content.isascii():
+        content = unicodedata.normalize("NFKC", content)
+    if "<" in content:
+        content = _MARKUP.sub(" ", content)
+    return " ".join(content.casefold().translate(_FOLD).split())
+
+
+def fingerprint(text):
+    return hashlib.blake2b(text.encode(), digest_size=8).digest()
+
+
+def minhash(text):
+    """MinHash signature over the word pairs of ``text``, or None if it has too few."""
+    words = text.split()
+    shingles = set(zip(words, words[1:]))
+    if len(shingles) < MIN_SHINGLES:
+        return None
+    blake2b, unpack, size = hashlib.blake2b, _SIGNATURE.unpack, _SIGNATURE.size
+    return tuple(map(min, zip(*(unpack(blake2b(f"{a} {b}".encode(), digest_size=size).digest())
+                                for a, b in shingles))))
+
+
+def bands(signature):
+    return [(band,) + signature[band * ROWS:(band + 1) * ROWS] for band in range(BANDS)]
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(map(operator.eq, a, b)) / len(a)
+
+
+class Payload:
+    __slots__ = ("signature", "users", "channels", "messages", "count", "first_seen", "last_seen", "flagged",
+                 "punished")
+
+    def __init__(self, now, signature=None):
+        self.signature = signature
+        self.users = set()
+        self.channels = set()
+        self.messages = []
+        self.count = 0
+        self.first_seen = self.last_seen = now
+        self.flagged = False
+        self.punished = set()
+
+    def take_messages(self):
+        messages, self.messages = self.messages, []
+        return messages
+
+
+class FingerprintTracker:
+    """Counts who posts the same content where, per guild.
+
+    Each message is normalized and hashed once with BLAKE2b; with
+    ``near_duplicates`` its word-pair MinHash bands are tracked as well, so
+    copies with a word or two changed still land on a shared key. Payloads
+    live in one OrderedDict kept in last-seen order: expired ones are
+    popped from the front on every hit, and past ``max_payloads`` the
+    oldest goes, so memory stays flat however long the traffic lasts.
+    """
+
+    def __init__(self, user_limit=DEFAULT_USER_LIMIT, channel_limit=DEFAULT_CHANNEL_LIMIT, ttl=TTL,
+                 near_duplicates=False, min_length=MIN_LENGTH, max_payloads=MAX_PAYLOADS):
+        self.default = (user_limit, channel_limit)
+        self.ttl = ttl
+        self.near_duplicates = near_duplicates
+        self.min_length = min_length
+        self.max_payloads = max_payloads
+        self._limits = {}
+        self._payloads = OrderedDict()
+
+    def set_limit(self, guild_id, user_limit, channel_limit):
+        self._limits[guild_id] = (user_limit, channel_limit)
+
+    def limit_for(self, guild_id):
+        return self._limits.get(guild_id, self.default)
+
+    def hit(self, guild_id, channel_id, user_id, content, message=None, now=None):
+        """Record a message; return its Payload if that payload is coordinated spam, else None."""
+        if now is None:
+            now = time.monotonic()
+        payloads = self._payloads
+        cutoff = now - self.ttl
+        while payloads:
+            oldest = next(iter(payloads.values()))
+            if oldest.last_seen >= cutoff:
+                break
+            payloads.popitem(last=False)
+
+        text = normalize(content)
+        if len(text) < self.min_length:
+            return None
+        keys = [((guild_id, fingerprint(text)), None)]
+        if self.near_duplicates:
+            signature = minhash(text)
+            if signature is not None:
+                keys.extend(((guild_id, band), signature) for band in bands(signature))
+
+        user_limit, channel_limit = self.limit_for(guild_id)
+        found = None
+        touched = []
+        for key, signature in keys:
+            payload = payloads.get(key)
+            if payload is None or payload.first_seen < cutoff:
+                # A payload counts over one TTL from its first sighting.
+                payload = payloads[key] = Payload(now, signature)
+                if len(payloads) > self.max_payloads:
+                    payloads.popitem(last=False)
+            elif signature is not None and similarity(payload.signature, signature) < SIMILARITY:
+                continue  # a different message that happens to share this band
+            payloads.move_to_end(key)
+            payload.count += 1
+            payload.last_seen = now
+            if len(payload.users) < MAX_MEMBERS:
+                payload.users.add(user_id)
+            if len(payload.channels) < MAX_MEMBERS:
+                payload.channels.add(channel_id)
+            if message is not None:
+                if len(payload.messages) >= MAX_MESSAGES:
+                    del payload.messages[0]
+                payload.messages.append(message)
+            if not payload.flagged and (len(payload.users) >= user_limit or len(payload.channels) >= channel_limit):
+                payload.flagged = True
+            if payload.flagged and found is None:
+                found = payload
+            touched.append(payload)
+        if found is not None and len(touched) > 1:
+            # Gather the copies kept under the message's other keys for cleanup.
+            kept = {id(m) for m in found.messages}
+            for payload in touched:
+                if payload is not found:
+                    for m in payload.take_messages():
+                        if id(m) not in kept:
+                            kept.add(id(m))
+                            found.messages.append(m)
+        return found
+
+    def checkpoint(self):
+        """Per-guild limits; payloads expire within TTL and start afresh."""
+        return [[guild_id, *limits] for guild_id, limits in self._limits.items()]
+
+    def restore(self, state, elapsed):
+        self._limits.update((guild_id, tuple(limits)) for guild_id, *limits in state)
+
+    def __len__(self):
+        return len(self._payloads)
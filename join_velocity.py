@@ -0,0 +1,123 @@
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+DEFAULT_WINDOW = 10
+# Joins per window that count as a raid whoever joins, and joins of
+# suspicious accounts that count as one.
+DEFAULT_JOIN_LIMIT = 30
+DEFAULT_SUSPICIOUS_LIMIT = 10
+# An account scoring this many points is suspicious.
+SUSPICIOUS_SCORE = 2
+NEW_ACCOUNT = timedelta(days=7)
+FRESH_ACCOUNT = timedelta(days=1)
+# How far back a detected raid reaches for suspicious joiners to remove.
+COHORT_WINDOW = 60.0
+COHORT_MAX = 10000
+
+
+def score(member, now):
+    """Suspicion points for a joining account: up to two for its age, one for the default avatar."""
+    points = 0
+    age = now - member.created_at
+    if age < NEW_ACCOUNT:
+        points += 2 if age < FRESH_ACCOUNT else 1
+    if member.avatar is None:
+        points += 1
+    return points
+
+
+class _Window:
+    __slots__ = ("joins", "suspicious", "second", "total", "total_suspicious", "cohort")
+
+    def __init__(self, size):
+        self.joins = [0] * size
+        self.suspicious = [0] * size
+        self.second = 0
+        self.total = 0
+        self.total_suspicious = 0
+        self.cohort = deque(maxlen=COHORT_MAX)
+
+
+class JoinVelocity:
+    """Per-guild join rate over a sliding window of one-second buckets.
+
+    A join advances the guild's ring to the current second, clearing the
+    buckets it skipped, and bumps two running totals, so it costs the same
+    whether ten or ten thousand accounts joined in the window. Suspicious
+    joiners are also kept, with their join time, as the cohort a detected
+    raid removes.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW, join_limit=DEFAULT_JOIN_LIMIT,
+                 suspicious_limit=DEFAULT_SUSPICIOUS_LIMIT, cohort_window=COHORT_WINDOW):
+        self.default = (join_limit, suspicious_limit, window)
+        self.cohort_window = cohort_window
+        self._limits = {}
+        self._windows = {}
+
+    def set_limit(self, guild_id, join_limit, suspicious_limit, window):
+        self._limits[guild_id] = (join_limit, suspicious_limit, window)
+        self._windows.pop(guild_id, None)
+
+    def limit_for(self, guild_id):
+        return self._limits.get(guild_id, self.default)
+
+    def hit(self, guild_id, member, now=None):
+        """Record a join; return ``(suspicious, raid)``.
+
+        ``raid`` stays true for every join while the window is over a limit.
+        """
+        if now is None:
+            now = time.monotonic()
+        join_limit, suspicious_limit, window = self.limit_for(guild_id)
+        ring = self._windows.get(guild_id)
+        if ring is None:
+            ring = self._windows[guild_id] = _Window(window)
+
+        second = int(now)
+        size = len(ring.joins)
+        if second != ring.second:
+            for s in range(max(ring.second + 1, second - size + 1), second + 1):
+                i = s % size
+                ring.total -= ring.joins[i]
+                ring.total_suspicious -= ring.suspicious[i]
+                ring.joins[i] = ring.suspicious[i] = 0
+            ring.second = second
+
+        i = second % size
+        ring.joins[i] += 1
+        ring.total += 1
+        suspicious = score(member, datetime.now(timezone.utc)) >= SUSPICIOUS_SCORE
+        if suspicious:
+            ring.suspicious[i] += 1
+            ring.total_suspicious += 1
+            ring.cohort.append((now, member))
+        return suspicious, ring.total >= join_limit or ring.total_suspicious >= suspicious_limit
+
+    def counts(self, guild_id):
+        """``(joins, suspicious joins)`` in the current window."""
+        ring = self._windows.get(guild_id)
+        return (ring.total, ring.total_suspicious) if ring else (0, 0)
+
+    def take_cohort(self, guild_id, now=None):
+        """Remove and return the suspicious members who joined within ``cohort_window``."""
+        if now is None:
+            now = time.monotonic()
+        ring = self._windows.get(guild_id)
+        if ring is None:
+            return []
+        cutoff = now - self.cohort_window
+        members = [member for joined, member in ring.cohort if joined >= cutoff]
+        ring.cohort.clear()
+        return members
+
+    def forget(self, guild_id):
+        self._windows.pop(guild_id, None)
+
+    def checkpoint(self):
+        """Per-guild limits; windows are seconds long and start afresh."""
+        return [[guild_id, *limits] for guild_id, limits in self._limits.items()]
+
+    def restore(self, state, elapsed):
+        self._limits.update((guild_id, tuple(limits)) for guild_id, *limits in state)
@@ -0,0 +1,171 @@
+import asyncio
+import atexit
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from metrics import metrics
+
+log = logging.getLogger(__name__)
+
+JOURNAL_PATH = os.path.join("state", "incidents.db")
+# Records are committed together this long after the first one is buffered,
+# or as soon as this many are waiting.
+FLUSH_DELAY = 0.5
+FLUSH_SIZE = 500
+# Seconds a commit waits for another shard process writing the same file.
+BUSY_TIMEOUT = 5.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS incidents (
+    id INTEGER PRIMARY KEY,
+    at REAL NOT NULL,
+    guild_id INTEGER NOT NULL,
+    actor_id INTEGER,
+    target_id INTEGER,
+    action TEXT NOT NULL,
+    title TEXT NOT NULL,
+    fields TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS incidents_by_time ON incidents (guild_id, at);
+CREATE INDEX IF NOT EXISTS incidents_by_actor ON incidents (guild_id, actor_id, at);
+CREATE INDEX IF NOT EXISTS incidents_by_action ON incidents (guild_id, action, at);
+CREATE TRIGGER IF NOT EXISTS incidents_no_update BEFORE UPDATE ON incidents
+BEGIN SELECT RAISE(ABORT, 'the incident journal is append-only'); END;
+CREATE TRIGGER IF NOT EXISTS incidents_no_delete BEFORE DELETE ON incidents
+BEGIN SELECT RAISE(ABORT, 'the incident journal is append-only'); END;
+"""
+
+Incident = namedtuple("Incident", "at guild_id actor_id target_id action title fields")
+
+_DURATION = re.compile(r"(\d+)([smhdw])")
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def parse_time(value, now=None):
+    """Epoch seconds from ``30m``/``2h``/``7d`` ago or an ISO date, UTC unless it says otherwise."""
+    if now is None:
+        now = time.time()
+    match = _DURATION.fullmatch(value)
+    if match:
+        return now - int(match[1]) * _UNITS[match[2]]
+    when = datetime.fromisoformat(value)
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return when.timestamp()
+
+
+class IncidentJournal:
+    """Append-only local record of every detection, kept in SQLite.
+
+    ``record`` only buffers on the event loop. One writer thread commits
+    each batch as a single transaction on a WAL database with
+    ``synchronous=FULL``, so every batch is fsynced without the loop
+    waiting on the disk, and triggers refuse updates and deletes. Queries
+    run on the same thread, after any writes queued before them, against
+    indexes on guild and time, actor or action.
+    """
+
+    def __init__(self, path=JOURNAL_PATH, flush_delay=FLUSH_DELAY, flush_size=FLUSH_SIZE):
+        self.path = path
+        self.flush_delay = flush_delay
+        self.flush_size = flush_size
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=FULL")
+        self.db.executescript(SCHEMA)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="journal")
+        self._buffer = []
+        self._full = None
+        self._task = None
+        atexit.register(self.close)
+
+    def record(self, guild_id, action, title, fields, actor_id=None, target_id=None, at=None):
+        """Buffer one incident for the next batch."""
+        self._buffer.append((time.time() if at is None else at, guild_id, actor_id, target_id, action, title,
+                             json.dumps(fields, ensure_ascii=False)))
+        if self._task is None or self._task.done():
+            self._full = asyncio.Event()
+            self._task = asyncio.ensure_future(self._drain())
+        if len(self._buffer) >= self.flush_size:
+            self._full.set()
+
+    def depth(self):
+        return len(self._buffer)
+
+    async def query(self, guild_id, actor_id=None, action=None, since=None, until=None, limit=20):
+        """Incidents in a guild matching every filter given, newest first."""
+        self._submit()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._query, guild_id, actor_id, action, since, until,
+                                          limit)
+
+    def close(self):
+        """Commit whatever is still buffered and stop the writer; safe to call twice."""
+        self._executor.shutdown(wait=True)
+        if self._buffer:
+            batch, self._buffer = self._buffer, []
+            self._write(batch)
+
+    async def _drain(self):
+        while self._buffer:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_delay)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            await self._submit()
+
+    def _submit(self):
+        """Hand the buffer to the writer thread; return a future for the commit."""
+        batch, self._buffer = self._buffer, []
+        future = asyncio.get_running_loop().run_in_executor(self._executor, self._write, batch)
+        future.add_done_callback(lambda f: self._written(f, len(batch)))
+        return future
+
+    def _written(self, future, count):
+        if future.cancelled():
+            return
+        exc = future.exception()
+        if exc is not None:
+            metrics.inc("journal_failures_total")
+            log.error("Could not write %d incidents to the journal", count, exc_info=exc)
+        else:
+            metrics.inc("journal_records_total", count)
+
+    def _write(self, batch):
+        if not batch:
+            return
+        with self.db:
+            self.db.executemany(
+                "INSERT INTO incidents (at, guild_id, actor_id, target_id, action, title, fields) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+
+    def _query(self, guild_id, actor_id, action, since, until, limit):
+        sql = "SELECT at, guild_id, actor_id, target_id, action, title, fields FROM incidents WHERE guild_id = ?"
+        args = [guild_id]
+        if actor_id is not None:
+            sql += " AND actor_id = ?"
+            args.append(actor_id)
+        if action is not None:
+            sql += " AND action = ?"
+            args.append(action)
+        if since is not None:
+            sql += " AND at >= ?"
+            args.append(since)
+        if until is not None:
+            sql += " AND at < ?"
+            args.append(until)
+        sql += " ORDER BY at DESC LIMIT ?"
+        args.append(limit)
+        rows = self.db.execute(sql, args).fetchall()
+        return [Incident(*row[:6], json.loads(row[6])) for row in rows]
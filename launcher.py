@@ -0,0 +1,94 @@
+"""Run the bot as several local processes, each with a slice of the shards.
+
+    python launcher.py --processes 4
+    python launcher.py --processes 2 --shards 8
+
+Asks Discord for the recommended shard count and identify concurrency
+(unless --shards is given), splits the shards evenly across the
+processes and restarts any process that exits. Every process shares
+the whitelist, verdicts and identify gate through the SQLite store, and
+gets its own metrics port (METRICS_PORT + process index).
+"""
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import aiohttp
+from dotenv import load_dotenv
+
+API = "https://discord.com/api/v10"
+# Seconds to wait before restarting a process that exited.
+RESTART_DELAY = 5.0
+
+
+async def fetch_gateway(token):
+    """Return (recommended shards, max identify concurrency) for the token."""
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{API}/gateway/bot", headers={"Authorization": f"Bot {token}"}) as response:
+            response.raise_for_status()
+            data = await response.json()
+    return data["shards"], data["session_start_limit"]["max_concurrency"]
+
+
+def split(shard_count, processes):
+    """Spread shard ids round-robin so each process gets every concurrency bucket."""
+    return [list(range(i, shard_count, processes)) for i in range(processes)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--shards", type=int, help="total shard count (default: Discord's recommendation)")
+    parser.add_argument("--entry", default="main.py", help="entry point each process runs")
+    args = parser.parse_args()
+
+    load_dotenv()
+    token = os.getenv("DISCORD_TOKEN")
+    recommended, max_concurrency = asyncio.run(fetch_gateway(token))
+    shard_count = args.shards or recommended
+    processes = max(1, min(args.processes, shard_count))
+    metrics_port = int(os.getenv("METRICS_PORT", "9108"))
+    print(f"🚀 {shard_count} shards across {processes} processes (identify concurrency {max_concurrency})")
+
+    def spawn(index, shard_ids):
+        env = dict(os.environ,
+                   SHARD_COUNT=str(shard_count),
+                   SHARD_IDS=",".join(map(str, shard_ids)),
+                   MAX_CONCURRENCY=str(max_concurrency),
+                   METRICS_PORT=str(metrics_port + index if metrics_port else 0))
+        print(f"▶️ Process {index}: shards {shard_ids}")
+        return subprocess.Popen([sys.executable, args.entry], env=env)
+
+    slices = split(shard_count, processes)
+    children = [spawn(i, shard_ids) for i, shard_ids in enumerate(slices)]
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for child in children:
+            if child.poll() is None:
+                child.terminate()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    while not stopping:
+        time.sleep(1.0)
+        for i, child in enumerate(children):
+            code = child.poll()
+            if code is not None and not stopping:
+                print(f"⚠️ Process {i} exited with {code}; restarting in {RESTART_DELAY:g}s")
+                time.sleep(RESTART_DELAY)
+                children[i] = spawn(i, slices[i])
+
+    for child in children:
+        child.wait()
+
+
+if __name__ == "__main__":
+    main()
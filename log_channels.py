@@ -0,0 +1,87 @@
+import asyncio
+
+import discord
+
+LOG_CHANNEL_NAME = "security-logs"
+
+
+class LogChannelCache:
+    """Per-guild cache of the security log channel.
+
+    Filled once per guild with a single scan, then kept correct by channel
+    create, update and delete events. Creation is single-flight: concurrent
+    callers for a guild without a log channel await the same creation task.
+    """
+
+    def __init__(self, name=LOG_CHANNEL_NAME):
+        self.name = name
+        self._channels = {}
+        self._creating = {}
+
+    def attach(self, bot):
+        """Register the listeners that keep the cache in sync."""
+        bot.add_listener(self.on_guild_channel_create)
+        bot.add_listener(self.on_guild_channel_update)
+        bot.add_listener(self.on_guild_channel_delete)
+        bot.add_listener(self.on_guild_remove)
+
+    def prime(self, guild):
+        """Fill the cache for a guild from its channel list; return the channel or None."""
+        channel = discord.utils.get(guild.text_channels, name=self.name)
+        if channel is not None:
+            self._channels[guild.id] = channel
+        return channel
+
+    async def get(self, guild):
+        """Return the guild's log channel, creating it if it does not exist."""
+        channel = self._channels.get(guild.id)
+        if channel is not None:
+            return channel
+        channel = self.prime(guild)
+        if channel is not None:
+            return channel
+
+        task = self._creating.get(guild.id)
+        if task is None:
+            task = asyncio.ensure_future(self._create(guild))
+            self._creating[guild.id] = task
+            task.add_done_callback(lambda _: self._creating.pop(guild.id, None))
+        return await asyncio.shield(task)
+
+    async def _create(self, guild):
+        overwrites = {
+            guild.default_role: discord.PermissionOverwrite(send_messages=False),
+            guild.me: discord.PermissionOverwrite(send_messages=True)
+        }
+        channel = await guild.create_text_channel(
+            self.name,
+            overwrites=overwrites,
+            reason="Automatic log channel creation"
+        )
+        self._channels[guild.id] = channel
+        return channel
+
+    async def on_guild_channel_create(self, channel):
+        if self._is_log_channel(channel) and channel.guild.id not in self._channels:
+            self._channels[channel.guild.id] = channel
+
+    async def on_guild_channel_update(self, before, after):
+        cached = self._channels.get(after.guild.id)
+        if cached is not None and cached.id == after.id and not self._is_log_channel(after):
+            # Renamed away: fall back to another channel with the name, if any.
+            del self._channels[after.guild.id]
+            self.prime(after.guild)
+        elif cached is None and self._is_log_channel(after):
+            self._channels[after.guild.id] = after
+
+    async def on_guild_channel_delete(self, channel):
+        cached = self._channels.get(channel.guild.id)
+        if cached is not None and cached.id == channel.id:
+            del self._channels[channel.guild.id]
+            self.prime(channel.guild)
+
+    async def on_guild_remove(self, guild):
+        self._channels.pop(guild.id, None)
+
+    def _is_log_channel(self, channel):
+        return isinstance(channel, discord.TextChannel) and channel.name == self.name
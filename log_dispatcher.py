@@ -0,0 +1,115 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+import discord
+
+from metrics import metrics
+
+# Discord accepts at most 10 embeds, 6000 characters in total, per message.
+MAX_EMBEDS = 10
+MAX_TOTAL_CHARS = 6000
+FLUSH_INTERVAL = 1.0
+# Distinct incidents a guild may have waiting before post() blocks.
+MAX_PENDING = 50
+
+
+class _GuildLog:
+    __slots__ = ("pending", "full", "space", "task")
+
+    def __init__(self):
+        self.pending = OrderedDict()
+        self.full = asyncio.Event()
+        self.space = asyncio.Event()
+        self.task = None
+
+
+class LogDispatcher:
+    """Coalescing per-guild queue for security log embeds.
+
+    Embeds are packed up to ten per message and flushed when a batch fills
+    or after ``flush_interval`` seconds. Identical incidents waiting in the
+    same batch are merged into one embed with a repeat count, and ``post``
+    blocks once a guild has ``max_pending`` distinct incidents queued.
+    With a scheduler, sends run at log priority behind enforcement.
+    """
+
+    def __init__(self, resolve_channel, scheduler=None, flush_interval=FLUSH_INTERVAL, max_pending=MAX_PENDING):
+        self.resolve_channel = resolve_channel
+        self.scheduler = scheduler
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._logs = {}
+
+    async def post(self, guild, embed):
+        """Queue an embed for the guild's log channel."""
+        log = self._logs.get(guild.id)
+        if log is None:
+            log = self._logs[guild.id] = _GuildLog()
+        key = self._fingerprint(embed)
+        while True:
+            item = log.pending.get(key)
+            if item is not None:
+                item[1] += 1
+                return
+            if len(log.pending) < self.max_pending:
+                break
+            log.space.clear()
+            await log.space.wait()
+
+        log.pending[key] = [embed, 1, time.monotonic()]
+        if len(log.pending) >= MAX_EMBEDS:
+            log.full.set()
+        if log.task is None or log.task.done():
+            log.task = asyncio.ensure_future(self._drain(guild, log))
+
+    def depth(self, guild_id=None):
+        """Number of distinct incidents waiting, for one guild or all of them."""
+        if guild_id is not None:
+            log = self._logs.get(guild_id)
+            return len(log.pending) if log else 0
+        return sum(len(log.pending) for log in self._logs.values())
+
+    async def _drain(self, guild, log):
+        while log.pending:
+            if len(log.pending) < MAX_EMBEDS:
+                try:
+                    await asyncio.wait_for(log.full.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            log.full.clear()
+            batch, oldest = self._take_batch(log)
+            log.space.set()
+            try:
+                channel = await self.resolve_channel(guild)
+                if self.scheduler is not None:
+                    await self.scheduler.send(channel, embeds=batch)
+                else:
+                    await channel.send(embeds=batch)
+            except discord.HTTPException:
+                pass
+            else:
+                metrics.observe("log_lag_seconds", time.monotonic() - oldest)
+
+    def _take_batch(self, log):
+        """Pop the next message's worth of embeds; also return when the oldest was queued."""
+        batch = []
+        total = 0
+        oldest = None
+        while log.pending and len(batch) < MAX_EMBEDS:
+            key, (embed, count, queued_at) = next(iter(log.pending.items()))
+            if count > 1:
+                embed.set_footer(text=f"Repeated {count} times")
+            size = len(embed)
+            if batch and total + size > MAX_TOTAL_CHARS:
+                break
+            del log.pending[key]
+            batch.append(embed)
+            total += size
+            if oldest is None:
+                oldest = queued_at
+        return batch, oldest
+
+    @staticmethod
+    def _fingerprint(embed):
+        return (embed.title, embed.description, tuple((field.name, field.value) for field in embed.fields))
@@ -1,344 +1,189 @@
+import asyncio
 import discord
-from discord.ext import commands, tasks
+from discord.ext import tasks
 import os
 from dotenv import load_dotenv
-import re
-from datetime import datetime, timedelta
-from collections import defaultdict
-import asyncio
-import json
+from datetime import timedelta
+from collections import Counter
+
+from audit_index import AuditIndex
+from log_channels import LogChannelCache
+from log_dispatcher import LogDispatcher
+from scheduler import ActionScheduler
+from verdicts import VerdictCache
+from scanner import MessageScanner
+from metrics import metrics
+from runtime_profile import RuntimeProfile
+from shared_store import SharedStore
+from trust import TrustStore, GLOBAL
+from sharding import make_bot
+from snapshots import SnapshotStore
+from mute_roles import MuteRoleManager
+from rate_tracker import RateTracker
+from recent_messages import RecentMessages
+from webhook_index import WebhookIndex
+from engine import ProtectionEngine, SecurityContext
+from journal import IncidentJournal
+from checkpoint import Checkpoint, checkpoint_path, CHECKPOINT_INTERVAL
 
 # Load environment variables
 load_dotenv()
 TOKEN = os.getenv("DISCORD_TOKEN")
 OWNER_ID = int(os.getenv("OWNER_ID"))
 
-intents = discord.Intents.all()
-bot = commands.Bot(command_prefix="!", intents=intents)
-whitelisted = {OWNER_ID}
-LINK_PATTERN = re.compile(r"(https?://\S+|www\.\S+)")
+# Gateway intents and caches: BOT_PROFILE=lean (default) or full
+profile = RuntimeProfile()
+# State shared by every shard process on this host
+store = SharedStore(os.getenv("SHARED_STORE", os.path.join("state", "shared.db")))
+bot = make_bot(store, command_prefix="!", **profile.bot_options())
+# Runtime protection state, saved every minute and reloaded at boot
+checkpoint = Checkpoint(os.getenv("CHECKPOINT_PATH") or checkpoint_path(getattr(bot, "shard_ids", None)))
+# Guilds prepared at once in on_ready
+GUILD_SETUP_CONCURRENCY = 16
+# Per-guild trusted users and roles; the owner is trusted everywhere
+trust = TrustStore(store, owners={OWNER_ID})
+trust.attach(bot)
+audit_index = AuditIndex()
+audit_index.attach(bot)
+log_channels = LogChannelCache()
+log_channels.attach(bot)
+scheduler = ActionScheduler()
+log_dispatcher = LogDispatcher(log_channels.get, scheduler=scheduler)
+# Every detection is also journaled locally, searchable with !incidents
+journal = IncidentJournal(os.getenv("INCIDENT_JOURNAL", os.path.join("state", "incidents.db")))
+
+# Instrumentation, also served as Prometheus text on localhost (0 disables)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+metrics_server = None
+metrics.instrument_http(bot.http)
+metrics.gauge("scheduler_queue_depth", scheduler.depth)
+metrics.gauge("log_backlog", log_dispatcher.depth)
+metrics.gauge("journal_backlog", journal.depth)
+mute_roles = MuteRoleManager(scheduler)
+mute_roles.attach(bot)
+# Known webhooks per channel, so a webhooks update costs one fetch
+webhooks = WebhookIndex()
+webhooks.attach(bot)
+
+# Message scanning: links are blocked unless their domain is allowed
+ALLOWED_DOMAINS = set()
+BLOCKED_DOMAINS = set()
+BANNED_TERMS = set()
+scanner = MessageScanner(ALLOWED_DOMAINS, BLOCKED_DOMAINS, BANNED_TERMS)
 
 # Protection systems
-message_count = defaultdict(list)
-BACKUP_FILE = "server_backup.json"
+rate_tracker = RateTracker(limit=5, window=5.0)
+metrics.gauge("rate_tracked_users", rate_tracker.__len__)
+checkpoint.register("rate_tracker", rate_tracker)
+# Recent message ids per user, bulk deleted when they are punished
+recent_messages = RecentMessages()
+metrics.gauge("recent_message_users", recent_messages.__len__)
 PUNISHMENT_DURATION = timedelta(days=1)  # 1 day timeout
 
-# Backup Data
-backup_data = {
-    "roles": {},
-    "channels": {},
-    "permissions": {}
-}
-
-def create_log_embed(title, color, fields):
-    embed = discord.Embed(title=title, color=color, timestamp=datetime.utcnow())
-    for name, value in fields.items():
-        embed.add_field(name=name, value=value, inline=False)
-    return embed
+# Versioned structure snapshots, restorable as of any retained point in time
+snapshots = SnapshotStore()
+snapshots.load()
 
 async def get_log_channel(guild):
-    log_channel = discord.utils.get(guild.text_channels, name="security-logs")
-    if log_channel is None:
-        overwrites = {
-            guild.default_role: discord.PermissionOverwrite(send_messages=False),
-            guild.me: discord.PermissionOverwrite(send_messages=True)
-        }
-        log_channel = await guild.create_text_channel(
-            "security-logs",
-            overwrites=overwrites,
-            reason="Automatic log channel creation"
-        )
-    return log_channel
+    return await log_channels.get(guild)
+
+async def post_verdict_summary(guild, verdict):
+    """Log one summary for everything a punished actor did after their first offence"""
+    kinds = Counter(kind for kind, _, _ in verdict.damage)
+    affected = ", ".join(name for _, name, _ in verdict.damage)
+    if len(affected) > 1024:
+        affected = affected[:1021] + "..."
+    await context.report(guild, "🧾 Incident Summary", discord.Color.dark_red(), {
+        "User": f"{verdict.actor} ({verdict.actor.id}) [{verdict.reason}]",
+        "Damage": ", ".join(f"{count}× {kind}" for kind, count in kinds.items()),
+        "Affected": affected
+    }, action="incident_summary", actor=verdict.actor)
+
+verdicts = VerdictCache(on_summary=post_verdict_summary, store=store)
+checkpoint.register("verdicts", verdicts)
+
+# Protections are detector cogs; the engine dispatches each guild's enabled ones
+context = SecurityContext(
+    bot, profile=profile, trust=trust, audit_index=audit_index, scheduler=scheduler,
+    log_dispatcher=log_dispatcher, journal=journal, checkpoint=checkpoint, verdicts=verdicts, snapshots=snapshots,
+    scanner=scanner, rate_tracker=rate_tracker, recent_messages=recent_messages, webhooks=webhooks,
+    mute_roles=mute_roles, punishment_duration=PUNISHMENT_DURATION)
+engine = ProtectionEngine(bot, store, context)
+EXTENSIONS = ("cogs.structure", "cogs.members", "cogs.raids", "cogs.messages", "cogs.admin")
+
+@bot.event
+async def setup_hook():
+    await bot.add_cog(engine)
+    for extension in EXTENSIONS:
+        await bot.load_extension(extension)
+    # Every part is registered once the extensions are in; restore before connecting.
+    restored = checkpoint.load()
+    if restored:
+        print(f"♻️ Restored {', '.join(restored)} from the last checkpoint")
 
 @bot.event
 async def on_ready():
     print(f'✅ Logged in as {bot.user} (Security Mode: MAXIMUM)')
-    for guild in bot.guilds:
+    print_startup_report()
+    global metrics_server
+    if METRICS_PORT and metrics_server is None:
+        try:
+            metrics_server = await metrics.serve(port=METRICS_PORT)
+        except OSError as exc:
+            print(f"⚠️ Metrics endpoint disabled: {exc}")
+    # The bot creates the log channel itself; never treat that as an attack.
+    trust.add_user(GLOBAL, bot.user.id)
+    # on_ready fires again after every reconnect; each step is safe to repeat.
+    limit = asyncio.Semaphore(GUILD_SETUP_CONCURRENCY)
+    results = await asyncio.gather(*(prepare_guild(guild, limit) for guild in bot.guilds), return_exceptions=True)
+    for guild, result in zip(bot.guilds, results):
+        if isinstance(result, Exception):
+            print(f"⚠️ Could not prepare {guild.name} ({guild.id}): {result}")
+    for loop in (auto_backup, sweep_rate_tracker, sync_shared_state, save_checkpoint):
+        if not loop.is_running():
+            loop.start()
+
+async def prepare_guild(guild, limit):
+    """Log channel, webhook index, first snapshot and Muted role for one guild"""
+    async with limit:
         await get_log_channel(guild)
-        await backup_server_data(guild)
-    auto_backup.start()
-
-@tasks.loop(minutes=10)
+        if engine.enabled(guild.id, "webhooks") and not webhooks.is_filled(guild.id):
+            await webhooks.fill(guild)
+    if snapshots.get(guild.id) is None:
+        snapshots.capture(guild)
+    mute_roles.provision(guild)
+
+def print_startup_report():
+    if "startup_seconds" in metrics.gauges:
+        return  # reconnect, not a startup
+    report = profile.startup_report(bot)
+    metrics.gauge("startup_seconds", lambda: round(report["startup_seconds"], 2))
+    metrics.gauge("cached_members", lambda: sum(len(guild.members) for guild in bot.guilds))
+    rss = f"{report['peak_rss_mb']:.0f} MB" if report["peak_rss_mb"] is not None else "n/a"
+    print(f"📊 Profile {report['profile']}: ready in {report['startup_seconds']:.1f}s, "
+          f"{report['guilds']} guilds, {report['cached_members']}/{report['members']} members cached, "
+          f"peak RSS {rss}")
+
+@tasks.loop(seconds=2)
+async def sync_shared_state():
+    """Pick up whitelist changes made by other shard processes"""
+    trust.refresh()
+    if sync_shared_state.current_loop % 300 == 0:
+        store.prune_verdicts()
+
+@tasks.loop(minutes=1)
+async def sweep_rate_tracker():
+    rate_tracker.sweep()
+
+@tasks.loop(seconds=CHECKPOINT_INTERVAL)
+async def save_checkpoint():
+    """Save rate windows, verdicts, raid lockdowns and limits for a warm restart"""
+    await checkpoint.save()
+
+@tasks.loop(seconds=30)
 async def auto_backup():
-    for guild in bot.guilds:
-        await backup_server_data(guild)
-    with open(BACKUP_FILE, 'w') as f:
-        json.dump(backup_data, f, indent=2)
-
-async def backup_server_data(guild):
-    backup_data["roles"][str(guild.id)] = [(r.name, r.permissions.value) for r in guild.roles if not r.is_default()]
-    backup_data["channels"][str(guild.id)] = [(c.name, str(c.type)) for c in guild.channels]
-
-@bot.command()
-@commands.is_owner()
-async def restore(ctx):
-    guild = ctx.guild
-    await ctx.send("♻️ Restoring server structure...")
-
-    for r_name, perms in backup_data["roles"].get(str(guild.id), []):
-        await guild.create_role(name=r_name, permissions=discord.Permissions(perms))
-
-    for c_name, c_type in backup_data["channels"].get(str(guild.id), []):
-        if c_type == "text":
-            await guild.create_text_channel(c_name)
-        elif c_type == "voice":
-            await guild.create_voice_channel(c_name)
-
-    await ctx.send("✅ Server restoration completed!")
-
-# ========================
-# ENHANCED WHITELIST SYSTEM
-# ========================
-@bot.command()
-@commands.is_owner()
-async def whitelist_show(ctx):
-    """Show all whitelisted users"""
-    members = []
-    for user_id in whitelisted:
-        user = bot.get_user(user_id)
-        members.append(f"{user.mention if user else 'Unknown user'} (ID: {user_id})")
-    
-    embed = discord.Embed(title="🔐 Whitelisted Users", color=discord.Color.blue())
-    embed.description = "\n".join(members) if members else "No whitelisted users"
-    await ctx.send(embed=embed)
-
-@bot.command()
-@commands.is_owner()
-async def whitelist(ctx, member: discord.Member):
-    """Add user to whitelist"""
-    whitelisted.add(member.id)
-    await ctx.send(f"✅ {member} has been added to the whitelist!")
-    log_channel = await get_log_channel(ctx.guild)
-    embed = create_log_embed("✅ WHITELIST ADDED", discord.Color.green(), {
-        "User": f"{member} ({member.id})",
-        "Action": "Added to whitelist",
-        "By": ctx.author.mention
-    })
-    await log_channel.send(embed=embed)
-
-@bot.command()
-@commands.is_owner()
-async def whitelist_remove(ctx, member: discord.Member):
-    """Remove user from whitelist"""
-    whitelisted.discard(member.id)
-    await ctx.send(f"❌ {member} has been removed from the whitelist!")
-    log_channel = await get_log_channel(ctx.guild)
-    embed = create_log_embed("❌ WHITELIST REMOVED", discord.Color.red(), {
-        "User": f"{member} ({member.id})",
-        "Action": "Removed from whitelist",
-        "By": ctx.author.mention
-    })
-    await log_channel.send(embed=embed)
-
-# ========================
-# ENHANCED SECURITY SYSTEMS
-# ========================
-@bot.event
-async def on_member_update(before, after):
-    """Enhanced role assignment protection"""
-    # Check for role additions
-    added_roles = [role for role in after.roles if role not in before.roles]
-    if added_roles:
-        async for entry in after.guild.audit_logs(action=discord.AuditLogAction.member_role_update, limit=1):
-            if entry.user.id not in whitelisted and entry.user != after:
-                # Ban the user who assigned the roles
-                await entry.user.ban(reason="Unauthorized role assignment")
-                
-                # Remove the added roles from the target user
-                for role in added_roles:
-                    await after.remove_roles(role, reason="Unauthorized role assignment")
-                
-                # Timeout the user who received the roles (1 day timeout)
-                try:
-                    await after.timeout(PUNISHMENT_DURATION, reason="Received unauthorized roles")
-                except discord.Forbidden:
-                    pass
-                
-                # Log the action
-                log_channel = await get_log_channel(after.guild)
-                embed = create_log_embed("🚨 Unauthorized Role Assignment", discord.Color.red(), {
-                    "Assigner": f"{entry.user} ({entry.user.id}) [BANNED]",
-                    "Target": f"{after} ({after.id}) [TIMEOUT + ROLES REMOVED]",
-                    "Roles": ', '.join([role.name for role in added_roles]),
-                    "Reason": "Unauthorized role assignment"
-                })
-                await log_channel.send(embed=embed)
-
-@bot.event
-async def on_guild_role_update(before, after):
-    """Enhanced role modification protection"""
-    async for entry in after.guild.audit_logs(action=discord.AuditLogAction.role_update, limit=1):
-        if entry.user.id not in whitelisted:
-            await entry.user.ban(reason="Unauthorized role modification")
-            log_channel = await get_log_channel(after.guild)
-            embed = create_log_embed("🚨 Unauthorized Role Modification", discord.Color.red(), {
-                "User": f"{entry.user} ({entry.user.id})",
-                "Action": "BANNED",
-                "Role": after.name,
-                "Changes": f"Permissions: {before.permissions.value} → {after.permissions.value}",
-                "Reason": "Unauthorized role modification"
-            })
-            await log_channel.send(embed=embed)
-
-@bot.event
-async def on_member_ban(guild, user):
-    """Enhanced ban protection"""
-    async for entry in guild.audit_logs(action=discord.AuditLogAction.ban, limit=1):
-        if entry.user.id not in whitelisted:
-            member = guild.get_member(entry.user.id)
-            if member:
-                await member.edit(roles=[])
-                await member.kick(reason="Unauthorized ban attempt")
-                log_channel = await get_log_channel(guild)
-                embed = create_log_embed("🚨 Unauthorized Ban Attempt", discord.Color.red(), {
-                    "User": f"{entry.user} ({entry.user.id}) [KICKED]",
-                    "Target": f"{user} ({user.id})",
-                    "Action": "Kicked + Roles Cleared",
-                    "Reason": "Unauthorized ban attempt"
-                })
-                await log_channel.send(embed=embed)
-
-@bot.event
-async def on_message(message):
-    """Enhanced message protection system"""
-    if message.author.bot:
-        return
-
-    # Spam protection
-    uid = message.author.id
-    now = datetime.utcnow().timestamp()
-    message_count[uid].append(now)
-    message_count[uid] = [t for t in message_count[uid] if now - t < 5]
-
-    if len(message_count[uid]) > 5 and uid not in whitelisted:
-        await mute_user(message.author)
-        log_channel = await get_log_channel(message.guild)
-        embed = create_log_embed("⚠️ User Muted for Spamming", discord.Color.orange(), {
-            "User": message.author.mention,
-            "Count": f"{len(message_count[uid])} messages/5s",
-            "Action": "Muted"
-        })
-        await log_channel.send(embed=embed)
-
-    # Anti-link protection
-    if LINK_PATTERN.search(message.content) and message.author.id not in whitelisted:
-        await message.delete()
-        try:
-            await message.author.timeout(timedelta(minutes=10), reason="Link posting")
-        except:
-            pass
-        log_channel = await get_log_channel(message.guild)
-        embed = create_log_embed("🚫 Link Detected", discord.Color.orange(), {
-            "User": message.author.mention,
-            "Action": "Message deleted + timeout",
-            "Channel": message.channel.mention
-        })
-        await log_channel.send(embed=embed)
-
-    # Mass mention protection
-    if ("@everyone" in message.content or "@here" in message.content) and message.author.id not in whitelisted:
-        try:
-            await message.author.timeout(timedelta(hours=1), reason="Mass mention")
-            await message.delete()
-            log_channel = await get_log_channel(message.guild)
-            embed = create_log_embed("🚷 Mass Mention Detected", discord.Color.red(), {
-                "User": message.author.mention,
-                "Action": "Timeout + message deleted",
-                "Duration": "1 hour"
-            })
-            await log_channel.send(embed=embed)
-        except:
-            pass
-
-    await bot.process_commands(message)
-
-async def mute_user(member):
-    """Mute a user by adding Muted role"""
-    guild = member.guild
-    muted = discord.utils.get(guild.roles, name="Muted")
-    if not muted:
-        muted = await guild.create_role(name="Muted")
-        for channel in guild.channels:
-            await channel.set_permissions(muted, send_messages=False)
-    await member.add_roles(muted)
-
-# ========================
-# CHANNEL AND ROLE PROTECTION
-# ========================
-@bot.event
-async def on_guild_channel_create(channel):
-    """Auto-ban for unauthorized channel creation"""
-    async for entry in channel.guild.audit_logs(action=discord.AuditLogAction.channel_create, limit=1):
-        if entry.user.id not in whitelisted:
-            await channel.delete()
-            await entry.user.ban(reason="Unauthorized channel creation")
-            log_channel = await get_log_channel(channel.guild)
-            embed = create_log_embed("🚨 Unauthorized Channel Created", discord.Color.red(), {
-                "User": f"{entry.user} ({entry.user.id})",
-                "Action": "BANNED + Channel deleted",
-                "Channel": channel.name
-            })
-            await log_channel.send(embed=embed)
-
-@bot.event
-async def on_guild_channel_delete(channel):
-    """Auto-ban for unauthorized channel deletion"""
-    async for entry in channel.guild.audit_logs(action=discord.AuditLogAction.channel_delete, limit=1):
-        if entry.user.id not in whitelisted:
-            await entry.user.ban(reason="Unauthorized channel deletion")
-            log_channel = await get_log_channel(channel.guild)
-            embed = create_log_embed("🚨 Unauthorized Channel Deleted", discord.Color.red(), {
-                "User": f"{entry.user} ({entry.user.id})",
-                "Action": "BANNED",
-                "Channel": channel.name
-            })
-            await log_channel.send(embed=embed)
-
-@bot.event
-async def on_guild_role_create(role):
-    """Auto-ban for unauthorized role creation"""
-    async for entry in role.guild.audit_logs(action=discord.AuditLogAction.role_create, limit=1):
-        if entry.user.id not in whitelisted:
-            await role.delete()
-            await entry.user.ban(reason="Unauthorized role creation")
-            log_channel = await get_log_channel(role.guild)
-            embed = create_log_embed("🚨 Unauthorized Role Created", discord.Color.red(), {
-                "User": f"{entry.user} ({entry.user.id})",
-                "Action": "BANNED + Role deleted",
-                "Role": role.name
-            })
-            await log_channel.send(embed=embed)
-
-@bot.event
-async def on_guild_role_delete(role):
-    """Auto-ban for unauthorized role deletion"""
-    async for entry in role.guild.audit_logs(action=discord.AuditLogAction.role_delete, limit=1):
-        if entry.user.id not in whitelisted:
-            await entry.user.ban(reason="Unauthorized role deletion")
-            log_channel = await get_log_channel(role.guild)
-            embed = create_log_embed("🚨 Unauthorized Role Deleted", discord.Color.red(), {
-                "User": f"{entry.user} ({entry.user.id})",
-                "Action": "BANNED",
-                "Role": role.name
-            })
-            await log_channel.send(embed=embed)
-
-# ========================
-# BOT PROTECTION SYSTEM
-# ========================
-@bot.event
-async def on_member_join(member):
-    """Auto-ban for unauthorized bot additions"""
-    if member.bot:
-        async for entry in member.guild.audit_logs(action=discord.AuditLogAction.bot_add, limit=1):
-            if entry.user.id not in whitelisted:
-                await entry.user.ban(reason="Unauthorized bot addition")
-                await member.kick(reason="Unauthorized bot")
-                log_channel = await get_log_channel(member.guild)
-                embed = create_log_embed("🤖 Unauthorized Bot Added", discord.Color.red(), {
-                    "Inviter": f"{entry.user} ({entry.user.id}) [BANNED]",
-                    "Bot": f"{member} ({member.id}) [KICKED]"
-                })
-                await log_channel.send(embed=embed)
+    """Append a snapshot version for every guild that changed since the last run"""
+    await snapshots.flush()
 
-bot.run(TOKEN)
+if __name__ == "__main__":
+    bot.run(TOKEN)
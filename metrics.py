@@ -0,0 +1,205 @@
+import bisect
+import contextvars
+import logging
+import time
+from collections import defaultdict
+
+import discord
+
+# Histogram bucket upper bounds, in seconds. Anything slower lands in +Inf.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PREFIX = "security_bot_"
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108
+
+# perf_counter() at the start of the gateway event being handled, so work
+# queued from a handler can report how long after the event it landed.
+event_started = contextvars.ContextVar("event_started", default=None)
+
+log = logging.getLogger(__name__)
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(BUCKETS[i], self.max) if i < len(BUCKETS) else self.max
+        return self.max
+
+
+class _RateLimitFilter(logging.Filter):
+    """Counts the 429s discord.py logs while letting the records through."""
+
+    def __init__(self, metrics):
+        super().__init__()
+        self.metrics = metrics
+
+    def filter(self, record):
+        if isinstance(record.msg, str):
+            if record.msg.startswith("We are being rate limited"):
+                self.metrics.inc("rest_rate_limited_total")
+            elif record.msg.startswith("Global rate limit"):
+                self.metrics.inc("rest_global_rate_limited_total")
+        return True
+
+
+class Metrics:
+    """In-process counters, latency histograms and gauges.
+
+    Recording is a dict lookup and an integer bump, cheap enough to leave on
+    in production. ``report`` summarises everything for the stats embed and
+    ``render`` produces Prometheus text for the localhost endpoint.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.counters = defaultdict(int)
+        self.histograms = {}
+        self.gauges = {}
+
+    def inc(self, name, value=1, **labels):
+        self.counters[(name, tuple(sorted(labels.items())))] += value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+    def gauge(self, name, func):
+        """Register a callable that returns the gauge's current value."""
+        self.gauges[name] = func
+
+    def total(self, name):
+        return sum(value for (counter, _), value in self.counters.items() if counter == name)
+
+    def instrument_http(self, http):
+        """Count and time every REST request made through ``http``."""
+        request = http.request
+
+        async def instrumented(route, **kwargs):
+            start = time.perf_counter()
+            status = "ok"
+            try:
+                return await request(route, **kwargs)
+            except discord.HTTPException as exc:
+                status = str(exc.status)
+                raise
+            finally:
+                self.inc("rest_requests_total", route=f"{route.method} {route.path}", status=status)
+                self.observe("rest_request_seconds", time.perf_counter() - start)
+
+        http.request = instrumented
+        logging.getLogger("discord.http").addFilter(_RateLimitFilter(self))
+
+    def report(self):
+        """Human-readable sections for the stats embed, as (title, text) pairs."""
+        minutes = max((time.monotonic() - self.started) / 60, 1.0)
+
+        def ms(seconds):
+            return f"{seconds * 1000:.1f} ms"
+
+        def line(label, histogram):
+            return (f"`{label}` {histogram.count}× p50 {ms(histogram.quantile(0.5))}, "
+                    f"p95 {ms(histogram.quantile(0.95))}, max {ms(histogram.max)}")
+
+        def lines(name, label):
+            found = sorted(((dict(labels)[label], h) for (metric, labels), h in self.histograms.items()
+                            if metric == name), key=lambda item: -item[1].count)
+            return "\n".join(line(key, h) for key, h in found[:8]) or "No data yet"
+
+        rest = self.total("rest_requests_total")
+        errors = sum(value for (name, labels), value in self.counters.items()
+                     if name == "rest_requests_total" and dict(labels)["status"] != "ok")
+        audit = {dict(labels)["source"]: value for (name, labels), value in self.counters.items()
+                 if name == "audit_lookups_total"}
+        log_lag = self.histograms.get(("log_lag_seconds", ()))
+
+        sections = [
+            ("Handlers", lines("handler_seconds", "handler")),
+            ("Event → action", lines("event_to_action_seconds", "priority")),
+            ("REST", f"{rest} calls ({rest / minutes:.1f}/min), {errors} errors, "
+                     f"{self.total('rest_rate_limited_total')} rate limited"),
+            ("Audit log", f"{audit.get('index', 0)} indexed, {audit.get('push', 0)} after waiting, "
+                          f"{self.total('audit_fetches_total')} fetches "
+                          f"({self.total('audit_fetches_total') / minutes:.1f}/min), "
+                          f"{audit.get('miss', 0)} unresolved"),
+            ("Queues", "\n".join(f"`{name}` {func()}" for name, func in self.gauges.items())
+                       + (f"\nLog lag p95 {ms(log_lag.quantile(0.95))}" if log_lag else "")),
+        ]
+        return [(title, text[:1024]) for title, text in sections]
+
+    def render(self):
+        """Prometheus text exposition of every metric."""
+        out = []
+        typed = set()
+
+        def labelled(name, labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return PREFIX + name
+            return PREFIX + name + "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+        for (name, labels), value in sorted(self.counters.items()):
+            if name not in typed:
+                typed.add(name)
+                out.append(f"# TYPE {PREFIX}{name} counter")
+            out.append(f"{labelled(name, labels)} {value}")
+
+        for (name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+            if name not in typed:
+                typed.add(name)
+                out.append(f"# TYPE {PREFIX}{name} histogram")
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ("+Inf",), histogram.counts):
+                cumulative += count
+                out.append(f"{labelled(name + '_bucket', labels, [('le', bound)])} {cumulative}")
+            out.append(f"{labelled(name + '_sum', labels)} {histogram.total}")
+            out.append(f"{labelled(name + '_count', labels)} {histogram.count}")
+
+        for name, func in self.gauges.items():
+            out.append(f"# TYPE {PREFIX}{name} gauge")
+            out.append(f"{PREFIX}{name} {func()}")
+        out.append(f"# TYPE {PREFIX}uptime_seconds gauge")
+        out.append(f"{PREFIX}uptime_seconds {time.monotonic() - self.started:.0f}")
+        return "\n".join(out) + "\n"
+
+    async def serve(self, host=METRICS_HOST, port=METRICS_PORT):
+        """Serve ``render()`` at http://host:port/metrics; return the runner."""
+        from aiohttp import web
+
+        async def handle(request):
+            return web.Response(text=self.render(), content_type="text/plain", charset="utf-8")
+
+        app = web.Application()
+        app.router.add_get("/metrics", handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        log.info("Serving metrics on http://%s:%s/metrics", host, port)
+        return runner
+
+
+metrics = Metrics()
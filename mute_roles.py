@@ -0,0 +1,90 @@
+import asyncio
+import logging
+
+import discord
+
+from scheduler import PUNISH, CLEANUP
+
+log = logging.getLogger(__name__)
+
+MUTED_ROLE_NAME = "Muted"
+
+
+class MuteRoleManager:
+    """Per-guild Muted role, provisioned ahead of the first mute.
+
+    ``provision`` finds or creates the role once and then applies its
+    channel overwrites concurrently in the background, skipping channels
+    that already have them. Until that finishes, ``mute`` falls back to a
+    native timeout so the first spammer is silenced immediately.
+    """
+
+    def __init__(self, scheduler, name=MUTED_ROLE_NAME):
+        self.scheduler = scheduler
+        self.name = name
+        self._roles = {}
+        self._ready = set()
+        self._provisioning = {}
+
+    def attach(self, bot):
+        bot.add_listener(self.on_guild_join)
+        bot.add_listener(self.on_guild_remove)
+        bot.add_listener(self.on_guild_channel_create)
+        bot.add_listener(self.on_guild_role_delete)
+
+    def provision(self, guild):
+        """Start provisioning the guild's Muted role if it is not ready or under way."""
+        if guild.id in self._ready or guild.id in self._provisioning:
+            return
+        task = asyncio.ensure_future(self._provision(guild))
+        self._provisioning[guild.id] = task
+        task.add_done_callback(lambda _: self._provisioning.pop(guild.id, None))
+
+    def is_ready(self, guild_id):
+        return guild_id in self._ready
+
+    async def mute(self, member, duration, reason="Spamming"):
+        """Mute a member with the role when it is ready, else with a timeout."""
+        role = self._roles.get(member.guild.id)
+        if role is not None and member.guild.id in self._ready:
+            return self.scheduler.submit_once(member.guild.id, ("mute", member.id), PUNISH, "member_edit",
+                                              member.add_roles, role, reason=reason)
+        self.provision(member.guild)
+        return self.scheduler.timeout(member, duration, reason=reason)
+
+    async def _provision(self, guild):
+        role = discord.utils.get(guild.roles, name=self.name)
+        if role is None:
+            try:
+                role = await guild.create_role(name=self.name, reason="Mute role provisioning")
+            except discord.HTTPException as exc:
+                log.warning("Could not create the Muted role in guild %s: %s", guild.id, exc)
+                return
+        self._roles[guild.id] = role
+        jobs = [self._apply(channel, role) for channel in guild.channels
+                if channel.overwrites_for(role).send_messages is not False]
+        await asyncio.gather(*jobs, return_exceptions=True)
+        self._ready.add(guild.id)
+
+    def _apply(self, channel, role):
+        return self.scheduler.submit(channel.guild.id, CLEANUP, "channel_overwrite", channel.set_permissions,
+                                     role, send_messages=False, reason="Mute role provisioning")
+
+    async def on_guild_join(self, guild):
+        self.provision(guild)
+
+    async def on_guild_remove(self, guild):
+        self._roles.pop(guild.id, None)
+        self._ready.discard(guild.id)
+
+    async def on_guild_channel_create(self, channel):
+        role = self._roles.get(channel.guild.id)
+        if role is not None and channel.guild.id in self._ready:
+            self._apply(channel, role)
+
+    async def on_guild_role_delete(self, role):
+        cached = self._roles.get(role.guild.id)
+        if cached is not None and cached.id == role.id:
+            del self._roles[role.guild.id]
+            self._ready.discard(role.guild.id)
+            self.provision(role.guild)
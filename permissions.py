@@ -0,0 +1,35 @@
+import discord
+
+# Permissions that let a role take over, wreck or mass-ping a server. A role
+# edit or grant that adds none of them is left alone: no audit log fetch, no
+# enforcement.
+DANGEROUS = discord.Permissions(
+    administrator=True,
+    manage_guild=True,
+    manage_roles=True,
+    manage_channels=True,
+    manage_webhooks=True,
+    manage_expressions=True,
+    manage_messages=True,
+    manage_threads=True,
+    manage_nicknames=True,
+    ban_members=True,
+    kick_members=True,
+    moderate_members=True,
+    mention_everyone=True,
+).value
+
+
+def dangerous(value):
+    """The dangerous bits set in a permission value."""
+    return value & DANGEROUS
+
+
+def escalation(before, after):
+    """The dangerous bits ``after`` grants that ``before`` did not."""
+    return after & ~before & DANGEROUS
+
+
+def names(value):
+    """Names of the permissions set in ``value``, for logs."""
+    return [name for name, enabled in discord.Permissions(value) if enabled]
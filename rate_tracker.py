@@ -0,0 +1,124 @@
+import time
+
+DEFAULT_LIMIT = 5
+DEFAULT_WINDOW = 5.0
+# Users with no message for this long are dropped by sweep().
+IDLE_TTL = 60.0
+
+
+class _Ring:
+    __slots__ = ("stamps", "index", "last")
+
+    def __init__(self, size):
+        self.stamps = [float("-inf")] * size
+        self.index = 0
+        self.last = 0.0
+
+
+class RateTracker:
+    """Sliding-window message counter built on fixed-size ring buffers.
+
+    Each tracked user keeps the timestamps of their last ``limit + 1``
+    messages, so a hit is O(1) and allocates nothing: the user is over the
+    limit when the slot about to be overwritten is still inside the window.
+    Limits can be overridden per guild and per channel; a channel override
+    also gives that channel its own counters.
+    """
+
+    def __init__(self, limit=DEFAULT_LIMIT, window=DEFAULT_WINDOW, idle_ttl=IDLE_TTL):
+        self.default = (limit, window)
+        self.idle_ttl = idle_ttl
+        self._guild_limits = {}
+        self._channel_limits = {}
+        self._rings = {}
+
+    def set_limit(self, guild_id, limit, window, channel_id=None):
+        """Override the threshold for a guild, or for one channel in it."""
+        if channel_id is None:
+            self._guild_limits[guild_id] = (limit, window)
+        else:
+            self._channel_limits[channel_id] = (limit, window)
+
+    def clear_limit(self, guild_id, channel_id=None):
+        if channel_id is None:
+            self._guild_limits.pop(guild_id, None)
+        else:
+            self._channel_limits.pop(channel_id, None)
+
+    def limit_for(self, guild_id, channel_id):
+        limits = self._channel_limits.get(channel_id)
+        if limits is None:
+            limits = self._guild_limits.get(guild_id, self.default)
+        return limits
+
+    def hit(self, guild_id, channel_id, user_id, now=None):
+        """Record a message; return the burst size if the limit was exceeded, else 0.
+
+        A burst is reported once: the user's buffer is cleared when it trips.
+        """
+        if now is None:
+            now = time.monotonic()
+        if channel_id in self._channel_limits:
+            limit, window = self._channel_limits[channel_id]
+            key = (channel_id, user_id)
+        else:
+            limit, window = self._guild_limits.get(guild_id, self.default)
+            key = (guild_id, user_id)
+
+        ring = self._rings.get(key)
+        if ring is None or len(ring.stamps) != limit + 1:
+            ring = self._rings[key] = _Ring(limit + 1)
+        stamps = ring.stamps
+        stamps[ring.index] = now
+        ring.index = (ring.index + 1) % len(stamps)
+        ring.last = now
+        if now - stamps[ring.index] >= window:
+            return 0
+
+        count = sum(1 for stamp in stamps if now - stamp < window)
+        del self._rings[key]
+        return count
+
+    def sweep(self, now=None):
+        """Drop users idle for longer than ``idle_ttl``; return how many were dropped."""
+        if now is None:
+            now = time.monotonic()
+        cutoff = now - self.idle_ttl
+        idle = [key for key, ring in self._rings.items() if ring.last < cutoff]
+        for key in idle:
+            del self._rings[key]
+        return len(idle)
+
+    def checkpoint(self, now=None):
+        """Limits and live windows, with timestamps saved as ages."""
+        if now is None:
+            now = time.monotonic()
+        rings = []
+        for (scope, user_id), ring in self._rings.items():
+            if now - ring.last < self.idle_ttl:
+                ages = [None if stamp == float("-inf") else now - stamp for stamp in ring.stamps]
+                rings.append([scope, user_id, ring.index, ages, now - ring.last])
+        return {
+            "guild_limits": [[guild_id, *limits] for guild_id, limits in self._guild_limits.items()],
+            "channel_limits": [[channel_id, *limits] for channel_id, limits in self._channel_limits.items()],
+            "rings": rings
+        }
+
+    def restore(self, state, elapsed, now=None):
+        if now is None:
+            now = time.monotonic()
+        self._guild_limits.update((guild_id, (limit, window)) for guild_id, limit, window in state["guild_limits"])
+        self._channel_limits.update((channel_id, (limit, window))
+                                    for channel_id, limit, window in state["channel_limits"])
+        then = now - elapsed
+        for scope, user_id, index, ages, idle in state["rings"]:
+            if elapsed + idle >= self.idle_ttl:
+                continue
+            ring = _Ring(len(ages))
+            ring.stamps = [float("-inf") if age is None else then - age for age in ages]
+            ring.index = index
+            ring.last = then - idle
+            self._rings[(scope, user_id)] = ring
+
+    def __len__(self):
+        return len(self._rings)
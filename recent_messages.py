@@ -0,0 +1,82 @@
+import time
+from collections import OrderedDict, deque
+
+# Messages remembered per user, and for how long. A burst worth purging is
+# seconds old; bulk delete refuses anything older than 14 days anyway.
+MAX_PER_USER = 50
+TTL = 60.0
+MAX_USERS = 20000
+
+
+class _Recent:
+    __slots__ = ("entries", "last", "purged_until")
+
+    def __init__(self, per_user):
+        self.entries = deque(maxlen=per_user)
+        self.last = 0.0
+        self.purged_until = 0.0
+
+
+class RecentMessages:
+    """The ids of each user's recent messages, per guild, by channel.
+
+    Only ids and the channel they went to are kept, in a bounded deque per
+    user. Users live in one OrderedDict in last-seen order: those not seen
+    within TTL are popped from the front on every add, and past
+    ``max_users`` the oldest goes, so memory stays flat. ``take`` hands a
+    user's messages over for a purge and marks the user for TTL, so what
+    they post before their punishment lands can go the same way.
+    """
+
+    def __init__(self, per_user=MAX_PER_USER, ttl=TTL, max_users=MAX_USERS):
+        self.per_user = per_user
+        self.ttl = ttl
+        self.max_users = max_users
+        self._users = OrderedDict()
+
+    def add(self, message, now=None):
+        """Remember a message; return True if its author was purged within TTL."""
+        if now is None:
+            now = time.monotonic()
+        users = self._users
+        cutoff = now - self.ttl
+        while users:
+            oldest = next(iter(users.values()))
+            if oldest.last >= cutoff:
+                break
+            users.popitem(last=False)
+
+        key = (message.guild.id, message.author.id)
+        recent = users.get(key)
+        if recent is None:
+            recent = users[key] = _Recent(self.per_user)
+            if len(users) > self.max_users:
+                users.popitem(last=False)
+        else:
+            users.move_to_end(key)
+        recent.entries.append((now, message.channel, message.id))
+        recent.last = now
+        return now < recent.purged_until
+
+    def take(self, guild_id, user_id, now=None):
+        """Hand over a user's recent message ids as ``{channel: set of ids}`` and mark them purged."""
+        if now is None:
+            now = time.monotonic()
+        key = (guild_id, user_id)
+        recent = self._users.get(key)
+        if recent is None:
+            recent = self._users[key] = _Recent(self.per_user)
+        else:
+            self._users.move_to_end(key)
+        cutoff = now - self.ttl
+        channels = {}
+        for at, channel, message_id in recent.entries:
+            if at >= cutoff:
+                channels.setdefault(channel, set()).add(message_id)
+        recent.entries.clear()
+        recent.last = now
+        recent.purged_until = now + self.ttl
+        return channels
+
+    def __len__(self):
+        return len(self._users)
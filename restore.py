@@ -0,0 +1,295 @@
+import asyncio
+
+import discord
+
+from scheduler import CLEANUP
+
+ROLE_FIELDS = ("name", "permissions", "color", "hoist", "mentionable")
+CREATE_METHODS = {
+    "text": "create_text_channel",
+    "news": "create_text_channel",
+    "voice": "create_voice_channel",
+    "stage_voice": "create_stage_channel",
+    "category": "create_category",
+    "forum": "create_forum"
+}
+TEXT_OPTIONS = ("topic", "nsfw", "slowmode_delay")
+VOICE_OPTIONS = ("bitrate", "user_limit")
+
+
+class RestorePlan:
+    """What a restore has to change to bring a guild back to its snapshot.
+
+    Roles and channels are matched to the snapshot by id first and by name
+    (and type) second, so anything that still exists, or was already
+    recreated by an earlier restore, is edited or left alone instead of
+    being duplicated.
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.role_creates = []
+        self.role_edits = []
+        self.role_matches = {}
+        self.channel_creates = []
+        self.channel_edits = []
+        self.channel_matches = {}
+        self.reorder_roles = False
+        self.reorder_channels = False
+        # Snapshot ids whose role or channel was recreated under a new id.
+        self.recreated_roles = []
+        self.recreated_channels = []
+
+    def api_calls(self):
+        """Estimated REST calls needed to carry out the plan."""
+        return (len(self.role_creates) + len(self.role_edits) + len(self.channel_creates)
+                + len(self.channel_edits) + self.reorder_roles + self.reorder_channels)
+
+    def is_empty(self):
+        return self.api_calls() == 0
+
+    def describe(self):
+        lines = [f"➕ Role **{r['name']}**" for r in self.role_creates]
+        lines += [f"✏️ Role **{role.name}**: {', '.join(changes)}" for role, _, changes in self.role_edits]
+        lines += [f"➕ {c['type'].capitalize()} **{c['name']}**" for c in self.channel_creates]
+        lines += [f"✏️ Channel **{channel.name}**: {', '.join(changes)}" for channel, _, changes in self.channel_edits]
+        if self.reorder_roles:
+            lines.append("↕️ Reorder roles")
+        if self.reorder_channels:
+            lines.append("↕️ Reorder channels")
+        return lines
+
+
+def plan_restore(guild, snapshot):
+    """Diff the live guild against a snapshot and return a RestorePlan."""
+    plan = RestorePlan(snapshot)
+
+    live_roles = {role.id: role for role in guild.roles if not role.is_default() and not role.managed}
+    by_name = {}
+    for role in live_roles.values():
+        by_name.setdefault(role.name, []).append(role)
+    records = sorted(snapshot["roles"].values(), key=lambda r: r["position"])
+    unmatched = []
+    for record in records:
+        role = live_roles.pop(record["id"], None)
+        if role is not None:
+            by_name[role.name].remove(role)
+            plan.role_matches[record["id"]] = role
+        else:
+            unmatched.append(record)
+    for record in unmatched:
+        candidates = [r for r in by_name.get(record["name"], ()) if r.id in live_roles]
+        if candidates:
+            role = candidates[0]
+            del live_roles[role.id]
+            plan.role_matches[record["id"]] = role
+        else:
+            plan.role_creates.append(record)
+    for record in records:
+        role = plan.role_matches.get(record["id"])
+        if role is not None:
+            changes = _role_changes(role, record)
+            if changes:
+                plan.role_edits.append((role, record, changes))
+    matched_order = [plan.role_matches[r["id"]].position for r in records if r["id"] in plan.role_matches]
+    plan.reorder_roles = bool(plan.role_creates) or matched_order != sorted(matched_order)
+
+    live_channels = {channel.id: channel for channel in guild.channels}
+    records = sorted(snapshot["channels"].values(), key=lambda c: (c["type"] != "category", c["position"]))
+    for record in records:
+        channel = live_channels.pop(record["id"], None)
+        if channel is None:
+            channel = next((c for c in live_channels.values()
+                            if c.name == record["name"] and str(c.type) == record["type"]), None)
+            if channel is not None:
+                del live_channels[channel.id]
+        if channel is None:
+            if record["type"] in CREATE_METHODS:
+                plan.channel_creates.append(record)
+            continue
+        plan.channel_matches[record["id"]] = channel
+    for record in records:
+        channel = plan.channel_matches.get(record["id"])
+        if channel is not None:
+            changes = _channel_changes(plan, channel, record)
+            if changes:
+                plan.channel_edits.append((channel, record, changes))
+    matched = [(r["type"] != "category", r["position"], plan.channel_matches[r["id"]].position)
+               for r in records if r["id"] in plan.channel_matches]
+    plan.reorder_channels = any(a[2] > b[2] for a, b in zip(matched, matched[1:]) if a[0] == b[0])
+    return plan
+
+
+async def execute_restore(guild, plan, scheduler, progress=None):
+    """Carry out a plan, in dependency order, running each phase concurrently."""
+    total = plan.api_calls()
+    done = 0
+
+    async def phase(jobs):
+        nonlocal done
+        if not jobs:
+            return []
+        results = await asyncio.gather(*jobs, return_exceptions=True)
+        done += len(jobs)
+        if progress is not None:
+            await progress(done, total)
+        return results
+
+    def submit(bucket, func, *args, **kwargs):
+        return scheduler.submit(guild.id, CLEANUP, bucket, func, *args, **kwargs)
+
+    # Roles first: channel overwrites refer to them.
+    created = await phase([
+        submit("role", guild.create_role, name=r["name"], permissions=discord.Permissions(r["permissions"]),
+               colour=discord.Colour(r["color"]), hoist=r["hoist"], mentionable=r["mentionable"],
+               reason="Server restore")
+        for r in plan.role_creates
+    ])
+    for record, role in zip(plan.role_creates, created):
+        if not isinstance(role, BaseException):
+            plan.role_matches[record["id"]] = role
+            plan.recreated_roles.append(record["id"])
+    await phase([
+        submit("role", role.edit, reason="Server restore", **_role_kwargs(record))
+        for role, record, _ in plan.role_edits
+    ])
+    if plan.reorder_roles:
+        await phase([submit("role_positions", guild.edit_role_positions, _role_positions(guild, plan), reason="Server restore")])
+
+    # Categories next, then the channels that sit in them.
+    for categories in (True, False):
+        records = [c for c in plan.channel_creates if (c["type"] == "category") == categories]
+        created = await phase([
+            submit("channel", getattr(guild, CREATE_METHODS[r["type"]]), r["name"],
+                   position=r["position"], **_channel_kwargs(plan, guild, r))
+            for r in records
+        ])
+        for record, channel in zip(records, created):
+            if not isinstance(channel, BaseException):
+                plan.channel_matches[record["id"]] = channel
+                plan.recreated_channels.append(record["id"])
+        await phase([
+            submit("channel", channel.edit, name=record["name"], **_channel_kwargs(plan, guild, record))
+            for channel, record, _ in plan.channel_edits if (record["type"] == "category") == categories
+        ])
+    if plan.reorder_channels:
+        # discord.py has no public bulk call for channel positions; this is
+        # the same single PATCH that Guild.edit_role_positions uses for roles.
+        await phase([submit("channel_positions", guild._state.http.bulk_channel_update, guild.id,
+                            _channel_positions(plan), reason="Server restore")])
+
+
+def _role_changes(role, record):
+    changes = []
+    if role.name != record["name"]:
+        changes.append("name")
+    if role.permissions.value != record["permissions"]:
+        changes.append("permissions")
+    if role.color.value != record["color"]:
+        changes.append("colour")
+    if role.hoist != record["hoist"] or role.mentionable != record["mentionable"]:
+        changes.append("display")
+    return changes
+
+
+def _role_kwargs(record):
+    return {
+        "name": record["name"],
+        "permissions": discord.Permissions(record["permissions"]),
+        "colour": discord.Colour(record["color"]),
+        "hoist": record["hoist"],
+        "mentionable": record["mentionable"]
+    }
+
+
+def _role_positions(guild, plan):
+    """Positions for every role below the bot's top role, with the snapshot's roles in snapshot order.
+
+    Roles the snapshot does not cover (managed ones, or any made since)
+    keep their slots; the slots held by snapshot roles are handed out
+    again in snapshot order.
+    """
+    ceiling = guild.me.top_role.position
+    matched = {}
+    for record in plan.snapshot["roles"].values():
+        role = plan.role_matches.get(record["id"])
+        if role is not None and role.position < ceiling:
+            matched[role.id] = (record["position"], role)
+    movable = {role.id: role for role in guild.roles if not role.is_default() and role.position < ceiling}
+    # Roles created by this restore may not be cached yet.
+    movable.update((role_id, role) for role_id, (_, role) in matched.items())
+    slots = sorted(movable.values(), key=lambda role: (role.position, role.id))
+    in_order = iter(role for _, role in sorted(matched.values(), key=lambda m: m[0]))
+    slots = [next(in_order) if role.id in matched else role for role in slots]
+    return {role: position for position, role in enumerate(slots, start=1)}
+
+
+def _channel_changes(plan, channel, record):
+    changes = []
+    if channel.name != record["name"]:
+        changes.append("name")
+    category = _category(plan, record)
+    if record["type"] != "category" and (
+            channel.category_id != (category.id if category else None)
+            or (category is None and str(record.get("category_id")) in plan.snapshot["channels"])):
+        changes.append("category")
+    if _live_overwrites(channel) != _snapshot_overwrites(plan, record):
+        changes.append("overwrites")
+    for key in TEXT_OPTIONS + VOICE_OPTIONS:
+        if key in record and getattr(channel, key, record[key]) != record[key]:
+            changes.append(key)
+    return changes
+
+
+def _channel_kwargs(plan, guild, record):
+    kwargs = {"overwrites": _overwrites(plan, guild, record), "reason": "Server restore"}
+    if record["type"] != "category":
+        kwargs["category"] = _category(plan, record)
+    options = TEXT_OPTIONS if record["type"] in ("text", "news", "forum") else VOICE_OPTIONS
+    kwargs.update({key: record[key] for key in options if key in record})
+    return kwargs
+
+
+def _channel_positions(plan):
+    payload = []
+    for record in plan.snapshot["channels"].values():
+        channel = plan.channel_matches.get(record["id"])
+        if channel is not None:
+            payload.append({"id": channel.id, "position": record["position"]})
+    return payload
+
+
+def _category(plan, record):
+    if not record.get("category_id"):
+        return None
+    return plan.channel_matches.get(record["category_id"])
+
+
+def _overwrites(plan, guild, record):
+    overwrites = {}
+    for o in record["overwrites"]:
+        if o["type"] == "role":
+            target = guild.default_role if o["id"] == guild.id else plan.role_matches.get(o["id"])
+        else:
+            target = guild.get_member(o["id"]) or discord.Object(id=o["id"])
+        if target is not None:
+            overwrites[target] = discord.PermissionOverwrite.from_pair(
+                discord.Permissions(o["allow"]), discord.Permissions(o["deny"]))
+    return overwrites
+
+
+def _live_overwrites(channel):
+    return {(target.id, o.pair()[0].value, o.pair()[1].value) for target, o in channel.overwrites.items()}
+
+
+def _snapshot_overwrites(plan, record):
+    result = set()
+    for o in record["overwrites"]:
+        target_id = o["id"]
+        if o["type"] == "role" and target_id != plan.snapshot["guild_id"]:
+            role = plan.role_matches.get(target_id)
+            if role is None:
+                continue
+            target_id = role.id
+        result.add((target_id, o["allow"], o["deny"]))
+    return result
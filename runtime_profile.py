@@ -0,0 +1,100 @@
+import os
+import time
+
+import discord
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROCESS_STARTED = time.monotonic()
+DEFAULT_PROFILE = "lean"
+
+# Gateway intents each protection needs in the lean profile.
+PROTECTION_INTENTS = {
+    "channels": ("guilds",),
+    "roles": ("guilds",),
+    "webhooks": ("guilds", "webhooks"),
+    "audit": ("guilds", "moderation"),   # audit log entries and bans
+    "members": ("members",),             # role grants and joins
+    "bots": ("members",),
+    "messages": ("guild_messages", "message_content"),
+}
+# Prefix commands, in servers and in DMs.
+COMMAND_INTENTS = ("guilds", "guild_messages", "dm_messages", "message_content")
+
+
+class RuntimeProfile:
+    """Gateway intents and cache settings for the bot process.
+
+    ``full`` is the historical mode: every intent, every member chunked at
+    startup and presences cached. ``lean`` requests only the intents the
+    enabled protections need, never chunks members or caches presences, and
+    keeps no message cache. Members the protections need are fetched when an
+    incident involves them.
+    """
+
+    def __init__(self, name=None, protections=PROTECTION_INTENTS):
+        name = name or os.getenv("BOT_PROFILE", DEFAULT_PROFILE)
+        if name not in ("lean", "full"):
+            raise ValueError(f"Unknown BOT_PROFILE {name!r}; use 'lean' or 'full'")
+        self.name = name
+        self.protections = tuple(protections)
+
+    @property
+    def lean(self):
+        return self.name == "lean"
+
+    def intents(self):
+        if not self.lean:
+            return discord.Intents.all()
+        intents = discord.Intents.none()
+        for flag in COMMAND_INTENTS:
+            setattr(intents, flag, True)
+        for protection in ("audit",) + self.protections:
+            for flag in PROTECTION_INTENTS[protection]:
+                setattr(intents, flag, True)
+        return intents
+
+    def bot_options(self):
+        """Keyword arguments for ``commands.Bot``."""
+        intents = self.intents()
+        if not self.lean:
+            return {"intents": intents}
+        return {
+            "intents": intents,
+            # Keep members the gateway tells us about, but never chunk.
+            "member_cache_flags": discord.MemberCacheFlags.from_intents(intents),
+            "chunk_guilds_at_startup": False,
+            "max_messages": None,
+        }
+
+    def startup_report(self, bot):
+        """Startup time and cache footprint, for the ready log and the stats embed."""
+        return {
+            "profile": self.name,
+            "startup_seconds": time.monotonic() - PROCESS_STARTED,
+            "guilds": len(bot.guilds),
+            "members": sum(guild.member_count or 0 for guild in bot.guilds),
+            "cached_members": sum(len(guild.members) for guild in bot.guilds),
+            "peak_rss_mb": peak_rss_mb(),
+        }
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def resolve_member(guild, user_id):
+    """Return a guild member from the cache, else from REST; None if they left."""
+    member = guild.get_member(user_id)
+    if member is not None:
+        return member
+    try:
+        return await guild.fetch_member(user_id)
+    except discord.NotFound:
+        return None
@@ -0,0 +1,105 @@
+import re
+
+# Mentions of this many distinct users in one message count as a mass mention.
+MASS_MENTION_LIMIT = 10
+
+
+class ScanResult:
+    __slots__ = ("links", "mass_mention", "terms")
+
+    def __init__(self):
+        self.links = []
+        self.mass_mention = False
+        self.terms = []
+
+    def __bool__(self):
+        return bool(self.links or self.mass_mention or self.terms)
+
+
+class MessageScanner:
+    """Single-pass scanner for links, mass mentions and banned terms.
+
+    One compiled alternation finds every link, ``@everyone``/``@here`` and
+    banned term in a single ``finditer`` over the lowercased content. Link hosts are
+    checked against the allow and deny lists by walking their dot-separated
+    suffixes through a dict, so ``cdn.example.com`` matches an
+    ``example.com`` entry and the most specific entry wins. With no allow
+    list entry, every link is blocked.
+    """
+
+    def __init__(self, allowed_domains=(), blocked_domains=(), banned_terms=(),
+                 mass_mention_limit=MASS_MENTION_LIMIT):
+        self.mass_mention_limit = mass_mention_limit
+        self._domains = {}
+        for domain in allowed_domains:
+            self.allow_domain(domain)
+        for domain in blocked_domains:
+            self.block_domain(domain)
+        self._terms = set()
+        self._pattern = None
+        self.set_banned_terms(banned_terms)
+
+    def allow_domain(self, domain):
+        self._domains[_normalize_domain(domain)] = True
+
+    def block_domain(self, domain):
+        self._domains[_normalize_domain(domain)] = False
+
+    def set_banned_terms(self, terms):
+        self._terms = {term.lower() for term in terms if term}
+        parts = [
+            r"(?P<url>(?:https?://|www\.)(?P<host>[^\s/:?#<>|]+)\S*)",
+            r"(?P<mass>@(?:everyone|here))"
+        ]
+        first_chars = {"h", "w", "@"}
+        if self._terms:
+            alternation = "|".join(re.escape(term) for term in sorted(self._terms, key=len, reverse=True))
+            # Lookarounds rather than \b, which never matches next to a term
+            # that starts or ends with punctuation, such as "c++".
+            parts.append(rf"(?P<term>(?<!\w)(?:{alternation})(?!\w))")
+            first_chars.update(term[0] for term in self._terms)
+        # The lookahead lets the engine skip every position that cannot start
+        # a match before trying the alternation; content is lowercased first.
+        lookahead = "".join(re.escape(char) for char in sorted(first_chars))
+        self._pattern = re.compile(rf"(?=[{lookahead}])(?:{'|'.join(parts)})")
+
+    def is_allowed(self, host):
+        """True if a link to ``host`` (lowercase) may be posted."""
+        host = host.rstrip(".")
+        domains = self._domains
+        while True:
+            verdict = domains.get(host)
+            if verdict is not None:
+                return verdict
+            dot = host.find(".")
+            if dot < 0:
+                return False
+            host = host[dot + 1:]
+
+    def scan(self, content, mention_everyone=False, mention_count=0):
+        """Scan message content plus its mention metadata in one pass."""
+        result = ScanResult()
+        result.mass_mention = mention_everyone or mention_count >= self.mass_mention_limit
+        if not content:
+            return result
+        for match in self._pattern.finditer(content.lower()):
+            kind = match.lastgroup
+            if kind == "url":
+                host = match.group("host")
+                if not self.is_allowed(host):
+                    result.links.append(host)
+            elif kind == "mass":
+                result.mass_mention = True
+            else:
+                result.terms.append(match.group("term"))
+        return result
+
+    def scan_message(self, message):
+        return self.scan(message.content, message.mention_everyone, len(message.raw_mentions))
+
+
+def _normalize_domain(domain):
+    domain = domain.lower().strip().rstrip(".")
+    if domain.startswith("www."):
+        domain = domain[4:]
+    return domain
@@ -0,0 +1,227 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+import discord
+
+from metrics import metrics, event_started
+
+log = logging.getLogger(__name__)
+
+# Priorities, lowest runs first.
+BAN = 0       # bans and kicks of attackers
+PUNISH = 1    # timeouts and role strips
+CLEANUP = 2   # deleting rogue channels, roles and messages
+LOG = 3       # security log messages
+
+PRIORITY_NAMES = {BAN: "ban", PUNISH: "punish", CLEANUP: "cleanup", LOG: "log"}
+
+GUILD_CONCURRENCY = 4
+BUCKET_CONCURRENCY = 2
+# Users Discord accepts in one bulk ban request, and messages in one bulk delete.
+BULK_BAN_LIMIT = 200
+BULK_DELETE_LIMIT = 100
+# Seconds a channel purge waits for more messages to merge into its requests.
+PURGE_DELAY = 1.0
+
+
+class _GuildQueue:
+    __slots__ = ("heap", "active", "buckets", "role_removals", "purges", "keyed")
+
+    def __init__(self):
+        self.heap = []
+        self.active = 0
+        self.buckets = {}
+        self.role_removals = {}
+        self.purges = {}
+        self.keyed = {}
+
+
+class ActionScheduler:
+    """Central, priority-ordered runner for enforcement REST calls.
+
+    Every guild has its own queue and its own concurrency budget, so a guild
+    under attack cannot starve the others. Within a guild, jobs run
+    concurrently in priority order, and each Discord route bucket ("ban",
+    "member_edit", "channel", ...) has a small in-flight cap so one slow
+    bucket cannot hold every slot. Role removals queued for the same member
+    are merged into a single member edit, message purges queued for the
+    same channel into one run of bulk deletes, and a delete, timeout or
+    mute already queued for the same target is not queued twice.
+    """
+
+    def __init__(self, guild_concurrency=GUILD_CONCURRENCY, bucket_concurrency=BUCKET_CONCURRENCY):
+        self.guild_concurrency = guild_concurrency
+        self.bucket_concurrency = bucket_concurrency
+        self._queues = {}
+        self._seq = itertools.count()
+
+    def submit(self, guild_id, priority, bucket, func, *args, **kwargs):
+        """Queue ``func(*args, **kwargs)``; return a future for its result."""
+        queue = self._queues.get(guild_id)
+        if queue is None:
+            queue = self._queues[guild_id] = _GuildQueue()
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(_log_failure)
+        job = (priority, next(self._seq), bucket, func, args, kwargs, future, event_started.get())
+        heapq.heappush(queue.heap, job)
+        self._pump(queue)
+        return future
+
+    def submit_once(self, guild_id, key, priority, bucket, func, *args, **kwargs):
+        """Like submit, but while a job with the same key is queued or running, return its future."""
+        queue = self._queues.get(guild_id)
+        pending = queue.keyed.get(key) if queue is not None else None
+        if pending is not None:
+            return pending
+        future = self.submit(guild_id, priority, bucket, func, *args, **kwargs)
+        keyed = self._queues[guild_id].keyed
+        keyed[key] = future
+        future.add_done_callback(lambda _: keyed.pop(key, None))
+        return future
+
+    def depth(self, guild_id=None):
+        """Jobs waiting or running, for one guild or all of them."""
+        queues = [self._queues.get(guild_id)] if guild_id is not None else self._queues.values()
+        return sum(len(q.heap) + q.active for q in queues if q is not None)
+
+    # Helpers for the calls the protection handlers make.
+
+    def ban(self, guild, user, reason):
+        return self.submit(guild.id, BAN, "ban", guild.ban, user, reason=reason)
+
+    def kick(self, member, reason):
+        return self.submit(member.guild.id, BAN, "kick", member.kick, reason=reason)
+
+    def bulk_ban(self, guild, users, reason):
+        """Ban up to BULK_BAN_LIMIT users with a single request."""
+        return self.submit(guild.id, BAN, "bulk_ban", _bulk_ban, guild, users, reason=reason)
+
+    def edit_guild(self, guild, reason, **fields):
+        return self.submit(guild.id, BAN, "guild_edit", guild.edit, reason=reason, **fields)
+
+    def strip_roles(self, member, reason):
+        return self.submit(member.guild.id, BAN, "member_edit", member.edit, roles=[], reason=reason)
+
+    def timeout(self, member, duration, reason):
+        return self.submit_once(member.guild.id, ("timeout", member.id), PUNISH, "member_edit",
+                                member.timeout, duration, reason=reason)
+
+    def delete(self, obj, reason=None):
+        bucket = type(obj).__name__.lower()
+        return self.submit(obj.guild.id, CLEANUP, bucket, obj.delete, reason=reason)
+
+    def delete_message(self, message):
+        return self.submit_once(message.guild.id, ("delete", message.id), CLEANUP, "message", message.delete)
+
+    def send(self, channel, **kwargs):
+        return self.submit(channel.guild.id, LOG, "message", channel.send, **kwargs)
+
+    def remove_roles(self, member, roles, reason):
+        """Remove roles from a member, merged with any removal still queued for them."""
+        queue = self._queues.get(member.guild.id)
+        if queue is None:
+            queue = self._queues[member.guild.id] = _GuildQueue()
+        pending = queue.role_removals.get(member.id)
+        if pending is not None:
+            pending[0].update(role.id for role in roles)
+            return pending[1]
+
+        role_ids = {role.id for role in roles}
+
+        async def edit():
+            del queue.role_removals[member.id]
+            keep = [role for role in member.roles[1:] if role.id not in role_ids]
+            await member.edit(roles=keep, reason=reason)
+
+        future = self.submit(member.guild.id, PUNISH, "member_edit", edit)
+        queue.role_removals[member.id] = (role_ids, future)
+        return future
+
+    def purge(self, channel, message_ids, reason, delay=PURGE_DELAY):
+        """Delete messages from a channel, BULK_DELETE_LIMIT per request.
+
+        The purge is queued after ``delay``; until it runs, later purges of
+        the same channel merge into it, so a raid's messages go in a few
+        requests. The future resolves once it has run; failures are logged.
+        """
+        queue = self._queues.get(channel.guild.id)
+        if queue is None:
+            queue = self._queues[channel.guild.id] = _GuildQueue()
+        pending = queue.purges.get(channel.id)
+        if pending is not None:
+            pending[0].update(message_ids)
+            return pending[1]
+
+        ids = set(message_ids)
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+
+        async def delete():
+            del queue.purges[channel.id]
+            batch = sorted(ids)
+            for start in range(0, len(batch), BULK_DELETE_LIMIT):
+                chunk = batch[start:start + BULK_DELETE_LIMIT]
+                await channel.delete_messages([discord.Object(id=message_id) for message_id in chunk], reason=reason)
+
+        def submit():
+            job = self.submit(channel.guild.id, CLEANUP, "bulk_delete", delete)
+            job.add_done_callback(lambda _: done.done() or done.set_result(None))
+
+        loop.call_later(delay, submit)
+        queue.purges[channel.id] = (ids, done)
+        return done
+
+    def _pump(self, queue):
+        skipped = []
+        while queue.heap and queue.active < self.guild_concurrency:
+            job = heapq.heappop(queue.heap)
+            bucket = job[2]
+            if queue.buckets.get(bucket, 0) >= self.bucket_concurrency:
+                skipped.append(job)
+                continue
+            queue.active += 1
+            queue.buckets[bucket] = queue.buckets.get(bucket, 0) + 1
+            asyncio.ensure_future(self._run(queue, job))
+        for job in skipped:
+            heapq.heappush(queue.heap, job)
+
+    async def _run(self, queue, job):
+        priority, _, bucket, func, args, kwargs, future, started = job
+        try:
+            result = await func(*args, **kwargs)
+        except Exception as exc:
+            metrics.inc("scheduler_failures_total", bucket=bucket)
+            if not future.done():
+                future.set_exception(exc)
+        else:
+            if started is not None and priority < LOG:
+                metrics.observe("event_to_action_seconds", time.perf_counter() - started,
+                                priority=PRIORITY_NAMES[priority])
+            if not future.done():
+                future.set_result(result)
+        finally:
+            queue.active -= 1
+            queue.buckets[bucket] -= 1
+            self._pump(queue)
+
+
+async def _bulk_ban(guild, users, reason):
+    if hasattr(guild, "bulk_ban"):
+        return await guild.bulk_ban(users, reason=reason, delete_message_seconds=0)
+    # discord.py before 2.4 has no wrapper for the endpoint.
+    route = discord.http.Route("POST", "/guilds/{guild_id}/bulk-ban", guild_id=guild.id)
+    payload = {"user_ids": [str(user.id) for user in users], "delete_message_seconds": 0}
+    return await guild._state.http.request(route, json=payload, reason=reason)
+
+
+def _log_failure(future):
+    if future.cancelled():
+        return
+    exc = future.exception()
+    if isinstance(exc, discord.HTTPException):
+        log.warning("Enforcement call failed: %s", exc)
+    elif exc is not None:
+        log.error("Enforcement call raised", exc_info=exc)
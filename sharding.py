@@ -0,0 +1,83 @@
+import asyncio
+import os
+
+import yarl
+from discord.ext import commands
+from discord.gateway import DiscordWebSocket
+
+# Discord allows one IDENTIFY per concurrency bucket every 5 seconds.
+IDENTIFY_INTERVAL = 5.0
+
+
+class ShardConfig:
+    """Which shards this process runs, as handed down by launcher.py.
+
+    SHARD_COUNT and SHARD_IDS (comma separated) select a slice of the
+    shards; with neither set the bot runs as one unsharded connection.
+    MAX_CONCURRENCY is the session start limit Discord reports for the
+    token, i.e. how many shards may IDENTIFY at once.
+    """
+
+    def __init__(self, shard_count=None, shard_ids=None, max_concurrency=1):
+        self.shard_count = shard_count
+        self.shard_ids = shard_ids
+        self.max_concurrency = max_concurrency
+
+    @classmethod
+    def from_env(cls):
+        count = os.getenv("SHARD_COUNT")
+        ids = os.getenv("SHARD_IDS")
+        return cls(
+            shard_count=int(count) if count else None,
+            shard_ids=[int(i) for i in ids.split(",")] if ids else None,
+            max_concurrency=int(os.getenv("MAX_CONCURRENCY", "1")),
+        )
+
+    @property
+    def sharded(self):
+        return self.shard_count is not None
+
+
+class ParallelShardedBot(commands.AutoShardedBot):
+    """AutoShardedBot that brings its shards up concurrently.
+
+    discord.py connects shards one after another and sleeps five seconds
+    before each IDENTIFY. Here every shard connects at once, and the
+    identify gate in the shared store spaces out only the shards in the
+    same concurrency bucket, across every process on the host.
+    """
+
+    def __init__(self, *args, store, max_concurrency=1, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.store = store
+        self.max_concurrency = max_concurrency
+
+    async def before_identify_hook(self, shard_id, *, initial=False):
+        bucket = (shard_id or 0) % self.max_concurrency
+        wait = self.store.identify_wait(bucket, IDENTIFY_INTERVAL)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def launch_shards(self):
+        if self.is_closed():
+            return
+        if self.shard_count is None:
+            self.shard_count, gateway_url = await self.http.get_bot_gateway()
+            gateway = yarl.URL(gateway_url)
+        else:
+            gateway = DiscordWebSocket.DEFAULT_GATEWAY
+
+        self._connection.shard_count = self.shard_count
+        shard_ids = self.shard_ids or range(self.shard_count)
+        self._connection.shard_ids = shard_ids
+        await asyncio.gather(*(self.launch_shard(gateway, shard_id, initial=shard_id == shard_ids[0])
+                               for shard_id in shard_ids))
+
+
+def make_bot(store, config=None, **options):
+    """A plain Bot, or a ParallelShardedBot when this process runs a shard slice."""
+    config = config or ShardConfig.from_env()
+    if not config.sharded:
+        return commands.Bot(**options)
+    return ParallelShardedBot(shard_count=config.shard_count, shard_ids=config.shard_ids,
+                              store=store, max_concurrency=config.max_concurrency, **options)
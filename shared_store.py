@@ -0,0 +1,81 @@
+import os
+import sqlite3
+import time
+
+SHARED_STORE_PATH = os.path.join("state", "shared.db")
+# Seconds a writer waits for another process to release the database.
+BUSY_TIMEOUT = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS verdicts (
+    guild_id INTEGER NOT NULL,
+    actor_id INTEGER NOT NULL,
+    reason TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (guild_id, actor_id)
+);
+CREATE TABLE IF NOT EXISTS identify (
+    bucket INTEGER PRIMARY KEY,
+    last_at REAL NOT NULL
+);
+"""
+
+
+class SharedStore:
+    """SQLite database shared by every shard process on the host.
+
+    Opened in WAL mode so readers never block the one writer. Each process
+    keeps its own connection; the calls are short single statements and
+    run directly on the event loop.
+    """
+
+    def __init__(self, path=SHARED_STORE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db = self.connect()
+        self.db.executescript(SCHEMA)
+
+    def connect(self):
+        """Open another connection to the same database."""
+        db = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def data_version(self):
+        """Changes whenever another connection commits; cheap enough to poll."""
+        return self.db.execute("PRAGMA data_version").fetchone()[0]
+
+    # Verdicts
+
+    def claim_verdict(self, guild_id, actor_id, reason, ttl):
+        """Atomically claim the punishment of an actor; False if another process holds it."""
+        now = time.time()
+        cursor = self.db.execute(
+            "INSERT INTO verdicts (guild_id, actor_id, reason, expires_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (guild_id, actor_id) DO UPDATE SET reason = excluded.reason, "
+            "expires_at = excluded.expires_at WHERE verdicts.expires_at < ?",
+            (guild_id, actor_id, reason, now + ttl, now))
+        return cursor.rowcount == 1
+
+    def prune_verdicts(self):
+        self.db.execute("DELETE FROM verdicts WHERE expires_at < ?", (time.time(),))
+
+    # Identify coordination
+
+    def identify_wait(self, bucket, interval):
+        """Reserve the next IDENTIFY slot of a concurrency bucket; return seconds to wait for it."""
+        now = time.time()
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.db.execute("SELECT last_at FROM identify WHERE bucket = ?", (bucket,)).fetchone()
+            slot = now if row is None else max(now, row[0] + interval)
+            self.db.execute("INSERT OR REPLACE INTO identify (bucket, last_at) VALUES (?, ?)", (bucket, slot))
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        self.db.execute("COMMIT")
+        return slot - now
+
@@ -0,0 +1,251 @@
+import bisect
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+# Record kinds: a full snapshot, or the roles and channels changed since the
+# previous record (a removed one is stored as null).
+BASE = 0
+DELTA = 1
+# taken_at (epoch seconds), kind, compressed payload length
+_HEADER = struct.Struct(">dBI")
+COMPRESS_LEVEL = 6
+# A new base is written after this many deltas, or once the deltas since
+# the last base add up to more than the base itself.
+BASE_EVERY = 50
+# Retention as (age, spacing) tiers: versions younger than the first age
+# are all kept, then the newest one per spacing seconds until the next age;
+# anything older than the last age is dropped. The newest version is always kept.
+RETENTION = ((86400, 0), (7 * 86400, 3600), (90 * 86400, 86400))
+# Appends between retention passes over a guild's history.
+COMPACT_EVERY = 200
+
+
+def encode(data):
+    return zlib.compress(json.dumps(data, separators=(",", ":")).encode(), COMPRESS_LEVEL)
+
+
+def decode(payload):
+    return json.loads(zlib.decompress(payload))
+
+
+def diff(old, new):
+    """The delta that turns snapshot ``old`` into ``new``."""
+    delta = {"name": new["name"], "taken_at": new["taken_at"]}
+    for section in ("roles", "channels"):
+        before, after = old[section], new[section]
+        changes = {key: record for key, record in after.items() if before.get(key) != record}
+        changes.update(dict.fromkeys(before.keys() - after.keys()))
+        delta[section] = changes
+    return delta
+
+
+def apply(snapshot, delta):
+    """Apply a delta to a snapshot in place."""
+    snapshot["name"] = delta["name"]
+    snapshot["taken_at"] = delta["taken_at"]
+    for section in ("roles", "channels"):
+        records = snapshot[section]
+        for key, record in delta[section].items():
+            if record is None:
+                records.pop(key, None)
+            else:
+                records[key] = record
+
+
+def retained(times, now, retention=RETENTION):
+    """Indexes of the versions, taken at ``times`` in order, that the retention policy keeps."""
+    keep = []
+    kept_slots = set()
+    for i in range(len(times) - 1, -1, -1):
+        age = now - times[i]
+        for limit, spacing in retention:
+            if age <= limit:
+                break
+        else:
+            if i != len(times) - 1:
+                continue
+            spacing = 0
+        if spacing:
+            slot = (limit, int(times[i] // spacing))
+            if slot in kept_slots and i != len(times) - 1:
+                continue
+            kept_slots.add(slot)
+        keep.append(i)
+    keep.reverse()
+    return keep
+
+
+class _Index:
+    __slots__ = ("times", "entries", "base_size", "since_base", "appended")
+
+    def __init__(self):
+        self.times = []
+        self.entries = []  # (kind, offset, length) of each record's payload
+        self.base_size = 0
+        self.since_base = 0
+        self.appended = 0
+
+    def add(self, taken_at, kind, offset, length):
+        self.times.append(taken_at)
+        self.entries.append((kind, offset, length))
+        if kind == BASE:
+            self.base_size = length
+            self.since_base = 0
+        else:
+            self.since_base += length
+
+
+class SnapshotHistory:
+    """Versioned snapshots of every guild, one append-only file each.
+
+    A file is a run of records, each a small header and a zlib-compressed
+    JSON payload: periodic full bases with deltas in between. The headers
+    are indexed on first use by walking a memory map of the file, so
+    finding the version as of a time is a binary search, and rebuilding it
+    reads only the nearest base and the deltas after it. Every
+    ``compact_every`` appends the file is rewritten to the versions the
+    retention policy keeps. Methods block on disk and are meant for an
+    executor; calls for one guild are serialized.
+    """
+
+    def __init__(self, directory, retention=RETENTION, base_every=BASE_EVERY, compact_every=COMPACT_EVERY):
+        self.directory = directory
+        self.retention = retention
+        self.base_every = base_every
+        self.compact_every = compact_every
+        self._indexes = {}
+        self._locks = {}
+
+    def path(self, guild_id):
+        return os.path.join(self.directory, f"{guild_id}.snap")
+
+    def guild_ids(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return [int(name[:-5]) for name in os.listdir(self.directory) if name.endswith(".snap")]
+
+    def needs_base(self, guild_id):
+        """Whether the next append should be a full snapshot rather than a delta.
+
+        Reads only the in-memory index, so it is safe on the event loop once
+        ``load`` or ``versions`` has indexed the guild's file.
+        """
+        index = self._indexes.get(guild_id)
+        if index is None or not index.entries:
+            return True
+        deltas = len(index.entries) - 1 - self._last_base(index)
+        return deltas >= self.base_every or index.since_base > index.base_size
+
+    def append(self, guild_id, taken_at, kind, data):
+        """Append one version; ``data`` is a snapshot for a BASE, a delta otherwise."""
+        payload = encode(data)
+        with self._lock(guild_id):
+            index = self._index(guild_id)
+            if index.times:
+                taken_at = max(taken_at, index.times[-1])
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.path(guild_id), "ab") as f:
+                offset = f.tell() + _HEADER.size
+                f.write(_HEADER.pack(taken_at, kind, len(payload)) + payload)
+                f.flush()
+                os.fsync(f.fileno())
+            index.add(taken_at, kind, offset, len(payload))
+            index.appended += 1
+            if index.appended >= self.compact_every:
+                self._compact(guild_id, index)
+
+    def load(self, guild_id, at=None):
+        """The snapshot as of epoch time ``at`` (the newest if None), or None if there is none that old."""
+        with self._lock(guild_id):
+            index = self._index(guild_id)
+            end = len(index.times) if at is None else bisect.bisect_right(index.times, at)
+            if end == 0:
+                return None
+            with open(self.path(guild_id), "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                return self._rebuild(index, view, end - 1)
+
+    def versions(self, guild_id):
+        """Epoch times of every stored version, oldest first."""
+        with self._lock(guild_id):
+            return list(self._index(guild_id).times)
+
+    def _lock(self, guild_id):
+        return self._locks.setdefault(guild_id, threading.Lock())
+
+    def _index(self, guild_id):
+        index = self._indexes.get(guild_id)
+        if index is not None:
+            return index
+        index = self._indexes[guild_id] = _Index()
+        path = self.path(guild_id)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size:
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                offset = 0
+                while offset + _HEADER.size <= size:
+                    taken_at, kind, length = _HEADER.unpack_from(view, offset)
+                    if offset + _HEADER.size + length > size:
+                        break  # torn final record from a crash mid-write
+                    index.add(taken_at, kind, offset + _HEADER.size, length)
+                    offset += _HEADER.size + length
+            if offset != size:
+                with open(path, "r+b") as f:
+                    f.truncate(offset)
+        return index
+
+    @staticmethod
+    def _last_base(index, end=None):
+        i = len(index.entries) - 1 if end is None else end
+        while index.entries[i][0] != BASE:
+            i -= 1
+        return i
+
+    def _rebuild(self, index, view, position):
+        start = self._last_base(index, position)
+        snapshot = None
+        for kind, offset, length in index.entries[start:position + 1]:
+            data = decode(view[offset:offset + length])
+            if kind == BASE:
+                snapshot = data
+            else:
+                apply(snapshot, data)
+        return snapshot
+
+    def _compact(self, guild_id, index):
+        index.appended = 0
+        keep = retained(index.times, time.time(), self.retention)
+        if len(keep) == len(index.times):
+            return
+        path = self.path(guild_id)
+        fresh = _Index()
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view, \
+                open(path + ".tmp", "wb") as out:
+            snapshot = previous = None
+            wanted = iter(keep)
+            next_kept = next(wanted)
+            for i, (kind, offset, length) in enumerate(index.entries):
+                data = decode(view[offset:offset + length])
+                if kind == BASE:
+                    snapshot = data
+                else:
+                    apply(snapshot, data)
+                if i != next_kept:
+                    continue
+                if previous is None or len(fresh.entries) - self._last_base(fresh) > self.base_every:
+                    kind, record = BASE, snapshot
+                else:
+                    kind, record = DELTA, diff(previous, snapshot)
+                payload = encode(record)
+                out.write(_HEADER.pack(index.times[i], kind, len(payload)) + payload)
+                fresh.add(index.times[i], kind, out.tell() - len(payload), len(payload))
+                previous = {**snapshot, "roles": dict(snapshot["roles"]), "channels": dict(snapshot["channels"])}
+                next_kept = next(wanted, None)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(path + ".tmp", path)
+        self._indexes[guild_id] = fresh
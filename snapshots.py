@@ -0,0 +1,212 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+
+import discord
+
+from snapshot_history import BASE, DELTA, SnapshotHistory
+
+log = logging.getLogger(__name__)
+
+BACKUP_DIR = "backups"
+
+
+def role_record(role):
+    return {
+        "id": role.id,
+        "name": role.name,
+        "permissions": role.permissions.value,
+        "color": role.color.value,
+        "hoist": role.hoist,
+        "mentionable": role.mentionable,
+        "position": role.position
+    }
+
+
+def channel_record(channel):
+    record = {
+        "id": channel.id,
+        "name": channel.name,
+        "type": str(channel.type),
+        "position": channel.position,
+        "category_id": channel.category_id,
+        "overwrites": [
+            {
+                "id": target.id,
+                "type": "role" if isinstance(target, discord.Role) else "member",
+                "allow": overwrite.pair()[0].value,
+                "deny": overwrite.pair()[1].value
+            }
+            for target, overwrite in channel.overwrites.items()
+        ]
+    }
+    if isinstance(channel, discord.TextChannel):
+        record["topic"] = channel.topic
+        record["nsfw"] = channel.nsfw
+        record["slowmode_delay"] = channel.slowmode_delay
+    elif isinstance(channel, discord.VoiceChannel):
+        record["bitrate"] = channel.bitrate
+        record["user_limit"] = channel.user_limit
+    return record
+
+
+class SnapshotStore:
+    """Per-guild structure snapshots kept current from gateway events.
+
+    A guild is captured in full once, then individual roles and channels
+    are updated or removed as events arrive. ``flush`` appends a version of
+    every guild changed since the last one to its history: the changed
+    records only, or periodically the whole snapshot. Earlier versions stay
+    available to ``as_of`` until the history's retention policy drops them.
+    """
+
+    def __init__(self, directory=BACKUP_DIR, history=None):
+        self.directory = directory
+        self.history = history or SnapshotHistory(directory)
+        self._snapshots = {}
+        self._changed_at = {}
+        # Per dirty guild, the role and channel ids changed since the last
+        # version, or None when the next version must be a full one.
+        self._changes = {}
+        self._flushing = asyncio.Lock()
+
+    def load(self):
+        """Read every guild's newest snapshot from disk; meant for startup only."""
+        for guild_id in self.history.guild_ids():
+            snapshot = self.history.load(guild_id)
+            if snapshot is not None:
+                self._snapshots[guild_id] = snapshot
+                self._changed_at[guild_id] = self.history.versions(guild_id)[-1]
+        if not os.path.isdir(self.directory):
+            return
+        # Snapshots from before the history was kept become its first version.
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(".json"):
+                continue
+            with open(os.path.join(self.directory, filename)) as f:
+                snapshot = json.load(f)
+            guild_id = snapshot["guild_id"]
+            if guild_id not in self._snapshots:
+                self._snapshots[guild_id] = snapshot
+                self._changed_at[guild_id] = os.path.getmtime(os.path.join(self.directory, filename))
+                self._changes[guild_id] = None
+
+    def get(self, guild_id):
+        return self._snapshots.get(guild_id)
+
+    def capture(self, guild):
+        """Replace a guild's snapshot with its full current structure."""
+        self._snapshots[guild.id] = {
+            "guild_id": guild.id,
+            "name": guild.name,
+            "taken_at": None,
+            "roles": {str(r.id): role_record(r) for r in guild.roles if not r.is_default() and not r.managed},
+            "channels": {str(c.id): channel_record(c) for c in guild.channels}
+        }
+        self._changes[guild.id] = None
+        self._touch(guild.id)
+
+    def update_role(self, role):
+        snapshot = self._snapshots.get(role.guild.id)
+        if snapshot is None or role.is_default() or role.managed:
+            return
+        snapshot["roles"][str(role.id)] = role_record(role)
+        self._touch(role.guild.id, roles=(role.id,))
+
+    def remove_role(self, role):
+        snapshot = self._snapshots.get(role.guild.id)
+        if snapshot is not None and snapshot["roles"].pop(str(role.id), None) is not None:
+            self._touch(role.guild.id, roles=(role.id,))
+
+    def update_channel(self, channel):
+        snapshot = self._snapshots.get(channel.guild.id)
+        if snapshot is None:
+            return
+        snapshot["channels"][str(channel.id)] = channel_record(channel)
+        self._touch(channel.guild.id, channels=(channel.id,))
+
+    def remove_channel(self, channel):
+        snapshot = self._snapshots.get(channel.guild.id)
+        if snapshot is not None and snapshot["channels"].pop(str(channel.id), None) is not None:
+            self._touch(channel.guild.id, channels=(channel.id,))
+
+    def forget(self, guild_id, role_ids=(), channel_ids=()):
+        """Drop records by snapshot id, e.g. once a restore has recreated them under new ids."""
+        snapshot = self._snapshots.get(guild_id)
+        if snapshot is None:
+            return
+        for role_id in role_ids:
+            snapshot["roles"].pop(str(role_id), None)
+        for channel_id in channel_ids:
+            snapshot["channels"].pop(str(channel_id), None)
+        self._touch(guild_id, roles=role_ids, channels=channel_ids)
+
+    async def as_of(self, guild_id, when):
+        """The guild's snapshot as of epoch time ``when``, or None if none is that old."""
+        changed_at = self._changed_at.get(guild_id)
+        if changed_at is not None and changed_at <= when:
+            return self._snapshots[guild_id]
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.history.load, guild_id, when)
+
+    async def flush(self):
+        """Append a version for every dirty guild; return how many were written."""
+        async with self._flushing:
+            dirty, self._changes = self._changes, {}
+            if not dirty:
+                return 0
+            loop = asyncio.get_running_loop()
+            writes = {}
+            for guild_id, changes in dirty.items():
+                snapshot = self._snapshots.get(guild_id)
+                if snapshot is None:
+                    continue
+                if changes is None or self.history.needs_base(guild_id):
+                    kind, data = BASE, _copy(snapshot)
+                else:
+                    kind, data = DELTA, _delta(snapshot, changes)
+                writes[guild_id] = loop.run_in_executor(None, self.history.append, guild_id,
+                                                        self._changed_at[guild_id], kind, data)
+            results = await asyncio.gather(*writes.values(), return_exceptions=True)
+        written = 0
+        for guild_id, result in zip(writes, results):
+            if isinstance(result, Exception):
+                log.warning("Could not write snapshot for guild %s: %s", guild_id, result)
+                self._merge(guild_id, dirty[guild_id])
+            else:
+                written += 1
+        return written
+
+    def _touch(self, guild_id, roles=(), channels=()):
+        now = time.time()
+        self._snapshots[guild_id]["taken_at"] = datetime.fromtimestamp(now, timezone.utc).isoformat()
+        self._changed_at[guild_id] = now
+        self._merge(guild_id, (set(roles), set(channels)))
+
+    def _merge(self, guild_id, changes):
+        if guild_id in self._changes and self._changes[guild_id] is None:
+            return
+        if changes is None or guild_id not in self._changes:
+            self._changes[guild_id] = changes
+            return
+        self._changes[guild_id][0].update(changes[0])
+        self._changes[guild_id][1].update(changes[1])
+
+
+def _copy(snapshot):
+    # Records are replaced, never changed in place, so copying the sections
+    # is enough to keep the writer thread's copy stable.
+    return {**snapshot, "roles": dict(snapshot["roles"]), "channels": dict(snapshot["channels"])}
+
+
+def _delta(snapshot, changes):
+    role_ids, channel_ids = changes
+    return {
+        "name": snapshot["name"],
+        "taken_at": snapshot["taken_at"],
+        "roles": {key: snapshot["roles"].get(key) for key in map(str, role_ids)},
+        "channels": {key: snapshot["channels"].get(key) for key in map(str, channel_ids)}
+    }
@@ -0,0 +1,94 @@
+import asyncio
+import itertools
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import discord
+
+from audit_index import AuditIndex
+
+Action = discord.AuditLogAction
+_ids = itertools.count(1)
+
+
+class Guild:
+    def __init__(self):
+        self.id = 1
+        self.log = []
+
+    async def audit_logs(self, action=None, limit=100):
+        for entry in reversed(self.log):
+            if action is None or entry.action == action:
+                yield entry
+
+
+def entry(guild, action, target_id, actor, age=0.0):
+    return SimpleNamespace(id=next(_ids), guild=guild, action=action, target=SimpleNamespace(id=target_id),
+                           user=actor, user_id=actor.id,
+                           created_at=datetime.now(timezone.utc) - timedelta(seconds=age))
+
+
+ADMIN = SimpleNamespace(id=10)
+ATTACKER = SimpleNamespace(id=20)
+
+
+def test_later_action_on_same_target_is_not_blamed_on_earlier_actor():
+    async def run():
+        guild = Guild()
+        index = AuditIndex(push_wait=0.5)
+        index.record(entry(guild, Action.role_update, 99, ADMIN, age=45))
+
+        async def attacker_edits():
+            await asyncio.sleep(0.05)
+            index.record(entry(guild, Action.role_update, 99, ATTACKER))
+
+        asyncio.ensure_future(attacker_edits())
+        return await index.resolve(guild, Action.role_update, 99)
+
+    assert asyncio.run(run()).user is ATTACKER
+
+
+def test_fallback_ignores_entries_older_than_the_event():
+    async def run():
+        guild = Guild()
+        guild.log.append(entry(guild, Action.role_update, 99, ADMIN, age=45))
+        index = AuditIndex(push_wait=0.05)
+        return await index.resolve(guild, Action.role_update, 99)
+
+    assert asyncio.run(run()) is None
+
+
+def test_fresh_entry_is_returned_from_the_index():
+    async def run():
+        guild = Guild()
+        index = AuditIndex(push_wait=0.05)
+        index.record(entry(guild, Action.member_role_update, 99, ATTACKER, age=1))
+        return await index.resolve(guild, Action.member_role_update, 99)
+
+    assert asyncio.run(run()).user is ATTACKER
+
+
+def test_entry_pushed_after_the_event_counts_despite_clock_skew():
+    async def run():
+        guild = Guild()
+        index = AuditIndex(push_wait=0.5)
+
+        async def push_late():
+            await asyncio.sleep(0.05)
+            index.record(entry(guild, Action.role_update, 99, ATTACKER, age=45))
+
+        asyncio.ensure_future(push_late())
+        return await index.resolve(guild, Action.role_update, 99)
+
+    assert asyncio.run(run()).user is ATTACKER
+
+
+def test_fallback_takes_entries_newer_than_the_one_indexed_at_arrival():
+    async def run():
+        guild = Guild()
+        index = AuditIndex(push_wait=0.05)
+        index.record(entry(guild, Action.role_update, 99, ADMIN, age=50))
+        guild.log.append(entry(guild, Action.role_update, 99, ATTACKER, age=45))
+        return await index.resolve(guild, Action.role_update, 99)
+
+    assert asyncio.run(run()).user is ATTACKER
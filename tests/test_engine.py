@@ -0,0 +1,41 @@
+import asyncio
+from types import SimpleNamespace
+
+import discord
+
+from engine import SecurityContext
+
+
+class Journal:
+    def __init__(self):
+        self.records = []
+
+    def record(self, guild_id, action, title, fields, actor_id=None, target_id=None):
+        self.records.append((guild_id, action))
+
+
+class FullLog:
+    """A log dispatcher whose queue never has room."""
+
+    def __init__(self):
+        self.space = None
+
+    async def post(self, guild, embed):
+        self.space = asyncio.Event()
+        await self.space.wait()
+
+
+def test_report_does_not_wait_for_a_full_log_queue():
+    async def run():
+        components = dict.fromkeys(("profile", "trust", "audit_index", "scheduler", "checkpoint", "verdicts",
+                                    "snapshots", "scanner", "rate_tracker", "recent_messages", "webhooks",
+                                    "mute_roles", "punishment_duration"))
+        sec = SecurityContext(None, log_dispatcher=FullLog(), journal=Journal(), **components)
+        guild = SimpleNamespace(id=1)
+        await asyncio.wait_for(sec.report(guild, "Test", discord.Color.red(), {"A": "b"}, action="test"), 1.0)
+        await asyncio.sleep(0)
+        assert sec.log_dispatcher.space is not None
+        sec.log_dispatcher.space.set()
+        return sec.journal.records
+
+    assert asyncio.run(run()) == [(1, "test")]
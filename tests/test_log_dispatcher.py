@@ -0,0 +1,89 @@
+import asyncio
+from types import SimpleNamespace
+
+import discord
+
+from log_dispatcher import LogDispatcher, MAX_EMBEDS
+
+GUILD = SimpleNamespace(id=1)
+
+
+class Channel:
+    def __init__(self, release=None):
+        self.sent = []
+        self.release = release
+
+    async def send(self, embeds):
+        if self.release is not None:
+            await self.release.wait()
+        self.sent.append(embeds)
+
+
+def dispatcher(channel, **kwargs):
+    async def resolve_channel(guild):
+        return channel
+    return LogDispatcher(resolve_channel, **kwargs)
+
+
+def embed(title, value="x"):
+    return discord.Embed(title=title).add_field(name="Field", value=value)
+
+
+def test_embeds_are_packed_ten_per_message():
+    async def run():
+        channel = Channel()
+        logs = dispatcher(channel, flush_interval=0.05)
+        for i in range(MAX_EMBEDS + 3):
+            await logs.post(GUILD, embed(f"Incident {i}"))
+        await asyncio.sleep(0.1)
+        return channel.sent
+
+    assert [len(batch) for batch in asyncio.run(run())] == [MAX_EMBEDS, 3]
+
+
+def test_identical_incidents_merge_with_a_repeat_count():
+    async def run():
+        channel = Channel()
+        logs = dispatcher(channel, flush_interval=0.05)
+        for _ in range(3):
+            await logs.post(GUILD, embed("Spam"))
+        await logs.post(GUILD, embed("Spam", value="other"))
+        await asyncio.sleep(0.1)
+        return channel.sent
+
+    (batch,) = asyncio.run(run())
+    assert len(batch) == 2
+    assert batch[0].footer.text == "Repeated 3 times" and batch[1].footer.text is None
+
+
+def test_long_embeds_are_split_across_messages():
+    async def run():
+        channel = Channel()
+        logs = dispatcher(channel, flush_interval=0.05)
+        for i in range(3):
+            await logs.post(GUILD, embed(f"Incident {i}", value="x" * 1024).add_field(name="More", value="y" * 1024))
+        await asyncio.sleep(0.2)
+        return channel.sent
+
+    assert [len(batch) for batch in asyncio.run(run())] == [2, 1]
+
+
+def test_post_waits_once_max_pending_incidents_are_queued():
+    async def run():
+        release = asyncio.Event()
+        channel = Channel(release)
+        logs = dispatcher(channel, flush_interval=0.01, max_pending=2)
+        await logs.post(GUILD, embed("A"))
+        await logs.post(GUILD, embed("B"))
+        blocked = asyncio.ensure_future(logs.post(GUILD, embed("C")))
+        await asyncio.sleep(0)
+        waited = not blocked.done()
+        await asyncio.wait_for(blocked, 1.0)
+        depth = logs.depth(GUILD.id)
+        release.set()
+        await asyncio.sleep(0.05)
+        return waited, depth, channel.sent
+
+    waited, depth, sent = asyncio.run(run())
+    assert waited and depth == 1
+    assert [[e.title for e in batch] for batch in sent] == [["A", "B"], ["C"]]
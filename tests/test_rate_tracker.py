@@ -0,0 +1,53 @@
+from rate_tracker import RateTracker
+
+
+def test_burst_over_the_limit_is_reported_once():
+    tracker = RateTracker(limit=3, window=5)
+    assert [tracker.hit(1, 10, 7, now=t) for t in (0, 1, 2)] == [0, 0, 0]
+    assert tracker.hit(1, 10, 7, now=3) == 4
+    assert tracker.hit(1, 10, 7, now=3.5) == 0
+
+
+def test_messages_spread_over_the_window_are_not_a_burst():
+    tracker = RateTracker(limit=3, window=5)
+    assert not any(tracker.hit(1, 10, 7, now=t * 2) for t in range(10))
+
+
+def test_channel_override_has_its_own_limit_and_counters():
+    tracker = RateTracker(limit=3, window=5)
+    tracker.set_limit(1, 1, 5, channel_id=20)
+    assert tracker.hit(1, 10, 7, now=0) == 0
+    assert tracker.hit(1, 20, 7, now=0) == 0
+    assert tracker.hit(1, 20, 7, now=1) == 2
+    assert tracker.hit(1, 10, 7, now=1) == 0
+    assert tracker.limit_for(1, 20) == (1, 5)
+    tracker.clear_limit(1, channel_id=20)
+    assert tracker.limit_for(1, 20) == (3, 5)
+
+
+def test_guild_override_applies_to_its_guild_only():
+    tracker = RateTracker(limit=3, window=5)
+    tracker.set_limit(1, 1, 5)
+    assert [tracker.hit(1, 10, 7, now=t) for t in (0, 1)] == [0, 2]
+    assert [tracker.hit(2, 10, 7, now=t) for t in (0, 1)] == [0, 0]
+
+
+def test_sweep_drops_idle_users():
+    tracker = RateTracker(idle_ttl=60)
+    tracker.hit(1, 10, 7, now=0)
+    tracker.hit(1, 10, 8, now=50)
+    assert tracker.sweep(now=70) == 1
+    assert len(tracker) == 1
+
+
+def test_checkpoint_round_trip_keeps_limits_and_windows():
+    tracker = RateTracker(limit=3, window=5)
+    tracker.set_limit(1, 2, 5)
+    tracker.hit(1, 10, 7, now=100)
+    tracker.hit(1, 10, 7, now=101)
+    state = tracker.checkpoint(now=101)
+
+    restored = RateTracker(limit=3, window=5)
+    restored.restore(state, elapsed=1, now=500)
+    assert restored.limit_for(1, 10) == (2, 5)
+    assert restored.hit(1, 10, 7, now=500) == 3
@@ -0,0 +1,31 @@
+from types import SimpleNamespace
+
+from recent_messages import RecentMessages
+
+
+class Channel:
+    id = 5
+
+
+CHANNEL = Channel()
+
+
+def message(message_id):
+    return SimpleNamespace(id=message_id, guild=SimpleNamespace(id=1), author=SimpleNamespace(id=2), channel=CHANNEL)
+
+
+def test_take_hands_over_recent_ids_by_channel():
+    recent = RecentMessages(ttl=60)
+    recent.add(message(1), now=0)
+    recent.add(message(2), now=1)
+    assert recent.take(1, 2, now=2) == {CHANNEL: {1, 2}}
+    assert recent.take(1, 2, now=3) == {}
+
+
+def test_purge_mark_expires_while_the_user_stays_active():
+    recent = RecentMessages(ttl=60)
+    recent.add(message(1), now=0)
+    recent.take(1, 2, now=0)
+    assert recent.add(message(2), now=30)
+    assert recent.add(message(3), now=59)
+    assert not recent.add(message(4), now=61)
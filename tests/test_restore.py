@@ -0,0 +1,118 @@
+from types import SimpleNamespace
+
+from restore import plan_restore, _role_positions
+
+GUILD_ID = 1
+
+
+class Role:
+    def __init__(self, role_id, name, position, permissions=0, managed=False):
+        self.id = role_id
+        self.name = name
+        self.position = position
+        self.permissions = SimpleNamespace(value=permissions)
+        self.color = SimpleNamespace(value=0)
+        self.hoist = False
+        self.mentionable = False
+        self.managed = managed
+
+    def is_default(self):
+        return self.id == GUILD_ID
+
+
+class Channel:
+    def __init__(self, channel_id, name, position, kind="text", category_id=None):
+        self.id = channel_id
+        self.name = name
+        self.position = position
+        self.type = kind
+        self.category_id = category_id
+        self.overwrites = {}
+        self.topic = None
+        self.nsfw = False
+        self.slowmode_delay = 0
+
+
+def role_record(role_id, name, position, permissions=0):
+    return {"id": role_id, "name": name, "permissions": permissions, "color": 0, "hoist": False,
+            "mentionable": False, "position": position}
+
+
+def channel_record(channel_id, name, position, kind="text", category_id=None):
+    record = {"id": channel_id, "name": name, "type": kind, "position": position, "category_id": category_id,
+              "overwrites": []}
+    if kind == "text":
+        record.update(topic=None, nsfw=False, slowmode_delay=0)
+    return record
+
+
+def snapshot(roles=(), channels=()):
+    return {"guild_id": GUILD_ID, "roles": {str(r["id"]): r for r in roles},
+            "channels": {str(c["id"]): c for c in channels}}
+
+
+def guild(roles=(), channels=(), top=None):
+    everyone = Role(GUILD_ID, "@everyone", 0)
+    roles = [everyone, *roles]
+    bot_role = top or Role(999, "Bot", len(roles), managed=True)
+    return SimpleNamespace(id=GUILD_ID, roles=roles + [bot_role], channels=list(channels),
+                           me=SimpleNamespace(top_role=bot_role))
+
+
+def test_roles_match_by_id_then_by_name_without_duplicates():
+    mods = Role(10, "Mods", 2)
+    recreated = Role(21, "Admins", 1)
+    plan = plan_restore(guild([recreated, mods]), snapshot([role_record(10, "Mods", 2), role_record(20, "Admins", 1),
+                                                           role_record(30, "Gone", 3)]))
+    assert plan.role_matches == {10: mods, 20: recreated}
+    assert [r["id"] for r in plan.role_creates] == [30]
+    assert plan.role_edits == []
+
+
+def test_one_live_role_matches_one_snapshot_role():
+    admins = Role(21, "Admins", 1)
+    plan = plan_restore(guild([admins]), snapshot([role_record(20, "Admins", 1), role_record(22, "Admins", 2)]))
+    assert list(plan.role_matches.values()) == [admins]
+    assert len(plan.role_creates) == 1
+
+
+def test_channels_match_by_id_then_by_name_and_type():
+    general = Channel(100, "general", 0)
+    voice = Channel(101, "general", 1, kind="voice")
+    plan = plan_restore(guild(channels=[general, voice]), snapshot(channels=[
+        channel_record(200, "general", 0, kind="voice"), channel_record(100, "general", 0),
+        channel_record(300, "rules", 2)]))
+    assert plan.channel_matches == {100: general, 200: voice}
+    assert [c["id"] for c in plan.channel_creates] == [300]
+
+
+def test_edits_and_api_call_estimate():
+    mods = Role(10, "Moderators", 1, permissions=8)
+    general = Channel(100, "chat", 0)
+    plan = plan_restore(guild([mods], [general]), snapshot(
+        [role_record(10, "Mods", 1), role_record(20, "Helpers", 2)],
+        [channel_record(100, "general", 0), channel_record(300, "Info", 1, kind="category")]))
+    assert [(role, changes) for role, _, changes in plan.role_edits] == [(mods, ["name", "permissions"])]
+    assert [(channel, changes) for channel, _, changes in plan.channel_edits] == [(general, ["name"])]
+    # One role create, one role edit, one channel create, one channel edit, one role reorder.
+    assert plan.reorder_roles and not plan.reorder_channels
+    assert plan.api_calls() == 5
+    assert not plan.is_empty()
+
+
+def test_categories_are_created_before_their_channels():
+    plan = plan_restore(guild(), snapshot(channels=[
+        channel_record(301, "chat", 0, category_id=300), channel_record(300, "Info", 5, kind="category")]))
+    assert [c["id"] for c in plan.channel_creates] == [300, 301]
+
+
+def test_role_positions_keep_unsnapshotted_roles_and_stay_below_the_bot():
+    low, integration, high = Role(10, "Low", 3), Role(11, "Integration", 2, managed=True), Role(12, "High", 1)
+    above = Role(13, "Owner", 5)
+    bot_role = Role(999, "Bot", 4, managed=True)
+    live = guild([high, integration, low], top=bot_role)
+    live.roles.append(above)
+    plan = plan_restore(live, snapshot([role_record(10, "Low", 1), role_record(12, "High", 3),
+                                        role_record(13, "Owner", 4)]))
+    positions = _role_positions(live, plan)
+    assert positions == {low: 1, integration: 2, high: 3}
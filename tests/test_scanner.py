@@ -0,0 +1,14 @@
+from scanner import MessageScanner
+
+
+def test_term_ending_in_punctuation_is_matched():
+    scanner = MessageScanner(banned_terms=["c++", "scam"])
+    assert scanner.scan("who still writes C++ in 2026").terms == ["c++"]
+    assert scanner.scan("c++, really?").terms == ["c++"]
+
+
+def test_terms_only_match_whole_words():
+    scanner = MessageScanner(banned_terms=["c++", "scam"])
+    assert scanner.scan("scampi for dinner").terms == []
+    assert scanner.scan("abc++ is not c").terms == []
+    assert scanner.scan("total scam!").terms == ["scam"]
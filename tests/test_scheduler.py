@@ -0,0 +1,146 @@
+import asyncio
+from types import SimpleNamespace
+
+from scheduler import ActionScheduler, BAN, PUNISH, CLEANUP, LOG, BULK_DELETE_LIMIT
+
+
+class Gate:
+    """A job that notes it started, then runs until released."""
+
+    def __init__(self, started, name):
+        self.started = started
+        self.name = name
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.started.append(self.name)
+        await self.release.wait()
+
+
+class Member:
+    def __init__(self, role_ids):
+        self.id = 7
+        self.guild = SimpleNamespace(id=1)
+        self.roles = [SimpleNamespace(id=1)] + [SimpleNamespace(id=role_id) for role_id in role_ids]
+        self.edits = []
+
+    async def edit(self, roles, reason=None):
+        self.edits.append([role.id for role in roles])
+
+
+class Channel:
+    def __init__(self):
+        self.id = 5
+        self.guild = SimpleNamespace(id=1)
+        self.deletes = []
+
+    async def delete_messages(self, messages, reason=None):
+        self.deletes.append([message.id for message in messages])
+
+
+def test_jobs_run_in_priority_order():
+    async def run():
+        scheduler = ActionScheduler(guild_concurrency=1)
+        started = []
+        blocker = Gate(started, "blocker")
+        scheduler.submit(1, CLEANUP, "a", blocker)
+
+        async def job(name):
+            started.append(name)
+
+        futures = [scheduler.submit(1, priority, "b", job, name)
+                   for priority, name in ((LOG, "log"), (CLEANUP, "cleanup"), (BAN, "ban"), (PUNISH, "punish"))]
+        await asyncio.sleep(0)
+        blocker.release.set()
+        await asyncio.gather(*futures)
+        return started
+
+    assert asyncio.run(run()) == ["blocker", "ban", "punish", "cleanup", "log"]
+
+
+def test_bucket_cap_leaves_slots_for_other_buckets():
+    async def run():
+        scheduler = ActionScheduler(guild_concurrency=4, bucket_concurrency=2)
+        started = []
+        gates = [Gate(started, f"ban{i}") for i in range(3)] + [Gate(started, "channel")]
+        for gate in gates[:3]:
+            scheduler.submit(1, BAN, "ban", gate)
+        scheduler.submit(1, CLEANUP, "channel", gates[3])
+        await asyncio.sleep(0)
+        running = list(started)
+        gates[0].release.set()
+        await asyncio.sleep(0.01)
+        for gate in gates:
+            gate.release.set()
+        return running, started
+
+    running, started = asyncio.run(run())
+    assert running == ["ban0", "ban1", "channel"]
+    assert started[-1] == "ban2"
+
+
+def test_a_busy_guild_does_not_hold_up_another():
+    async def run():
+        scheduler = ActionScheduler(guild_concurrency=2)
+        started = []
+        gates = [Gate(started, f"busy{i}") for i in range(3)]
+        for i, gate in enumerate(gates):
+            scheduler.submit(1, BAN, f"bucket{i}", gate)
+
+        async def job():
+            started.append("other")
+
+        await asyncio.wait_for(scheduler.submit(2, LOG, "message", job), 1.0)
+        depth = scheduler.depth(1)
+        for gate in gates:
+            gate.release.set()
+        return started, depth
+
+    started, depth = asyncio.run(run())
+    assert "busy2" not in started and "other" in started
+    assert depth == 3
+
+
+def test_role_removals_for_one_member_merge_into_one_edit():
+    async def run():
+        scheduler = ActionScheduler()
+        member = Member([10, 11, 12])
+        first = scheduler.remove_roles(member, [SimpleNamespace(id=10)], reason="test")
+        second = scheduler.remove_roles(member, [SimpleNamespace(id=11)], reason="test")
+        assert first is second
+        await first
+        return member.edits
+
+    assert asyncio.run(run()) == [[12]]
+
+
+def test_submit_once_shares_a_queued_job():
+    async def run():
+        scheduler = ActionScheduler()
+        calls = []
+
+        async def job():
+            calls.append(1)
+
+        first = scheduler.submit_once(1, ("delete", 9), CLEANUP, "message", job)
+        assert scheduler.submit_once(1, ("delete", 9), CLEANUP, "message", job) is first
+        await first
+        await scheduler.submit_once(1, ("delete", 9), CLEANUP, "message", job)
+        return calls
+
+    assert asyncio.run(run()) == [1, 1]
+
+
+def test_purges_of_one_channel_merge_and_chunk():
+    async def run():
+        scheduler = ActionScheduler()
+        channel = Channel()
+        first = scheduler.purge(channel, range(BULK_DELETE_LIMIT), reason="test", delay=0.01)
+        second = scheduler.purge(channel, range(BULK_DELETE_LIMIT, BULK_DELETE_LIMIT + 50), reason="test")
+        assert first is second
+        await first
+        return channel.deletes
+
+    deletes = asyncio.run(run())
+    assert [len(chunk) for chunk in deletes] == [BULK_DELETE_LIMIT, 50]
+    assert sorted(sum(deletes, [])) == list(range(BULK_DELETE_LIMIT + 50))
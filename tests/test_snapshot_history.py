@@ -0,0 +1,76 @@
+from snapshot_history import BASE, DELTA, SnapshotHistory, apply, diff, retained
+
+DAY = 86400
+HOUR = 3600
+
+
+def snapshot(taken_at, roles, channels=()):
+    return {"guild_id": 1, "name": "Guild", "taken_at": taken_at,
+            "roles": {str(r): {"id": r, "name": f"role-{r}"} for r in roles},
+            "channels": {str(c): {"id": c, "name": f"channel-{c}"} for c in channels}}
+
+
+def test_retained_keeps_recent_versions_and_thins_older_ones():
+    now = 100 * DAY
+    recent = [now - HOUR * i for i in (3, 2, 1)]
+    # Three versions inside one hour a few days back: only the newest of them stays.
+    hourly = [now - 3 * DAY + 60 * i for i in range(3)]
+    ancient = [now - 95 * DAY]
+    times = sorted(ancient + hourly + recent)
+    kept = [times[i] for i in retained(times, now)]
+    assert kept == [hourly[-1]] + recent
+
+
+def test_retained_always_keeps_the_newest_version():
+    now = 200 * DAY
+    times = [now - 120 * DAY, now - 100 * DAY]
+    assert retained(times, now) == [1]
+
+
+def test_diff_and_apply_round_trip():
+    old = snapshot(1, roles=(1, 2), channels=(10,))
+    new = snapshot(2, roles=(2, 3), channels=(10, 11))
+    new["roles"]["2"]["name"] = "renamed"
+    delta = diff(old, new)
+    assert delta["roles"]["1"] is None and "10" not in delta["channels"]
+    rebuilt = snapshot(1, roles=(1, 2), channels=(10,))
+    apply(rebuilt, delta)
+    assert rebuilt == new
+
+
+def test_load_rebuilds_the_version_as_of_a_time(tmp_path):
+    history = SnapshotHistory(str(tmp_path))
+    versions = [snapshot(1000 + i, roles=range(i + 1)) for i in range(4)]
+    history.append(1, 1000, BASE, versions[0])
+    for previous, version in zip(versions, versions[1:]):
+        history.append(1, version["taken_at"], DELTA, diff(previous, version))
+
+    assert history.load(1) == versions[-1]
+    assert history.load(1, at=1001.5) == versions[1]
+    assert history.load(1, at=999) is None
+    assert SnapshotHistory(str(tmp_path)).versions(1) == [1000, 1001, 1002, 1003]
+
+
+def test_torn_final_record_is_dropped(tmp_path):
+    history = SnapshotHistory(str(tmp_path))
+    history.append(1, 1000, BASE, snapshot(1000, roles=(1,)))
+    history.append(1, 1001, BASE, snapshot(1001, roles=(1, 2)))
+    path = history.path(1)
+    with open(path, "r+b") as f:
+        f.truncate(f.seek(0, 2) - 3)
+
+    reopened = SnapshotHistory(str(tmp_path))
+    assert reopened.versions(1) == [1000]
+    assert reopened.load(1) == snapshot(1000, roles=(1,))
+
+
+def test_compaction_keeps_what_retention_keeps(tmp_path):
+    # Everything older than 10 seconds goes, except the newest version.
+    history = SnapshotHistory(str(tmp_path), retention=((10, 0),), compact_every=3)
+    versions = [snapshot(1000 + i, roles=range(i + 1)) for i in range(3)]
+    history.append(1, 1000, BASE, versions[0])
+    for previous, version in zip(versions, versions[1:]):
+        history.append(1, version["taken_at"], DELTA, diff(previous, version))
+
+    assert history.versions(1) == [1002]
+    assert SnapshotHistory(str(tmp_path)).load(1) == versions[-1]
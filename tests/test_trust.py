@@ -0,0 +1,54 @@
+import asyncio
+from types import SimpleNamespace
+
+import discord
+
+from shared_store import SharedStore
+from trust import TrustStore
+
+Action = discord.AuditLogAction
+GUILD = SimpleNamespace(id=1, get_role=lambda role_id: None)
+ADMIN = SimpleNamespace(id=10)
+ATTACKER = SimpleNamespace(id=20)
+MEMBER = 30
+ROLE = 500
+
+
+def store(tmp_path):
+    trust = TrustStore(SharedStore(str(tmp_path / "shared.db")))
+    trust.add_user(GUILD.id, ADMIN.id)
+    trust.add_role(GUILD, ROLE)
+    return trust
+
+
+def grant(trust, granter):
+    """Run the member update and audit entry for ``granter`` giving MEMBER the trusted role."""
+    before = SimpleNamespace(id=MEMBER, guild=GUILD, _roles=set())
+    after = SimpleNamespace(id=MEMBER, guild=GUILD, _roles={ROLE})
+    entry = SimpleNamespace(action=Action.member_role_update, guild=GUILD, target=SimpleNamespace(id=MEMBER),
+                            user=granter, user_id=granter.id,
+                            after=SimpleNamespace(roles=[SimpleNamespace(id=ROLE)]))
+
+    async def run():
+        await trust.on_member_update(before, after)
+        await trust.on_audit_log_entry_create(entry)
+
+    asyncio.run(run())
+
+
+def test_trusted_role_from_trusted_granter_is_trusted(tmp_path):
+    trust = store(tmp_path)
+    grant(trust, ADMIN)
+    assert trust.is_trusted(GUILD.id, SimpleNamespace(id=MEMBER))
+
+
+def test_trusted_role_from_untrusted_granter_is_not_trusted(tmp_path):
+    trust = store(tmp_path)
+    grant(trust, ATTACKER)
+    assert not trust.is_trusted(GUILD.id, SimpleNamespace(id=MEMBER))
+
+
+def test_self_granted_trusted_role_is_not_trusted(tmp_path):
+    trust = store(tmp_path)
+    grant(trust, SimpleNamespace(id=MEMBER))
+    assert not trust.is_trusted(GUILD.id, SimpleNamespace(id=MEMBER))
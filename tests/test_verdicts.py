@@ -0,0 +1,85 @@
+import asyncio
+from types import SimpleNamespace
+
+from verdicts import VerdictCache
+
+GUILD = SimpleNamespace(id=1)
+
+
+class User:
+    id = 20
+
+    def __str__(self):
+        return "attacker"
+
+
+ATTACKER = User()
+
+
+def target(target_id):
+    return SimpleNamespace(id=target_id, name=f"channel-{target_id}")
+
+
+class Store:
+    def __init__(self, granted):
+        self.granted = granted
+
+    def claim_verdict(self, guild_id, actor_id, reason, ttl):
+        return self.granted
+
+
+def test_first_claim_punishes_and_later_claims_record_damage():
+    verdicts = VerdictCache()
+    assert verdicts.claim(GUILD, ATTACKER, "BANNED", "channel_delete", target(1))
+    assert not verdicts.claim(GUILD, ATTACKER, "BANNED", "channel_delete", target(2))
+    assert verdicts.damage(GUILD.id) == [("channel_delete", "channel-1", 1), ("channel_delete", "channel-2", 2)]
+
+
+def test_expired_verdict_is_claimed_again():
+    verdicts = VerdictCache(ttl=-1)
+    assert verdicts.claim(GUILD, ATTACKER, "BANNED", "ban", target(1))
+    assert verdicts.claim(GUILD, ATTACKER, "BANNED", "ban", target(2))
+    assert verdicts.damage(GUILD.id) == []
+
+
+def test_claim_made_by_another_process_is_not_first():
+    verdicts = VerdictCache(store=Store(granted=False))
+    assert not verdicts.claim(GUILD, ATTACKER, "BANNED", "ban", target(1))
+    assert verdicts.get(GUILD.id, ATTACKER.id) is not None
+
+
+def test_one_summary_once_the_actor_goes_quiet():
+    summaries = []
+
+    async def on_summary(guild, verdict):
+        summaries.append(list(verdict.damage))
+
+    async def run():
+        verdicts = VerdictCache(on_summary=on_summary, summary_delay=0.05)
+        for target_id in range(4):
+            verdicts.claim(GUILD, ATTACKER, "BANNED", "role_delete", target(target_id))
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.1)
+
+    asyncio.run(run())
+    assert len(summaries) == 1 and len(summaries[0]) == 4
+
+
+def test_checkpoint_round_trip_keeps_actor_and_damage():
+    verdicts = VerdictCache()
+    verdicts.claim(GUILD, ATTACKER, "BANNED", "ban", target(1))
+    state = verdicts.checkpoint()
+
+    restored = VerdictCache()
+    restored.restore(state, elapsed=1)
+    verdict = restored.get(GUILD.id, ATTACKER.id)
+    assert str(verdict.actor) == "attacker" and verdict.damage == [("ban", "channel-1", 1)]
+    assert not restored.claim(GUILD, ATTACKER, "BANNED", "ban", target(2))
+
+
+def test_expired_checkpoint_entries_are_not_restored():
+    verdicts = VerdictCache()
+    verdicts.claim(GUILD, ATTACKER, "BANNED", "ban", target(1))
+    restored = VerdictCache()
+    restored.restore(verdicts.checkpoint(), elapsed=verdicts.ttl + 1)
+    assert restored.get(GUILD.id, ATTACKER.id) is None
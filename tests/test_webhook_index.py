@@ -0,0 +1,53 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import discord
+
+from webhook_index import WebhookIndex
+
+
+def webhook(age):
+    created = datetime.now(timezone.utc) - timedelta(seconds=age)
+    return SimpleNamespace(id=discord.utils.time_snowflake(created), name="hook")
+
+
+class Channel:
+    def __init__(self):
+        self.id = 5
+        self.name = "general"
+        self.guild = SimpleNamespace(id=1, name="guild")
+        self.hooks = []
+        self.fetches = 0
+
+    async def webhooks(self):
+        self.fetches += 1
+        return list(self.hooks)
+
+
+def test_first_fetch_of_unindexed_channel_is_the_baseline():
+    async def run():
+        index = WebhookIndex(debounce=0)
+        channel = Channel()
+        channel.hooks = [webhook(age=3600), webhook(age=86400)]
+        first = await index.changed(channel)
+        fresh = webhook(age=0)
+        channel.hooks.append(fresh)
+        second = await index.changed(channel)
+        return first, second, fresh, channel.fetches
+
+    first, second, fresh, fetches = asyncio.run(run())
+    assert first == []
+    assert second == [fresh]
+    assert fetches == 2
+
+
+def test_recent_webhook_in_unindexed_channel_is_still_new():
+    async def run():
+        index = WebhookIndex(debounce=0)
+        channel = Channel()
+        channel.hooks = [webhook(age=3600), webhook(age=1)]
+        return await index.changed(channel), channel.hooks[1]
+
+    new, recent = asyncio.run(run())
+    assert new == [recent]
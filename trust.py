@@ -0,0 +1,195 @@
+import discord
+
+# guild_id of entries trusted in every guild: the owner and the bot itself.
+GLOBAL = 0
+USER = "user"
+ROLE = "role"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trust (
+    guild_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    target_id INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, kind, target_id)
+);
+"""
+
+
+class TrustStore:
+    """Per-guild whitelist of users and roles, persisted in the shared store.
+
+    Everything is loaded into memory at startup and changes are written
+    through one row at a time. Role trust is flattened into a per-guild set
+    of member ids holding a trusted role, kept current from member and role
+    events, so ``is_trusted`` is a few set lookups even during a flood.
+    Members the cache has never seen fall back to a check of their own
+    roles.
+
+    A trusted role granted after indexing counts only once its audit log
+    entry shows a trusted granter; until then, or if the granter is not
+    trusted, the recipient is held as unconfirmed and is not trusted.
+    """
+
+    def __init__(self, store, owners=()):
+        self.store = store
+        self.db = store.db
+        self.db.executescript(SCHEMA)
+        self._migrate()
+        self._bot = None
+        self._users = {}
+        self._roles = {}
+        self._members = {}
+        self._unconfirmed = {}
+        for user_id in owners:
+            self._write(GLOBAL, USER, user_id)
+        self._load()
+        self._version = store.data_version()
+
+    def attach(self, bot):
+        """Register the listeners that keep role trust current."""
+        self._bot = bot
+        bot.add_listener(self.on_guild_available)
+        bot.add_listener(self.on_guild_join)
+        bot.add_listener(self.on_guild_remove)
+        bot.add_listener(self.on_member_update)
+        bot.add_listener(self.on_audit_log_entry_create)
+        bot.add_listener(self.on_raw_member_remove)
+        bot.add_listener(self.on_guild_role_delete)
+
+    def is_trusted(self, guild_id, user):
+        uid = user.id
+        if uid in self._users.get(GLOBAL, ()) or uid in self._users.get(guild_id, ()):
+            return True
+        if uid in self._members.get(guild_id, ()):
+            return True
+        if uid in self._unconfirmed.get(guild_id, ()):
+            return False
+        roles = self._roles.get(guild_id)
+        if roles and isinstance(user, discord.Member) and user.guild.id == guild_id:
+            # Not cached when the guild was indexed; check the member itself.
+            return not roles.isdisjoint(user._roles)
+        return False
+
+    def users(self, guild_id):
+        return self._users.get(guild_id, set()) | self._users.get(GLOBAL, set())
+
+    def roles(self, guild_id):
+        return set(self._roles.get(guild_id, ()))
+
+    def add_user(self, guild_id, user_id):
+        self._write(guild_id, USER, user_id)
+        self._users.setdefault(guild_id, set()).add(user_id)
+
+    def remove_user(self, guild_id, user_id):
+        self._delete(guild_id, USER, user_id)
+        self._users.get(guild_id, set()).discard(user_id)
+
+    def add_role(self, guild, role_id):
+        self._write(guild.id, ROLE, role_id)
+        self._roles.setdefault(guild.id, set()).add(role_id)
+        self.index(guild)
+
+    def remove_role(self, guild, role_id):
+        self._delete(guild.id, ROLE, role_id)
+        self._roles.get(guild.id, set()).discard(role_id)
+        self.index(guild)
+
+    def index(self, guild):
+        """Rebuild the guild's member-to-trusted lookup from the member cache."""
+        members = set()
+        for role_id in self._roles.get(guild.id, ()):
+            role = guild.get_role(role_id)
+            if role is not None:
+                members.update(member.id for member in role.members)
+        if members:
+            self._members[guild.id] = members
+        else:
+            self._members.pop(guild.id, None)
+        self._unconfirmed.pop(guild.id, None)
+
+    def refresh(self):
+        """Reload if another shard process changed the trust table."""
+        version = self.store.data_version()
+        if version == self._version:
+            return
+        self._version = version
+        self._load()
+        if self._bot is not None:
+            for guild_id in self._roles:
+                guild = self._bot.get_guild(guild_id)
+                if guild is not None:
+                    self.index(guild)
+
+    # Listeners
+
+    async def on_guild_available(self, guild):
+        if guild.id in self._roles:
+            self.index(guild)
+
+    async def on_guild_join(self, guild):
+        await self.on_guild_available(guild)
+
+    async def on_guild_remove(self, guild):
+        self._members.pop(guild.id, None)
+        self._unconfirmed.pop(guild.id, None)
+
+    async def on_member_update(self, before, after):
+        guild_id = after.guild.id
+        roles = self._roles.get(guild_id)
+        if not roles or before._roles == after._roles:
+            return
+        if roles.isdisjoint(after._roles):
+            self._members.get(guild_id, set()).discard(after.id)
+            self._unconfirmed.get(guild_id, set()).discard(after.id)
+        elif after.id not in self._members.get(guild_id, ()):
+            # Wait for the audit log entry to show who granted the role.
+            self._unconfirmed.setdefault(guild_id, set()).add(after.id)
+
+    async def on_audit_log_entry_create(self, entry):
+        if entry.action is not discord.AuditLogAction.member_role_update:
+            return
+        guild_id = entry.guild.id
+        roles = self._roles.get(guild_id)
+        granted = {role.id for role in getattr(entry.after, "roles", [])}
+        if not roles or roles.isdisjoint(granted):
+            return
+        member_id = entry.target.id
+        granter = entry.user or discord.Object(id=entry.user_id)
+        if self.is_trusted(guild_id, granter):
+            self._members.setdefault(guild_id, set()).add(member_id)
+            self._unconfirmed.get(guild_id, set()).discard(member_id)
+        else:
+            self._members.get(guild_id, set()).discard(member_id)
+            self._unconfirmed.setdefault(guild_id, set()).add(member_id)
+
+    async def on_raw_member_remove(self, payload):
+        self._members.get(payload.guild_id, set()).discard(payload.user.id)
+        self._unconfirmed.get(payload.guild_id, set()).discard(payload.user.id)
+
+    async def on_guild_role_delete(self, role):
+        if role.id in self._roles.get(role.guild.id, ()):
+            self.remove_role(role.guild, role.id)
+
+    # Storage
+
+    def _load(self):
+        users, roles = {}, {}
+        for guild_id, kind, target_id in self.db.execute("SELECT guild_id, kind, target_id FROM trust"):
+            (users if kind == USER else roles).setdefault(guild_id, set()).add(target_id)
+        self._users, self._roles = users, roles
+
+    def _write(self, guild_id, kind, target_id):
+        self.db.execute("INSERT OR IGNORE INTO trust (guild_id, kind, target_id) VALUES (?, ?, ?)",
+                        (guild_id, kind, target_id))
+
+    def _delete(self, guild_id, kind, target_id):
+        self.db.execute("DELETE FROM trust WHERE guild_id = ? AND kind = ? AND target_id = ?",
+                        (guild_id, kind, target_id))
+
+    def _migrate(self):
+        # The old whitelist table held users trusted in every guild.
+        exists = self.db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'whitelist'").fetchone()
+        if exists:
+            self.db.execute("INSERT OR IGNORE INTO trust (guild_id, kind, target_id) "
+                            "SELECT ?, ?, user_id FROM whitelist", (GLOBAL, USER))
+            self.db.execute("DROP TABLE whitelist")
@@ -0,0 +1,119 @@
+import asyncio
+import time
+
+import discord
+
+# How long a punished actor stays punished for deduplication purposes.
+VERDICT_TTL = 600.0
+# Quiet period after the last recorded damage before the summary is posted.
+SUMMARY_DELAY = 5.0
+# Damage records kept per verdict.
+MAX_DAMAGE = 500
+
+
+class Verdict:
+    __slots__ = ("guild_id", "actor", "reason", "expires", "damage", "summary_task")
+
+    def __init__(self, guild_id, actor, reason, expires):
+        self.guild_id = guild_id
+        self.actor = actor
+        self.reason = reason
+        self.expires = expires
+        self.damage = []
+        self.summary_task = None
+
+
+class _Actor(discord.Object):
+    """Stands in for the actor of a verdict reloaded from a checkpoint."""
+
+    def __init__(self, actor_id, name):
+        super().__init__(actor_id)
+        self.name = name
+
+    def __str__(self):
+        return self.name
+
+
+class VerdictCache:
+    """Per-guild record of actors that have already been punished.
+
+    The first handler to ``claim`` an actor carries out the punishment;
+    every later event from that actor within the TTL only records its damage
+    (kind, name, id) for rollback and for one summary posted once the actor
+    goes quiet. ``claim`` does not await, so concurrent handlers for the
+    same actor always agree on which of them acts. With a shared store,
+    first claims are also checked against the other shard processes.
+    """
+
+    def __init__(self, on_summary=None, ttl=VERDICT_TTL, summary_delay=SUMMARY_DELAY, store=None):
+        self.on_summary = on_summary
+        self.store = store
+        self.ttl = ttl
+        self.summary_delay = summary_delay
+        self._verdicts = {}
+
+    def get(self, guild_id, actor_id):
+        """Return the live verdict for an actor, or None."""
+        verdict = self._verdicts.get(guild_id, {}).get(actor_id)
+        if verdict is not None and verdict.expires < time.monotonic():
+            del self._verdicts[guild_id][actor_id]
+            return None
+        return verdict
+
+    def claim(self, guild, actor, reason, kind, target):
+        """Record damage by ``actor``; return True if the caller should punish them."""
+        now = time.monotonic()
+        verdict = self.get(guild.id, actor.id)
+        first = verdict is None
+        if first:
+            verdicts = self._verdicts.setdefault(guild.id, {})
+            if len(verdicts) > 64:
+                for actor_id in [a for a, v in verdicts.items() if v.expires < now]:
+                    del verdicts[actor_id]
+            verdict = verdicts[actor.id] = Verdict(guild.id, actor, reason, now + self.ttl)
+            if self.store is not None and not self.store.claim_verdict(guild.id, actor.id, reason, self.ttl):
+                # Another process already punished them.
+                first = False
+
+        if len(verdict.damage) < MAX_DAMAGE:
+            verdict.damage.append((kind, getattr(target, "name", str(target)), getattr(target, "id", None)))
+        if not first and self.on_summary is not None:
+            if verdict.summary_task is not None:
+                verdict.summary_task.cancel()
+            verdict.summary_task = asyncio.ensure_future(self._summarize(guild, verdict))
+        return first
+
+    def damage(self, guild_id):
+        """All damage recorded against live verdicts in a guild, oldest first."""
+        now = time.monotonic()
+        return [record for verdict in self._verdicts.get(guild_id, {}).values()
+                if verdict.expires >= now for record in verdict.damage]
+
+    def forget(self, guild_id, actor_id=None):
+        if actor_id is None:
+            self._verdicts.pop(guild_id, None)
+        else:
+            self._verdicts.get(guild_id, {}).pop(actor_id, None)
+
+    def checkpoint(self, now=None):
+        """Live verdicts with their remaining time and damage."""
+        if now is None:
+            now = time.monotonic()
+        return [[verdict.guild_id, verdict.actor.id, str(verdict.actor), verdict.reason, verdict.expires - now,
+                 verdict.damage]
+                for verdicts in self._verdicts.values() for verdict in verdicts.values() if verdict.expires > now]
+
+    def restore(self, state, elapsed, now=None):
+        if now is None:
+            now = time.monotonic()
+        for guild_id, actor_id, name, reason, remaining, damage in state:
+            if remaining <= elapsed:
+                continue
+            verdict = Verdict(guild_id, _Actor(actor_id, name), reason, now + remaining - elapsed)
+            verdict.damage = [tuple(record) for record in damage]
+            self._verdicts.setdefault(guild_id, {}).setdefault(actor_id, verdict)
+
+    async def _summarize(self, guild, verdict):
+        await asyncio.sleep(self.summary_delay)
+        verdict.summary_task = None
+        await self.on_summary(guild, verdict)
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+import discord
+
+from metrics import metrics
+
+log = logging.getLogger(__name__)
+
+# Webhook updates for one channel within this many seconds share a fetch.
+DEBOUNCE = 0.5
+# When a channel's first fetch becomes its baseline, webhooks created this
+# recently are still reported as new.
+BASELINE_RECENT = timedelta(seconds=60)
+
+
+class WebhookIndex:
+    """Known webhook ids per channel, per guild.
+
+    ``fill`` lists a guild's webhooks with one request, at startup, when the
+    bot joins a guild and when the protection is switched on. The gateway
+    only says that a channel's webhooks changed; ``changed`` merges the
+    updates for a channel that arrive within DEBOUNCE, or while its fetch
+    is running, into one ``channel.webhooks()`` call, and returns the
+    webhooks the index did not know. The first fetch of a channel without
+    a baseline (its guild could not be filled) becomes its baseline; only
+    webhooks created within BASELINE_RECENT of it are reported as new.
+    """
+
+    def __init__(self, debounce=DEBOUNCE):
+        self.debounce = debounce
+        self._guilds = {}
+        self._filled = set()
+        self._pending = {}
+
+    def attach(self, bot):
+        """Register the gateway listeners that keep the index in step with channels and guilds."""
+        bot.add_listener(self.on_guild_join)
+        bot.add_listener(self.on_guild_channel_create)
+        bot.add_listener(self.on_guild_channel_delete)
+        bot.add_listener(self.on_guild_remove)
+
+    async def on_guild_join(self, guild):
+        await self.fill(guild)
+
+    async def on_guild_channel_create(self, channel):
+        # A new channel starts without webhooks.
+        channels = self._guilds.get(channel.guild.id)
+        if channels is not None:
+            channels.setdefault(channel.id, set())
+
+    async def on_guild_channel_delete(self, channel):
+        self._guilds.get(channel.guild.id, {}).pop(channel.id, None)
+
+    async def on_guild_remove(self, guild):
+        self._guilds.pop(guild.id, None)
+        self._filled.discard(guild.id)
+
+    def is_filled(self, guild_id):
+        return guild_id in self._filled
+
+    async def fill(self, guild):
+        """Index every webhook in a guild; return False if they could not be listed."""
+        try:
+            webhooks = await guild.webhooks()
+        except discord.HTTPException as exc:
+            log.warning("Could not list webhooks in %s (%s): %s", guild.name, guild.id, exc)
+            return False
+        metrics.inc("webhook_fetches_total", scope="guild")
+        channels = {channel.id: set() for channel in guild.channels}
+        for webhook in webhooks:
+            channels.setdefault(webhook.channel_id, set()).add(webhook.id)
+        self._guilds[guild.id] = channels
+        self._filled.add(guild.id)
+        return True
+
+    async def changed(self, channel):
+        """Webhooks in ``channel`` the index did not know; empty for an update merged into another."""
+        if channel.id in self._pending:
+            self._pending[channel.id] = True  # fetch once more after the running one
+            return []
+        new = []
+        self._pending[channel.id] = False
+        try:
+            while True:
+                await asyncio.sleep(self.debounce)
+                self._pending[channel.id] = False
+                new.extend(await self._fetch(channel))
+                if not self._pending[channel.id]:
+                    return new
+        finally:
+            del self._pending[channel.id]
+
+    async def _fetch(self, channel):
+        try:
+            webhooks = await channel.webhooks()
+        except discord.NotFound:
+            await self.on_guild_channel_delete(channel)
+            return []
+        except discord.HTTPException as exc:
+            log.warning("Could not list webhooks in #%s (%s): %s", channel.name, channel.id, exc)
+            return []
+        metrics.inc("webhook_fetches_total", scope="channel")
+        channels = self._guilds.setdefault(channel.guild.id, {})
+        known = channels.get(channel.id)
+        channels[channel.id] = {webhook.id for webhook in webhooks}
+        if known is None:
+            recent = datetime.now(timezone.utc) - BASELINE_RECENT
+            return [webhook for webhook in webhooks if discord.utils.snowflake_time(webhook.id) >= recent]
+        return [webhook for webhook in webhooks if webhook.id not in known]